@@ -0,0 +1,440 @@
+"""
+End-to-end benchmark of the IFM measurement and two step analysis on the CPU.
+
+Synthetic BMP images and IFM xml files of several sizes are generated and normalized
+as `IFMMeasurement` (xml metadata and image pyramid) and `IFMTwoStepAnalysis`
+(defect recognition, prediction csv, defect prevalence, defect overlay and heatmap).
+The defect recognition runs with small randomly initialized Keras models of the
+expected input shape if TensorFlow and `ifm-image-defect-detection` are installed,
+otherwise a synthetic prediction csv is written and the stage is skipped.
+
+Each image size is processed in a fresh process, so that its peak RSS is reported
+without the memory of the other sizes. The wall time, patches/s and peak RSS of each
+stage are appended to a JSON lines file together with the version of the plugin.
+
+Usage:
+    python benchmarks/ifm_benchmark.py --sizes 1024 2048 4096
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from xml.sax.saxutils import escape
+
+import numpy as np
+from PIL import Image
+from utils import (
+    RESULTS_DIRECTORY,
+    compare,
+    previous_results,
+    run_metadata,
+    store_results,
+)
+
+RESULTS_FILE = os.path.join(RESULTS_DIRECTORY, 'ifm.jsonl')
+
+# Edge length of the classified patches and distance between them in pixels, the
+# models get patches of shape (PATCH_SIZE, PATCH_SIZE, 3)
+PATCH_SIZE = 128
+STRIDE = 64
+
+# File names of the binary and the classification model
+MODEL_FILES = ('Model_20250101_binary.keras', 'Model_20250101_classification.keras')
+
+STAGES = (
+    'read_ifm_xml',
+    'image_pyramid',
+    'defect_recognition',
+    'read_csv',
+    'defect_prevalence',
+    'defect_overlay',
+    'heatmap',
+)
+
+DESCRIPTION = """Verarbeitungsstart: Montag, 30. September 2024 16:17:34
+Verarbeitungsende: Montag, 30. September 2024 18:16:00
+Benötigte Zeit: 1.974 h
+Produkt-ID: H211009024
+IFM Seriennummer: 017111212409
+
+Spezifische Werte:
+Startposition der Messung:
+\tx: 0.0000nm
+\ty: 0.0000nm
+\tz: 0.0000nm
+Endposition der Messung:
+\tx: {width_cm:.4f}cm
+\ty: {height_cm:.4f}cm
+\tz: 0.0000nm
+Geschätzte Laterale Auflösung: 3.9142µm
+
+Anzahl der Bilder: {tile_rows} Zeile(n) x {tile_columns} Spalte(n)
+Dezimierung: 2 (1, 2)
+
+Messeinstellungen:
+Belichtungszeit: 199.0 µs
+Kontrast: 0.05
+Untere Histogrammgrenze: 0 / 255
+Obere Histogrammgrenze: 255 / 255
+Autofokus verwendet: Ja"""
+
+XML_TEMPLATE = """<Object3D type="IFM" signature="0">
+  <generalData>
+    <name>{sample_id}</name>
+    <deviceName>IFM G4g Measurement Device</deviceName>
+    <description>{description}</description>
+  </generalData>
+  <generalCalibrationData>
+    <resolution>
+      <vector size="2">{width}.000000 {height}.000000 </vector>
+    </resolution>
+  </generalCalibrationData>
+  <ifmData>
+    <magnification>9.98687</magnification>
+  </ifmData>
+</Object3D>
+"""
+
+
+def generate_image(path: str, width: int, height: int, seed: int = 0) -> None:
+    """
+    Writes a gray 24 bit BMP with noise and a few dark scratches.
+    """
+    rng = np.random.default_rng(seed)
+    image = rng.normal(128, 20, (height, width)).clip(0, 255).astype(np.uint8)
+    for _ in range(max(width, height) // 512):
+        row = rng.integers(height)
+        image[row : row + 4, rng.integers(width // 2) :] //= 3
+    Image.fromarray(np.repeat(image[:, :, None], 3, axis=2)).save(path)
+
+
+def generate_xml(path: str, width: int, height: int, sample_id: str) -> None:
+    """
+    Writes an IFM xml file with the metadata of an image of the given size.
+    """
+    pixel_size_cm = 3.9142e-4
+    description = DESCRIPTION.format(
+        width_cm=width * pixel_size_cm,
+        height_cm=height * pixel_size_cm,
+        tile_rows=-(-height // 512),
+        tile_columns=-(-width // 512),
+    )
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(
+            XML_TEMPLATE.format(
+                sample_id=sample_id,
+                description=escape(description).replace('\n', '&#xd;\n'),
+                width=width,
+                height=height,
+            )
+        )
+
+
+def generate_prediction_csv(
+    path: str, image_path: str, width: int, height: int, seed: int = 0
+) -> int:
+    """
+    Writes a prediction csv with random defect probabilities for every patch, like
+    the defect recognition does.
+
+    Returns:
+        int: The number of patches.
+    """
+    rng = np.random.default_rng(seed)
+    x, y = np.meshgrid(
+        np.arange(0, max(width - PATCH_SIZE, 0) + 1, STRIDE),
+        np.arange(0, max(height - PATCH_SIZE, 0) + 1, STRIDE),
+    )
+    probabilities = rng.dirichlet([0.2, 0.2, 0.2, 4.0], x.size)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('Image Name,Patch Size,Stride,Defect Type\n')
+        file.write(f'{image_path},{PATCH_SIZE},{STRIDE},None\n')
+        file.write('x,y,Whiskers,Chipping,Scratch,No Error\n')
+        np.savetxt(
+            file,
+            np.column_stack([x.ravel(), y.ravel(), probabilities]),
+            fmt=['%d', '%d', '%.5f', '%.5f', '%.5f', '%.5f'],
+            delimiter=',',
+        )
+    return x.size
+
+
+def save_models(directory: str) -> None:
+    """
+    Saves a small randomly initialized binary and classification model.
+    """
+    import tensorflow as tf
+
+    for name, outputs, activation in zip(MODEL_FILES, (1, 4), ('sigmoid', 'softmax')):
+        model = tf.keras.Sequential(
+            [
+                tf.keras.Input((PATCH_SIZE, PATCH_SIZE, 3)),
+                tf.keras.layers.Conv2D(4, 3, strides=4, activation='relu'),
+                tf.keras.layers.GlobalAveragePooling2D(),
+                tf.keras.layers.Dense(outputs, activation=activation),
+            ]
+        )
+        model.save(os.path.join(directory, name))
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of the process in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+class StageTimer:
+    """
+    Measures the wall time of functions of the plugin while they are called by the
+    normalizers, together with the peak RSS of the process after each call.
+    """
+
+    def __init__(self) -> None:
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.peak_rss_mb = {}
+
+    @contextmanager
+    def timing(self, owner, name: str, stage: str):
+        """
+        Replaces the function `name` of a module or class by a timed version of it.
+        """
+        original = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+                self.peak_rss_mb[stage] = peak_rss_mb()
+
+        setattr(owner, name, timed)
+        try:
+            yield
+        finally:
+            setattr(owner, name, original)
+
+
+def run_pipeline(directory: str, with_models: bool) -> dict:
+    """
+    Normalizes a measurement and a two step analysis of a synthetic image in the
+    current process.
+
+    Returns:
+        dict: The number of patches, the time and peak RSS of each stage.
+    """
+    import nomad.client  # noqa: F401, loads the plugins before the schema packages
+    import pandas as pd
+    from nomad.datamodel import EntryArchive, EntryMetadata
+    from nomad.datamodel.context import ClientContext
+    from nomad.datamodel.metainfo.basesections import CompositeSystemReference
+    from nomad.utils import get_logger
+
+    from nomad_uibk_plugin.filereader import IFMreader, IFMtiles
+    from nomad_uibk_plugin.schema_packages.IFMschema import (
+        DefectPrevalence,
+        IFMMeasurement,
+        IFMModel,
+        IFMTwoStepAnalysis,
+        ImageReference,
+        ModelReference,
+    )
+
+    # resolving the samples requires a search index
+    CompositeSystemReference.normalize = lambda self, archive, logger: None
+
+    logger = get_logger(__name__)
+    context = ClientContext(local_dir=directory)
+    timer = StageTimer()
+    with ExitStack() as stack:
+        stack.enter_context(timer.timing(IFMreader, 'read_ifm_xml', 'read_ifm_xml'))
+        stack.enter_context(
+            timer.timing(IFMtiles, 'write_tile_pyramid', 'image_pyramid')
+        )
+        stack.enter_context(timer.timing(pd, 'read_csv', 'read_csv'))
+        stack.enter_context(
+            timer.timing(DefectPrevalence, 'update_from_data', 'defect_prevalence')
+        )
+        stack.enter_context(
+            timer.timing(IFMTwoStepAnalysis, 'write_defect_overlay', 'defect_overlay')
+        )
+        if with_models:
+            from ifm_image_defect_detection import defectRecognition_toCSV
+
+            stack.enter_context(
+                timer.timing(
+                    defectRecognition_toCSV, 'defect_recognition', 'defect_recognition'
+                )
+            )
+
+        measurement_archive = EntryArchive(m_context=context, metadata=EntryMetadata())
+        measurement_archive.data = measurement = IFMMeasurement(
+            image_file='image.bmp', metadata_file='image_info.xml'
+        )
+        start = time.perf_counter()
+        measurement.normalize(measurement_archive, logger)
+        measurement_seconds = time.perf_counter() - start
+
+        if with_models:
+            save_models(directory)
+        binary, classification = MODEL_FILES
+        analysis_archive = EntryArchive(m_context=context, metadata=EntryMetadata())
+        analysis_archive.data = analysis = IFMTwoStepAnalysis(
+            name='Analysis',
+            inputs=[ImageReference(reference=measurement)],
+            model_binary=ModelReference(reference=IFMModel(file=binary)),
+            model_classification=ModelReference(
+                reference=IFMModel(file=classification)
+            ),
+            perform_analysis=with_models,
+        )
+        start = time.perf_counter()
+        analysis.normalize(analysis_archive, logger)
+        analysis_seconds = time.perf_counter() - start
+
+    # the rest of the analysis is mostly spent on the heatmap
+    timer.seconds['heatmap'] = analysis_seconds - sum(
+        timer.seconds[stage] for stage in STAGES[2:-1]
+    )
+    timer.peak_rss_mb['heatmap'] = peak_rss_mb()
+    if analysis.defect_prevalence is None:
+        raise RuntimeError('The analysis did not classify any patches.')
+    return dict(
+        patches=analysis.defect_prevalence.number_of_patches,
+        measurement_seconds=measurement_seconds,
+        analysis_seconds=analysis_seconds,
+        stage_seconds=timer.seconds,
+        stage_peak_rss_mb=timer.peak_rss_mb,
+        peak_rss_mb=peak_rss_mb(),
+    )
+
+
+def models_available() -> bool:
+    """
+    Returns whether the defect recognition can run with Keras models.
+    """
+    try:
+        import ifm_image_defect_detection  # noqa: F401
+        import tensorflow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def benchmark(size: int, with_models: bool) -> dict:
+    """
+    Benchmarks the pipeline for a square image in a fresh process.
+
+    Args:
+        size (int): The edge length of the image in pixels.
+        with_models (bool): Whether to run the defect recognition.
+
+    Returns:
+        dict: The time, patches/s and peak RSS of each stage.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = os.path.join(directory, 'image.bmp')
+        generate_image(image_path, size, size)
+        generate_xml(
+            os.path.join(directory, 'image_info.xml'), size, size, f'B{size}_A1'
+        )
+        if not with_models:
+            generate_prediction_csv(
+                os.path.join(directory, 'image_prediction.csv'), image_path, size, size
+            )
+            # the analysis opens the model files but only loads them without csv
+            for name in MODEL_FILES:
+                open(os.path.join(directory, name), 'wb').close()
+        megabytes = os.path.getsize(image_path) / 1e6
+
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            result = pool.apply(run_pipeline, (directory, with_models))
+
+    record = dict(
+        size=size,
+        megabytes=megabytes,
+        patches=result['patches'],
+        defect_recognition='keras' if with_models else 'skipped',
+        measurement_seconds=result['measurement_seconds'],
+        analysis_seconds=result['analysis_seconds'],
+        peak_rss_mb=result['peak_rss_mb'],
+    )
+    for stage in STAGES:
+        if stage not in result['stage_peak_rss_mb']:
+            continue
+        seconds = result['stage_seconds'][stage]
+        record[f'{stage}_seconds'] = seconds
+        record[f'{stage}_patches_per_s'] = record['patches'] / seconds
+        record[f'{stage}_peak_rss_mb'] = result['stage_peak_rss_mb'][stage]
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--sizes',
+        type=int,
+        nargs='+',
+        default=[1024, 2048, 4096],
+        help='Edge lengths of the square images in pixels.',
+    )
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument(
+        '--no-store', action='store_true', help='Do not append the results.'
+    )
+    args = parser.parse_args()
+
+    with_models = models_available()
+    if not with_models:
+        print(
+            'TensorFlow or ifm-image-defect-detection is not installed, the defect '
+            'recognition is skipped and synthetic predictions are used.'
+        )
+
+    previous = previous_results(args.output, 'size')
+    metadata = run_metadata()
+    records = []
+    print(
+        f'{"size":>6} {"patches":>8} {"stage":>18} {"s":>8} {"patches/s":>10} ', end=''
+    )
+    print(f'{"peak MB":>8}')
+    for size in args.sizes:
+        record = {**metadata, **benchmark(size, with_models)}
+        records.append(record)
+        for stage in STAGES:
+            if f'{stage}_seconds' not in record:
+                print(f'{size:>6} {record["patches"]:>8} {stage:>18} {"skipped":>8}')
+                continue
+            line = (
+                f'{size:>6} {record["patches"]:>8} {stage:>18} '
+                f'{record[f"{stage}_seconds"]:>8.3f} '
+                f'{record[f"{stage}_patches_per_s"]:>10.0f} '
+                f'{record[f"{stage}_peak_rss_mb"]:>8.0f}'
+            )
+            last = previous.get(size)
+            if (
+                last is not None
+                and last.get('defect_recognition') != record['defect_recognition']
+            ):
+                last = None
+            print(line + compare(record, last, stage))
+        print(
+            f'{size:>6} {record["patches"]:>8} {"total":>18} '
+            f'{record["measurement_seconds"] + record["analysis_seconds"]:>8.3f} '
+            f'{"":>10} {record["peak_rss_mb"]:>8.0f}'
+        )
+
+    if not args.no_store:
+        store_results(args.output, records)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Helpers shared by the benchmarks to time calls and to store results across versions.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def best_time(function: Callable[[], None], repeats: int) -> float:
+    """
+    Returns the shortest wall time in seconds of several calls of a function.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def plugin_version() -> dict[str, str]:
+    """
+    Returns the installed version of the plugin and the current git commit. The
+    version is read from the package metadata, so the plugin has to be installed from
+    the measured checkout, e.g. with `pip install -e` in a clean `git worktree`.
+    """
+    try:
+        package_version = version('nomad-uibk-plugin')
+    except PackageNotFoundError:
+        package_version = None
+    try:
+        commit = subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=os.path.dirname(__file__),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return dict(version=package_version, commit=commit)
+
+
+def run_metadata() -> dict[str, str]:
+    """
+    Returns the date, platform and plugin version stored with every result.
+    """
+    return dict(
+        date=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        python=platform.python_version(),
+        machine=platform.machine(),
+        **plugin_version(),
+    )
+
+
+def previous_results(path: str, key: str) -> dict:
+    """
+    Returns the last stored result for each value of a key, e.g. the export size.
+    """
+    previous = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    previous[record[key]] = record
+    return previous
+
+
+def compare(record: dict, last: dict, stage: str) -> str:
+    """
+    Returns the speedup of a stage against a previous result, empty without one.
+    """
+    seconds = f'{stage}_seconds'
+    if not last or not last.get(seconds) or not record.get(seconds):
+        return ''
+    return f'  {last[seconds] / record[seconds] - 1:+.0%} vs. {last.get("commit")}'
+
+
+def store_results(path: str, records: list[dict]) -> None:
+    """
+    Appends results to a JSON lines file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record) + '\n')
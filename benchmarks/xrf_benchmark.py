@@ -0,0 +1,121 @@
+"""
+Throughput benchmark of the XRF reader and of building the XRF sections.
+
+Synthetic exports of several sizes are generated with `xrf_synthetic`, read with
+`read_xrf_table` and `read_xrf_txt` and written into an `ELNXRayFluorescence`
+section with `read_data_file`. The best time of the repeats is reported in MB/s and
+measurements/s and appended to a JSON lines file together with the version of the
+plugin, so that regressions across versions are visible.
+
+Usage:
+    python benchmarks/xrf_benchmark.py --measurements 100 1000 10000
+"""
+
+import argparse
+import io
+import os
+import tempfile
+
+import nomad.client  # noqa: F401, loads the plugins before the schema packages
+from nomad.datamodel import EntryArchive
+from nomad.datamodel.metainfo.basesections import CompositeSystemReference
+from utils import (
+    RESULTS_DIRECTORY,
+    best_time,
+    compare,
+    previous_results,
+    run_metadata,
+    store_results,
+)
+from xrf_synthetic import generate_xrf_export
+
+from nomad_uibk_plugin.schema_packages import XRFreader
+from nomad_uibk_plugin.schema_packages.XRFschema import ELNXRayFluorescence
+
+RESULTS_FILE = os.path.join(RESULTS_DIRECTORY, 'xrf.jsonl')
+
+
+def benchmark(
+    number_of_measurements: int, duplicates: float, repeats: int
+) -> dict[str, float]:
+    """
+    Benchmarks reading and writing a synthetic export.
+
+    Args:
+        number_of_measurements (int): The number of measurements of the export.
+        duplicates (float): The fraction of repeated measurements.
+        repeats (int): The number of runs of which the fastest is reported.
+
+    Returns:
+        dict[str, float]: The size of the export and the times and throughputs.
+    """
+    data = generate_xrf_export(number_of_measurements, duplicates=duplicates).encode()
+    megabytes = len(data) / 1e6
+
+    def read_table():
+        with io.TextIOWrapper(io.BytesIO(data), encoding='utf-8') as file:
+            XRFreader.read_xrf_table(file)
+
+    def write_sections():
+        archive = EntryArchive()
+        archive.data = xrf = ELNXRayFluorescence(data_file='benchmark.txt')
+        xrf.read_data_file(io.BytesIO(data), XRFreader.iter_xrf_records, archive, None)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.txt')
+        with open(path, 'wb') as file:
+            file.write(data)
+        times = dict(
+            read=best_time(read_table, repeats),
+            read_xrf_txt=best_time(lambda: XRFreader.read_xrf_txt(path), repeats),
+            write_xrf_data=best_time(write_sections, repeats),
+        )
+
+    result = dict(measurements=number_of_measurements, megabytes=megabytes)
+    for stage, seconds in times.items():
+        result[f'{stage}_seconds'] = seconds
+        result[f'{stage}_mb_per_s'] = megabytes / seconds
+        result[f'{stage}_measurements_per_s'] = number_of_measurements / seconds
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--measurements', type=int, nargs='+', default=[100, 1000, 10000]
+    )
+    parser.add_argument('--duplicates', type=float, default=0.1)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument(
+        '--no-store', action='store_true', help='Do not append the results.'
+    )
+    args = parser.parse_args()
+
+    # resolving the samples requires a search index
+    CompositeSystemReference.normalize = lambda self, archive, logger: None
+
+    previous = previous_results(args.output, 'measurements')
+    metadata = dict(**run_metadata(), reader_version=XRFreader.READER_VERSION)
+    records = []
+    print(f'{"measurements":>12} {"MB":>8} {"stage":>15} {"MB/s":>8} {"meas./s":>10}')
+    for number_of_measurements in args.measurements:
+        record = {
+            **metadata,
+            **benchmark(number_of_measurements, args.duplicates, args.repeats),
+        }
+        records.append(record)
+        for stage in ('read', 'read_xrf_txt', 'write_xrf_data'):
+            line = (
+                f'{number_of_measurements:>12} {record["megabytes"]:>8.2f} '
+                f'{stage:>15} {record[f"{stage}_mb_per_s"]:>8.2f} '
+                f'{record[f"{stage}_measurements_per_s"]:>10.0f}'
+            )
+            print(line + compare(record, previous.get(number_of_measurements), stage))
+
+    if not args.no_store:
+        store_results(args.output, records)
+
+
+if __name__ == '__main__':
+    main()
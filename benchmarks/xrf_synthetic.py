@@ -0,0 +1,228 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from collections.abc import Iterator, Sequence
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from nomad_uibk_plugin.schema_packages.XRFreader import LINE_ENERGIES
+
+# Layers of the generated measurements given by their name, elements and the unit of
+# the element fractions
+DEFAULT_LAYERS = (
+    ('CIGS', ('Cu', 'In', 'Ga', 'Se'), 'at%'),
+    ('Mo-layer', ('Mo',), 'mass%'),
+)
+
+# Elements of the substrate, which are reported without layer
+DEFAULT_SUBSTRATE = ('Na', 'Fe')
+
+# Typical thicknesses in nm of the layers, other layers get 100 nm
+LAYER_THICKNESSES = {'CIGS': 1850.0, 'CdS': 50.0, 'Mo-layer': 510.0}
+
+# Typical fractions of the elements, other elements get equal shares of a layer
+ELEMENT_FRACTIONS = {'Cu': 22.5, 'In': 17.0, 'Ga': 8.5, 'Se': 52.0, 'Na': 0.1}
+
+# Relative standard deviation of the generated values
+VARIATION = 0.02
+
+HEADER = 'Fischerscope X-RAY export\n'
+SEPARATOR = '_' * 120 + '\n'
+
+
+def element_line(element: str) -> str:
+    """
+    Returns the K-alpha line of an element, the L-alpha line if only that is known.
+    """
+    line = f'{element}-Ka'
+    if line not in LINE_ENERGIES and f'{element}-La' in LINE_ENERGIES:
+        return f'{element}-La'
+    return line
+
+
+def format_date(date: datetime) -> str:
+    """
+    Formats a date like the instrument, e.g. `2024- 3- 3  9:33`.
+    """
+    return f'{date.year}-{date.month:2d}-{date.day:2d} {date.hour:2d}:{date.minute:02d}'
+
+
+def row(label: str, values: Sequence) -> str:
+    """
+    Returns a tab separated row of the export.
+    """
+    return '\t'.join([label, *map(str, values)]) + '\n'
+
+
+def generate_measurement(  # noqa: PLR0913
+    rng: np.random.Generator,
+    *,
+    position: str,
+    application: str,
+    sample_name: str,
+    date: datetime,
+    layers: Sequence[tuple[str, Sequence[str], str]],
+    substrate: Sequence[str],
+) -> str:
+    """
+    Generates one measurement block of an export.
+
+    Args:
+        rng (np.random.Generator): The random number generator.
+        position (str): The position of the measurement, e.g. `1-2`.
+        application (str): The name of the application.
+        sample_name (str): The name of the sample.
+        date (datetime): The date of the measurement.
+        layers (Sequence[tuple[str, Sequence[str], str]]): The name, elements and
+            fraction unit of each layer.
+        substrate (Sequence[str]): The elements of the substrate.
+
+    Returns:
+        str: The measurement block without separator.
+    """
+    block = [
+        row('PositionType', ['Application', 'Sample name', 'Date', '']),
+        row(position, ['Quant analysis', application, sample_name, format_date(date)]),
+        '\n',
+    ]
+
+    names, values, units = [], [], []
+    for name, elements, unit in layers:
+        thickness = LAYER_THICKNESSES.get(name, 100.0)
+        names.append(name)
+        values.append(f'{thickness * (1 + VARIATION * rng.standard_normal()):.1f}')
+        units.append('nm')
+        fractions = np.array(
+            [ELEMENT_FRACTIONS.get(element, 1.0) for element in elements]
+        ) * (1 + VARIATION * rng.standard_normal(len(elements)))
+        fractions *= 100 / fractions.sum()
+        names.extend(elements)
+        values.extend(f'{fraction:.2f}' for fraction in fractions)
+        units.extend([unit] * len(elements))
+    block += [
+        row('Component', names),
+        row('Analyzed value', values),
+        row('Unit', units),
+    ]
+    if substrate:
+        fractions = [
+            ELEMENT_FRACTIONS.get(element, 0.05)
+            * (1 + VARIATION * rng.standard_normal())
+            for element in substrate
+        ]
+        block += [
+            row('Component', substrate),
+            row('Analyzed value', [f'{fraction:.2f}' for fraction in fractions]),
+            row('Unit', ['mass%'] * len(substrate)),
+        ]
+
+    elements = list(dict.fromkeys(e for _, layer, _ in layers for e in layer))
+    lines = [element_line(element) for element in elements]
+    peaks = rng.uniform(50, 3000, len(elements))
+    backgrounds = rng.uniform(3, 30, len(elements))
+    block += [
+        row('Component', elements),
+        row('Element line', lines),
+        row('Peak intensity', [f'{peak:.1f}' for peak in peaks]),
+        row('BG intensity', [f'{background:.1f}' for background in backgrounds]),
+        '\n',
+    ]
+
+    # some lines have a second background region
+    second = rng.random(len(elements)) < 0.3  # noqa: PLR2004
+    background_lines, kinds, intensities = [], [], []
+    for line, background, has_second in zip(lines, backgrounds, second):
+        background_lines.append(line)
+        kinds.append('BG1')
+        intensities.append(f'{background:.1f}')
+        if has_second:
+            background_lines.append(line)
+            kinds.append('BG2')
+            intensities.append(f'{background * rng.uniform(0.9, 1.1):.1f}')
+    block += [
+        row('Element line', background_lines),
+        row('Peak/BG', kinds),
+        row('Meas. intensity', intensities),
+    ]
+    return ''.join(block)
+
+
+def iter_xrf_export(  # noqa: PLR0913
+    number_of_measurements: int = 100,
+    *,
+    layers: Sequence[tuple[str, Sequence[str], str]] = DEFAULT_LAYERS,
+    substrate: Sequence[str] = DEFAULT_SUBSTRATE,
+    number_of_samples: int = None,
+    duplicates: float = 0.0,
+    seed: int = 0,
+) -> Iterator[str]:
+    """
+    Generates a synthetic UIBK XRF `.txt` export piece by piece. The same arguments
+    always generate the same export.
+
+    Args:
+        number_of_measurements (int): The number of measurements.
+        layers (Sequence[tuple[str, Sequence[str], str]]): The name, elements and
+            fraction unit of each layer.
+        substrate (Sequence[str]): The elements of the substrate. Like in real
+            exports, they follow a metal layer such as `Mo-layer`.
+        number_of_samples (int): The number of different samples, defaults to one
+            sample per measurement.
+        duplicates (float): The fraction of measurements repeating the application
+            and sample of an earlier measurement at another position.
+        seed (int): The seed of the random number generator.
+
+    Yields:
+        str: The header and then each measurement with its separator.
+    """
+    rng = np.random.default_rng(seed)
+    if number_of_samples is None:
+        number_of_samples = number_of_measurements
+    application = ' on '.join(name for name, _, _ in layers) or 'Substrate'
+    date = datetime(2024, 3, 3, 9, 0)
+    measured = []
+    yield HEADER + SEPARATOR
+    for index in range(number_of_measurements):
+        if measured and rng.random() < duplicates:
+            sample_name = measured[rng.integers(len(measured))]
+        else:
+            sample_name = f'W{index % number_of_samples:05d}_A1'
+            measured.append(sample_name)
+        position = f'{index // 100 + 1}-{index % 100 + 1}'
+        date += timedelta(minutes=int(rng.integers(1, 10)))
+        yield (
+            generate_measurement(
+                rng,
+                position=position,
+                application=application,
+                sample_name=sample_name,
+                date=date,
+                layers=layers,
+                substrate=substrate,
+            )
+            + SEPARATOR
+        )
+
+
+def generate_xrf_export(number_of_measurements: int = 100, **kwargs) -> str:
+    """
+    Returns a synthetic UIBK XRF `.txt` export, see `iter_xrf_export` for the
+    arguments.
+    """
+    return ''.join(iter_xrf_export(number_of_measurements, **kwargs))
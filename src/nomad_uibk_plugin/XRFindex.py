@@ -0,0 +1,339 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import os
+from collections.abc import Iterable, Mapping
+from typing import TYPE_CHECKING, Union
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from nomad_uibk_plugin.schema_packages import XRFreader
+
+if TYPE_CHECKING:
+    from structlog.stdlib import (
+        BoundLogger,
+    )
+
+
+# Elements whose atomic fractions are features of the layers by default
+INDEX_ELEMENTS = ('Cu', 'Ga', 'In', 'Se')
+
+# Minimal number of added or removed layers before the tree is rebuilt, fewer layers
+# are searched by brute force next to the tree
+REBUILD_THRESHOLD = 1024
+
+
+def layer_features(
+    table: XRFreader.XRFTable,
+    layer: str = 'CIGS',
+    elements: Iterable[str] = INDEX_ELEMENTS,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the feature vectors of all layers with the given name: the thickness in
+    `THICKNESS_UNIT`, the GGI, the CGI and the atomic fractions of the elements.
+    Layers with an undefined thickness, GGI or CGI are left out.
+
+    Args:
+        table (XRFTable): The table of the measurements.
+        layer (str): The name of the layers.
+        elements (Iterable[str]): The elements whose fractions are features.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The measurement of each layer and the features
+        with one row per layer.
+    """
+    elements = tuple(elements)
+    ratios = {name: XRFreader.RATIOS[name] for name in ('GGI', 'CGI')}
+    first_rows, values = XRFreader.layer_ratios(table, ratios)
+    _, fractions = XRFreader.layer_fractions(table, elements)
+    features = np.column_stack(
+        [
+            table.thickness[first_rows],
+            values['GGI'],
+            values['CGI'],
+            *(fractions[element] for element in elements),
+        ]
+    )
+    selected = (table.layer[first_rows] == layer) & ~np.isnan(features).any(axis=1)
+    return table.measurement[first_rows[selected]], features[selected]
+
+
+class XRFLayerIndex:
+    """
+    Nearest neighbour index over the feature vectors of the layers of
+    `ELNXRayFluorescence` results, see `layer_features`.
+
+    The index is a standalone tool for local archives and is not updated when
+    entries are parsed or normalized, since an entry cannot write to a store shared
+    by all entries. Build it with `from_archives` and keep it with `save` and `load`.
+
+    The features are scaled by their standard deviation and searched in a KD-tree.
+    Layers added after the tree was built are searched by brute force until their
+    number exceeds `REBUILD_THRESHOLD` or a tenth of the index, then the tree is
+    rebuilt. Updating an entry replaces all of its layers.
+    """
+
+    def __init__(
+        self, layer: str = 'CIGS', elements: Iterable[str] = INDEX_ELEMENTS
+    ) -> None:
+        self.layer = layer
+        self.elements = tuple(elements)
+        self.entry_ids = np.zeros(0, dtype=object)
+        self.results = np.zeros(0, dtype=int)
+        self.features = np.zeros((0, len(self.feature_names)))
+        self._removed = np.zeros(0, dtype=bool)
+        self._rows = {}
+        self._size = 0
+        self._added = []
+        self._removed_rows = []
+        self._tree = None
+        self._tree_size = 0
+        self._scale = np.ones(len(self.feature_names))
+
+    @property
+    def feature_names(self) -> tuple[str, ...]:
+        """The names of the features in the order of the feature vectors."""
+        return ('thickness', 'GGI', 'CGI', *self.elements)
+
+    def __len__(self) -> int:
+        self._consolidate()
+        return int(np.count_nonzero(~self._removed))
+
+    def _consolidate(self) -> None:
+        """
+        Appends the layers added since the last call to the arrays and marks the
+        removed ones, so that updates only copy the arrays once per query.
+        """
+        if self._added:
+            entry_ids, results, features = zip(*self._added)
+            self.entry_ids = np.concatenate([self.entry_ids, *entry_ids])
+            self.results = np.concatenate([self.results, *results])
+            self.features = np.vstack([self.features, *features])
+            self._removed = np.append(
+                self._removed, np.zeros(len(self.results) - len(self._removed), bool)
+            )
+            self._added = []
+        if self._removed_rows:
+            self._removed[np.concatenate(self._removed_rows)] = True
+            self._removed_rows = []
+
+    def update(self, entry_id: str, table: XRFreader.XRFTable) -> None:
+        """
+        Replaces the layers of an entry by the layers of its results.
+
+        Args:
+            entry_id (str): The id of the `ELNXRayFluorescence` entry.
+            table (XRFTable): The table of all results of the entry, e.g. from
+                `results_table`.
+        """
+        self.remove(entry_id)
+        results, features = layer_features(table, self.layer, self.elements)
+        if not len(results):
+            return
+        self._added.append(
+            (np.full(len(results), entry_id, dtype=object), results, features)
+        )
+        self._rows[entry_id] = np.arange(self._size, self._size + len(results))
+        self._size += len(results)
+
+    def remove(self, entry_id: str) -> None:
+        """
+        Removes the layers of an entry.
+
+        Args:
+            entry_id (str): The id of the entry.
+        """
+        rows = self._rows.pop(entry_id, None)
+        if rows is not None:
+            self._removed_rows.append(rows)
+
+    def rebuild(self) -> None:
+        """
+        Drops the removed layers and builds the KD-tree over all layers.
+        """
+        self._consolidate()
+        keep = ~self._removed
+        self.entry_ids = self.entry_ids[keep]
+        self.results = self.results[keep]
+        self.features = self.features[keep]
+        self._removed = self._removed[keep]
+        self._size = len(self.results)
+        entry_ids, inverse = np.unique(self.entry_ids.astype(str), return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.cumsum(np.bincount(inverse, minlength=len(entry_ids)))[:-1]
+        self._rows = dict(zip(entry_ids.tolist(), np.split(order, bounds)))
+        scale = self.features.std(axis=0) if len(self.features) else self._scale
+        self._scale = np.where(scale > 0, scale, 1.0)
+        self._tree = (
+            cKDTree(self.features / self._scale) if len(self.features) else None
+        )
+        self._tree_size = len(self.features)
+
+    def _needs_rebuild(self) -> bool:
+        pending = len(self.features) - self._tree_size
+        pending += np.count_nonzero(self._removed[: self._tree_size])
+        return pending > max(REBUILD_THRESHOLD, self._tree_size // 10)
+
+    def query(
+        self, features: Union[Mapping[str, float], np.ndarray], k: int = 5
+    ) -> list[tuple[str, int, float]]:
+        """
+        Finds the k layers closest to the given features.
+
+        Args:
+            features (Union[Mapping[str, float], np.ndarray]): The feature vector or
+                the value of every feature by name.
+            k (int): The number of layers to find.
+
+        Returns:
+            list[tuple[str, int, float]]: The entry id, the result index and the
+            scaled distance of each layer, closest first and earlier added first
+            for equal distances.
+        """
+        if isinstance(features, Mapping):
+            features = [features[name] for name in self.feature_names]
+        point = np.asarray(features, dtype=np.float64)
+        self._consolidate()
+        if self._tree is None or self._needs_rebuild():
+            self.rebuild()
+        point = point / self._scale
+
+        indices = np.zeros(0, dtype=int)
+        distances = np.zeros(0)
+        if self._tree is not None:
+            removed = int(np.count_nonzero(self._removed[: self._tree_size]))
+            count = min(k + removed, self._tree_size)
+            tree_distances, tree_indices = self._tree.query(point, k=count)
+            indices = np.atleast_1d(tree_indices)
+            distances = np.atleast_1d(tree_distances)
+        pending = np.arange(self._tree_size, len(self.features))
+        indices = np.concatenate([indices, pending])
+        distances = np.concatenate(
+            [
+                distances,
+                np.linalg.norm(self.features[pending] / self._scale - point, axis=1),
+            ]
+        )
+        valid = ~self._removed[indices]
+        indices, distances = indices[valid], distances[valid]
+        order = np.lexsort((indices, distances))[:k]
+        return [
+            (str(self.entry_ids[index]), int(self.results[index]), float(distance))
+            for index, distance in zip(indices[order], distances[order])
+        ]
+
+    def query_table(
+        self, table: XRFreader.XRFTable, k: int = 5
+    ) -> list[list[tuple[str, int, float]]]:
+        """
+        Finds the k layers closest to each layer of the given measurements.
+
+        Args:
+            table (XRFTable): The table of the measurements.
+            k (int): The number of layers to find for each layer.
+
+        Returns:
+            list[list[tuple[str, int, float]]]: The neighbours of each layer with the
+            name of the index, in the order of the measurements.
+        """
+        _, features = layer_features(table, self.layer, self.elements)
+        return [self.query(vector, k) for vector in features]
+
+    def save(self, path: str) -> None:
+        """
+        Writes the index to a compressed numpy file.
+
+        Args:
+            path (str): The path of the `.npz` file.
+        """
+        self._consolidate()
+        keep = ~self._removed
+        np.savez_compressed(
+            path,
+            layer=self.layer,
+            elements=np.array(self.elements, dtype=str),
+            entry_ids=self.entry_ids[keep].astype(str),
+            results=self.results[keep],
+            features=self.features[keep],
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'XRFLayerIndex':
+        """
+        Reads an index written by `save`.
+
+        Args:
+            path (str): The path of the `.npz` file.
+
+        Returns:
+            XRFLayerIndex: The index.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(str(data['layer']), data['elements'].tolist())
+            index.entry_ids = data['entry_ids'].astype(object)
+            index.results = data['results']
+            index.features = data['features']
+        index._removed = np.zeros(len(index.results), dtype=bool)
+        index.rebuild()
+        return index
+
+    @classmethod
+    def from_archives(
+        cls,
+        paths: Iterable[str],
+        layer: str = 'CIGS',
+        elements: Iterable[str] = INDEX_ELEMENTS,
+        logger: 'BoundLogger' = None,
+    ) -> 'XRFLayerIndex':
+        """
+        Builds an index from local archive files, e.g. downloaded
+        `*.archive.json` files. Archives without `ELNXRayFluorescence` data are
+        skipped.
+
+        Args:
+            paths (Iterable[str]): The paths of the archive json files.
+            layer (str): The name of the indexed layers.
+            elements (Iterable[str]): The elements whose fractions are features.
+            logger (BoundLogger): A structlog logger.
+
+        Returns:
+            XRFLayerIndex: The index.
+        """
+        from nomad.datamodel import EntryArchive
+
+        from nomad_uibk_plugin.schema_packages.XRFschema import ELNXRayFluorescence
+
+        index = cls(layer, elements)
+        for path in paths:
+            with open(path, encoding='utf-8') as file:
+                archive_dict = json.load(file)
+            archive = EntryArchive.m_from_dict(archive_dict)
+            if not isinstance(archive.data, ELNXRayFluorescence):
+                if logger is not None:
+                    logger.warn(f'No XRF measurement found in archive: "{path}".')
+                continue
+            entry_id = None
+            if archive.metadata is not None:
+                entry_id = archive.metadata.entry_id
+            if entry_id is None:
+                entry_id = os.path.basename(path)
+            index.update(entry_id, archive.data.results_table())
+        index.rebuild()
+        return index
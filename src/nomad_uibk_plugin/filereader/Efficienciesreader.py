@@ -0,0 +1,343 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import csv
+import io
+import itertools
+import re
+import warnings
+from functools import cache
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+import pandas as pd
+from nomad.units import ureg
+
+if TYPE_CHECKING:
+    from structlog.stdlib import BoundLogger
+
+# Columns of the efficiency tables and the patterns matching their headers in the
+# exports of the solar simulators, e.g. `Eff (%)` or `Jsc [mA/cm²]`
+COLUMN_PATTERNS = {
+    'cell_id': re.compile(r'^(cell|device|pixel|name|id)\b', re.IGNORECASE),
+    'efficiency': re.compile(r'^(eff|efficiency|pce|eta|η)\b', re.IGNORECASE),
+    'open_circuit_voltage': re.compile(r'^(voc|v_oc|uoc)\b', re.IGNORECASE),
+    'short_circuit_current_density': re.compile(r'^(jsc|j_sc)\b', re.IGNORECASE),
+    'fill_factor': re.compile(r'^(ff|fill ?factor)\b', re.IGNORECASE),
+}
+
+# Units the measured columns are converted to, headers without unit are assumed to
+# be given in these units
+COLUMN_UNITS = {
+    'efficiency': 'percent',
+    'open_circuit_voltage': 'V',
+    'short_circuit_current_density': 'mA/cm**2',
+    'fill_factor': 'percent',
+}
+
+# Unit in brackets after the name of a column, e.g. `mV` in `Voc (mV)`
+UNIT_RE = re.compile(r'[(\[]\s*([^)\]]*?)\s*[)\]]')
+
+# Exponents written after a unit symbol, e.g. `cm2`, `cm²` or `m-2`
+EXPONENT_RE = re.compile(r'([a-zA-Z])\^?(-?\d+|²|⁻²)')
+
+# Cell ids of summary rows below the cells, e.g. `Mean` or `Std. dev.`
+SUMMARY_RE = re.compile(
+    r'^(mean|average|avg|median|std|stdev|max|min|best|total)\b', re.IGNORECASE
+)
+
+# Measured parameters of the cells in the order of the value arrays
+COLUMNS = tuple(column for column in COLUMN_PATTERNS if column != 'cell_id')
+
+# Largest modified z-score of cells which are not flagged as outliers
+OUTLIER_THRESHOLD = 3.5
+
+# Columns which have to be found to recognize the header row
+REQUIRED_COLUMNS = ('efficiency', 'open_circuit_voltage')
+
+# Number of rows at the start of a file searched for the header row
+HEADER_ROWS = 30
+
+
+def column_unit(name: str) -> Optional[str]:
+    """
+    Returns the unit in brackets of a column header, e.g. `mA/cm²` for
+    `Jsc [mA/cm²]`, None if the header has no unit.
+    """
+    match = UNIT_RE.search(str(name))
+    if match is None or not match.group(1):
+        return None
+    return match.group(1)
+
+
+@cache
+def unit_factor(unit: str, target: str) -> float:
+    """
+    Returns the factor for converting values from the unit of a column header to
+    `target`. Every unit is only parsed once.
+
+    Args:
+        unit (str): The unit of the header, e.g. `mV`, `%` or `A/m2`.
+        target (str): The unit to convert to.
+
+    Returns:
+        float: The conversion factor.
+
+    Raises:
+        ValueError: If the unit is unknown or cannot be converted to `target`.
+    """
+    expression = unit.replace('%', 'percent').replace('·', ' ').replace('*', ' ')
+    expression = EXPONENT_RE.sub(
+        lambda match: (
+            f'{match.group(1)}**'
+            + {'²': '2', '⁻²': '-2'}.get(match.group(2), match.group(2))
+        ),
+        expression,
+    )
+    try:
+        return float(ureg(expression).to(target).magnitude)
+    except Exception as e:
+        raise ValueError(f'Unknown unit "{unit}" for "{target}".') from e
+
+
+def match_columns(header: list[str]) -> dict[str, int]:
+    """
+    Returns the position of each known column in a header row, the first matching
+    header wins.
+    """
+    positions = {}
+    for position, name in enumerate(header):
+        for column, pattern in COLUMN_PATTERNS.items():
+            if column not in positions and pattern.match(str(name).strip()):
+                positions[column] = position
+                break
+    return positions
+
+
+def find_header(rows: list[list[str]]) -> Optional[tuple[int, dict[str, int]]]:
+    """
+    Finds the header row in the first rows of a table.
+
+    Returns:
+        Optional[tuple[int, dict[str, int]]]: The index of the header row and the
+        position of each known column, None if no header row was found.
+    """
+    for index, row in enumerate(rows[:HEADER_ROWS]):
+        positions = match_columns(row)
+        if all(column in positions for column in REQUIRED_COLUMNS):
+            return index, positions
+    return None
+
+
+def split_rows(text: str) -> list[list[str]]:
+    """
+    Splits the text of a csv file into its rows, the delimiter is detected from the
+    start of the text.
+    """
+    try:
+        delimiter = csv.Sniffer().sniff(text[:4096], delimiters=',;\t').delimiter
+    except csv.Error:
+        delimiter = ','
+    return list(csv.reader(io.StringIO(text), delimiter=delimiter))
+
+
+def read_raw_table(file_path: str, number_of_rows: int = None) -> pd.DataFrame:
+    """
+    Reads the cells of a csv or xlsx file as strings without interpreting a header.
+    The delimiter of csv files is detected from their start.
+
+    Args:
+        file_path (str): The path of the csv or xlsx file.
+        number_of_rows (int): The number of rows to read, all rows by default.
+
+    Returns:
+        pd.DataFrame: The cells with integer column labels.
+    """
+    if file_path.lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(file_path, header=None, dtype=str, nrows=number_of_rows)
+    with open(file_path, encoding='utf-8-sig', errors='replace') as file:
+        if number_of_rows is None:
+            text = file.read()
+        else:
+            text = ''.join(itertools.islice(file, number_of_rows))
+    return pd.DataFrame(split_rows(text))
+
+
+def is_efficiency_table(file_path: str, buffer: str = None) -> bool:
+    """
+    Returns whether a csv or xlsx file has a header row with efficiency and Voc
+    columns.
+
+    Args:
+        file_path (str): The path of the csv or xlsx file.
+        buffer (str): The decoded start of a csv file. If given, only the buffer is
+            searched for the header row and the file is not opened. Xlsx files
+            only load the rows searched for the header.
+
+    Returns:
+        bool: Whether the file is an efficiency table.
+    """
+    if buffer is not None and not file_path.lower().endswith(('.xlsx', '.xls')):
+        # the last line of the buffer might be cut off
+        rows = split_rows(buffer.rsplit('\n', 1)[0] if '\n' in buffer else buffer)
+    else:
+        rows = read_raw_table(file_path, HEADER_ROWS).fillna('').values.tolist()
+    return find_header(rows) is not None
+
+
+def read_efficiency_table(
+    file_path: str, logger: 'BoundLogger' = None
+) -> Optional[pd.DataFrame]:
+    """
+    Reads the cell results of a solar simulator export.
+
+    Args:
+        file_path (str): The path of the csv or xlsx file.
+        logger (BoundLogger): A structlog logger.
+
+    Returns:
+        Optional[pd.DataFrame]: The columns of `COLUMN_PATTERNS` with one row per
+        cell in the `COLUMN_UNITS`, missing values are NaN. None if no header row
+        was found or a column has an unknown unit.
+    """
+    raw = read_raw_table(file_path)
+    header = find_header(raw.head(HEADER_ROWS).fillna('').values.tolist())
+    if header is None:
+        if logger is not None:
+            logger.warn(f'No efficiency and Voc columns found in "{file_path}".')
+        return None
+    index, positions = header
+
+    factors = {}
+    units = {}
+    for column, target in COLUMN_UNITS.items():
+        unit = units[column] = (
+            column_unit(raw.iloc[index, positions[column]])
+            if column in positions
+            else None
+        )
+        try:
+            factors[column] = 1.0 if unit is None else unit_factor(unit, target)
+        except ValueError as e:
+            if logger is not None:
+                logger.warn(f'Could not read "{file_path}": {e}')
+            return None
+
+    rows = raw.iloc[index + 1 :]
+    table = pd.DataFrame(index=range(len(rows)))
+    for column in COLUMN_PATTERNS:
+        if column not in positions:
+            table[column] = '' if column == 'cell_id' else np.nan
+            continue
+        values = rows.iloc[:, positions[column]].reset_index(drop=True)
+        if column == 'cell_id':
+            table[column] = values.fillna('').str.strip()
+        else:
+            # decimal commas are used in files with semicolon delimiters
+            table[column] = factors[column] * pd.to_numeric(
+                values.fillna('').astype(str).str.replace(',', '.', regex=False),
+                errors='coerce',
+            )
+
+    # drop empty and summary rows
+    measured = table['efficiency'].notna() | table['open_circuit_voltage'].notna()
+    table = table[measured & ~table['cell_id'].str.match(SUMMARY_RE)]
+    table = table.reset_index(drop=True)
+    missing = table['cell_id'] == ''
+    table.loc[missing, 'cell_id'] = [f'Cell {i + 1}' for i in np.flatnonzero(missing)]
+
+    # fill factors without unit given as fraction instead of percent, a header with
+    # unit is converted by its factor
+    fill_factor = table['fill_factor']
+    if (
+        units['fill_factor'] is None
+        and fill_factor.notna().any()
+        and fill_factor.max() <= 1
+    ):
+        table['fill_factor'] = fill_factor * 100
+    return table
+
+
+def flag_outliers(
+    values: np.ndarray, threshold: float = OUTLIER_THRESHOLD
+) -> np.ndarray:
+    """
+    Flags cells whose parameters deviate from the median of all cells by more than
+    `threshold` in the modified z-score `0.6745 * (x - median) / MAD`, or which are
+    unphysical, i.e. negative or fill factors above 100 %.
+
+    Args:
+        values (np.ndarray): The efficiency, Voc, Jsc and fill factor of the cells
+            with one row per cell, NaN values are ignored.
+        threshold (float): The largest modified z-score of regular cells.
+
+    Returns:
+        np.ndarray: Whether each cell is an outlier.
+    """
+    values = np.asarray(values, dtype=float).reshape(len(values), -1)
+    outliers = np.zeros(len(values), dtype=bool)
+    if not len(values):
+        return outliers
+    # parameters without any value give all-NaN slices
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(values, axis=0)
+        deviation = np.nanmedian(np.abs(values - median), axis=0)
+        score = 0.6745 * np.abs(values - median) / deviation
+    score[:, ~(deviation > 0)] = 0
+    outliers |= (np.nan_to_num(score) > threshold).any(axis=1)
+    outliers |= (values < 0).any(axis=1)
+    outliers |= values[:, COLUMNS.index('fill_factor')] > 100  # noqa: PLR2004
+    return outliers
+
+
+def cell_statistics(values: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Returns the statistics of each parameter of the cells.
+
+    Args:
+        values (np.ndarray): The parameters of the cells with one row per cell, NaN
+            values are ignored.
+
+    Returns:
+        dict[str, np.ndarray]: The mean, standard deviation, median, minimum and
+        maximum of each parameter and the number of cells with a value.
+    """
+    values = np.asarray(values, dtype=float).reshape(len(values), -1)
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sums = np.where(valid, values, 0).sum(axis=0)
+        mean = sums / counts
+        squares = np.where(valid, (values - mean) ** 2, 0).sum(axis=0)
+        std = np.sqrt(squares / (counts - 1))
+    std[counts < 2] = np.nan  # noqa: PLR2004
+    empty = counts == 0
+    statistics = dict(
+        mean=mean,
+        standard_deviation=std,
+        median=np.full(values.shape[1], np.nan),
+        minimum=np.full(values.shape[1], np.nan),
+        maximum=np.full(values.shape[1], np.nan),
+        number_of_cells=counts,
+    )
+    if (~empty).any():
+        statistics['median'][~empty] = np.nanmedian(values[:, ~empty], axis=0)
+        statistics['minimum'][~empty] = np.nanmin(values[:, ~empty], axis=0)
+        statistics['maximum'][~empty] = np.nanmax(values[:, ~empty], axis=0)
+    return statistics
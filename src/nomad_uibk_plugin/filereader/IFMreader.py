@@ -16,13 +16,12 @@
 # limitations under the License.
 #
 
-import locale
 import re
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import TYPE_CHECKING, TextIO
+from typing import TYPE_CHECKING, Any, TextIO
 
-import tensorflow as tf
+from pint.errors import UndefinedUnitError
 
 from nomad_uibk_plugin.schema_packages.IFMschema import IFMMeasurement, IFMModel, ureg
 
@@ -30,8 +29,37 @@ if TYPE_CHECKING:
     from nomad.datamodel.datamodel import EntryArchive
     from structlog.stdlib import BoundLogger
 
-# set locale for parsing dates
-locale.setlocale(locale.LC_TIME, 'de_DE.UTF-8')
+
+BOOLEANS = {'Ja': True, 'Nein': False}
+GERMAN_MONTHS = {
+    'januar': 1,
+    'jänner': 1,
+    'februar': 2,
+    'märz': 3,
+    'maerz': 3,
+    'april': 4,
+    'mai': 5,
+    'juni': 6,
+    'juli': 7,
+    'august': 8,
+    'september': 9,
+    'oktober': 10,
+    'november': 11,
+    'dezember': 12,
+}
+GERMAN_DATETIME_RE = re.compile(
+    r'(?:[^\W\d_]+,\s*)?(\d{1,2})\.\s*([^\W\d_]+)\.?\s+(\d{4})\s+'
+    r'(\d{1,2}):(\d{2}):(\d{2})'
+)
+NUMBER_RE = re.compile(r'^([-+]?\d+(?:\.\d+)?)\s*([a-zA-Zµ]*)$')
+
+# XML elements read from the IFM xml file and the metadata they are stored in
+XML_FIELDS = {
+    ('Object3D', 'generalData', 'name'): 'sample_id',
+    ('Object3D', 'generalData', 'deviceName'): 'device',
+    ('Object3D', 'generalData', 'description'): 'description',
+    ('Object3D', 'ifmData', 'magnification'): 'magnification',
+}
 
 
 def read_ifm_xml(
@@ -39,56 +67,197 @@ def read_ifm_xml(
 ) -> IFMMeasurement:
     """
     Reads the metadata from the IFM xml file and returns an IFMMeasurement object.
+    The file is parsed incrementally and only until all fields of interest are found.
     """
-    tree = ET.parse(file_obj)
-    root = tree.getroot()
+    fields = {}
+    path = []
+    for event, element in ET.iterparse(file_obj, events=('start', 'end')):
+        if event == 'start':
+            # check if the file is an IFM xml file
+            if not path and element.attrib.get('type') != 'IFM':
+                logger.warn('The file is not an IFM xml file.')
+                return None
+            path.append(element.tag)
+            continue
 
-    # check if the file is an IFM xml file
-    if root.attrib.get('type') != 'IFM':
-        logger.warn('The file is not an IFM xml file.')
-        return None
+        key = XML_FIELDS.get(tuple(path))
+        if key is not None:
+            fields[key] = element.text
+            if len(fields) == len(XML_FIELDS):
+                break
+        path.pop()
+        element.clear()
 
     # parse metadata from description field
-    description = root.find('.//description').text
-    metadata = parse_description_field(description)
+    metadata = {}
+    if fields.get('description'):
+        metadata = parse_description_field(fields['description'])
 
     # parse other XML fields
-    sample_id = root.find('.//generalData/name').text
-    if sample_id:
-        metadata['sample_id'] = sample_id
-    device = root.find('.//generalData/deviceName').text
-    if device:
-        metadata['device'] = device
-    magnification = root.find('.//ifmData/magnification').text
-    if magnification:
-        metadata['magnification'] = float(magnification)
+    if fields.get('sample_id'):
+        metadata['sample_id'] = fields['sample_id']
+    if fields.get('device'):
+        metadata['device'] = fields['device']
+    if fields.get('magnification'):
+        metadata['magnification'] = float(fields['magnification'])
 
     # return IFMMeasurement object with metadata
     return IFMMeasurement(**metadata)
 
 
+def tokenize_description(description: str) -> dict[str, Any]:
+    """
+    Splits the description field into its `Key: value` lines in a single pass.
+
+    Indented lines following a key without value, e.g. the coordinates below
+    `Startposition der Messung:`, are collected in a nested dictionary. Keys
+    without value and without indented lines are section headings and skipped.
+    All values are returned as stripped strings.
+    """
+    fields = {}
+    block = None
+    for line in description.splitlines():
+        key, separator, value = line.strip().partition(':')
+        if not separator:
+            block = None
+            continue
+        key, value = key.strip(), value.strip()
+        if line[:1].isspace() and block is not None:
+            block[key] = value
+        elif value:
+            fields[key] = value
+            block = None
+        else:
+            block = fields[key] = {}
+
+    return {key: value for key, value in fields.items() if value != {}}
+
+
+def parse_value(value: str) -> Any:
+    """
+    Converts a value of the description field into a bool, number, quantity with
+    unit, or leaves it as string.
+    """
+    if value in BOOLEANS:
+        return BOOLEANS[value]
+    match = NUMBER_RE.match(value)
+    if not match:
+        return value
+    number, unit = match.groups()
+    if not unit:
+        return float(number) if '.' in number else int(number)
+    try:
+        return ureg.Quantity(float(number), unit)
+    except (UndefinedUnitError, ValueError):
+        return value
+
+
+def parse_datetime(value: str) -> datetime:
+    """
+    Converts e.g. `Montag, 30. September 2024 16:17:34` into a datetime.
+
+    German month names are resolved with a lookup table instead of setting the
+    process-wide locale, so metadata can be parsed concurrently on any host.
+    Abbreviated month names like `Sep.` are accepted as well.
+    """
+    match = GERMAN_DATETIME_RE.fullmatch(value.strip())
+    if not match:
+        raise ValueError(f'Unknown date format: "{value}".')
+    day, month, year, hour, minute, second = match.groups()
+    month = month.lower()
+    for name, number in GERMAN_MONTHS.items():
+        if name.startswith(month) and len(month) >= 3:  # noqa: PLR2004
+            break
+    else:
+        raise ValueError(f'Unknown month: "{month}".')
+    return datetime(int(year), number, int(day), int(hour), int(minute), int(second))
+
+
+def parse_position(value: dict[str, str]) -> Any:
+    """
+    Converts an `x`, `y`, `z` block into a position vector in meter.
+    """
+    return ureg.Quantity(
+        [parse_value(value[axis]).to('m').magnitude for axis in ('x', 'y', 'z')],
+        'm',
+    )
+
+
+def parse_tile_grid(value: str) -> tuple[int, int]:
+    """
+    Converts e.g. `34 Zeile(n) x 25 Spalte(n)` into the number of rows and columns.
+    """
+    rows, columns = re.findall(r'\d+', value)[:2]
+    return int(rows), int(columns)
+
+
+def parse_histogram_limit(value: str) -> int:
+    """
+    Converts e.g. `255 / 255` into the used histogram limit.
+    """
+    return int(value.split('/', 1)[0])
+
+
+def parse_leading_integer(value: str) -> int:
+    """
+    Converts e.g. the decimation `2 (1, 2)` into its leading integer.
+    """
+    return int(value.split(maxsplit=1)[0])
+
+
+# description keys with the IFMMeasurement quantities and the converter they use
+DESCRIPTION_FIELDS = {
+    'Verarbeitungsstart': ('start_time', parse_datetime),
+    'Verarbeitungsende': ('end_time', parse_datetime),
+    'Benötigte Zeit': ('processing_time', parse_value),
+    'Produkt-ID': ('product_id', str),
+    'IFM Seriennummer': ('serial_number', str),
+    'Startposition der Messung': ('start_position', parse_position),
+    'Endposition der Messung': ('end_position', parse_position),
+    'Geschätzte Vertikale Auflösung': ('vertical_resolution', parse_value),
+    'Geschätzte Laterale Auflösung': ('lateral_resolution', parse_value),
+    'Anzahl der Bilder': (
+        ('number_of_tile_rows', 'number_of_tile_columns'),
+        parse_tile_grid,
+    ),
+    'Vignettierungskorrektur': ('vignetting_correction', parse_value),
+    'Dezimierung': ('decimation', parse_leading_integer),
+    'Belichtungszeit': ('exposure_time', parse_value),
+    'Kontrast': ('contrast', parse_value),
+    'z-Position vor der Messung': ('z_position', parse_value),
+    'Sättigung': ('saturation', parse_value),
+    'Verstärkung': ('gain', parse_value),
+    'Untere Histogrammgrenze': ('histogram_lower_limit', parse_histogram_limit),
+    'Obere Histogrammgrenze': ('histogram_upper_limit', parse_histogram_limit),
+    'XSmartFlash': ('xsmartflash', parse_value),
+    'Autofokus verwendet': ('autofocus', parse_value),
+    'Polarisator': ('polarizer', str),
+    'Aufnahmebereich': ('vertical_scan_range', parse_value),
+    'Beleuchtung koaxiales Licht': ('coaxial_light_intensity', parse_value),
+    'Beleuchtung Ringlicht': ('ring_light_intensity', parse_value),
+    'Systemjustierungs-Status': ('system_adjustment_status', str),
+}
+
+
 def parse_description_field(description: str) -> dict:
+    """
+    Parses the description field of the IFM xml file into the typed values of the
+    corresponding IFMMeasurement quantities.
+    """
     metadata = {}
 
-    patterns = {
-        'exposure_time': r'Belichtungszeit:\s*([\d.]+\s*[a-zA-Zµ]+)',
-        'start_time': (
-            r'Verarbeitungsstart:\s*[^\d]*(\d{1,2}\.\s*[^\d]*\s*\d{4}\s*\d{2}:\d{2}:\d{2})'
-        ),
-        'end_time': (
-            r'Verarbeitungsende:\s*[^\d]*(\d{1,2}\.\s*[^\d]*\s*\d{4}\s*\d{2}:\d{2}:\d{2})'
-        ),
-    }
-
-    for key, pattern in patterns.items():
-        match = re.search(pattern, description)
-        if match:
-            # values with units
-            if key in ['exposure_time']:
-                metadata[key] = ureg(match.group(1))
-            elif key in ['start_time', 'end_time']:
-                metadata[key] = datetime.strptime(match.group(1), '%d. %B %Y %H:%M:%S')
-            # todo: add more elifs for other keys
+    for key, value in tokenize_description(description).items():
+        if key not in DESCRIPTION_FIELDS:
+            continue
+        names, converter = DESCRIPTION_FIELDS[key]
+        try:
+            values = converter(value)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            continue
+        if isinstance(names, tuple):
+            metadata.update(zip(names, values))
+        else:
+            metadata[names] = values
 
     return metadata
 
@@ -123,6 +292,8 @@ def read_keras_metadata(
 
     # load the model and extract metadata
     try:
+        import tensorflow as tf
+
         model = tf.keras.models.load_model(file_obj.name)
         params['number_of_layers'] = len(model.layers)
         params['number_of_parameters'] = model.count_params()
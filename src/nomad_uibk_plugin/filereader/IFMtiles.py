@@ -0,0 +1,368 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import base64
+import math
+import os
+
+import numpy as np
+from PIL import Image
+
+# BMP compression types that store plain pixel rows
+BMP_UNCOMPRESSED = (0, 3)
+
+
+class BMPImage:
+    """
+    Read-only, memory-mapped view on an uncompressed BMP file.
+
+    Rows are only read from disk when requested, so arbitrarily large stitched IFM
+    images can be processed strip by strip.
+    """
+
+    def __init__(self, file_path: str):
+        with open(file_path, 'rb') as file:
+            header = file.read(54)
+            if header[:2] != b'BM':
+                raise ValueError(f'"{file_path}" is not a BMP file.')
+            offset = int.from_bytes(header[10:14], 'little')
+            dib_size = int.from_bytes(header[14:18], 'little')
+            width = int.from_bytes(header[18:22], 'little', signed=True)
+            height = int.from_bytes(header[22:26], 'little', signed=True)
+            bits_per_pixel = int.from_bytes(header[28:30], 'little')
+            compression = int.from_bytes(header[30:34], 'little')
+            colors_used = int.from_bytes(header[46:50], 'little')
+
+            if compression not in BMP_UNCOMPRESSED or bits_per_pixel not in (8, 24, 32):
+                raise ValueError(
+                    f'Unsupported BMP format ({bits_per_pixel} bit, '
+                    f'compression {compression}) in "{file_path}".'
+                )
+
+            self.palette = None
+            if bits_per_pixel == 8:  # noqa: PLR2004
+                file.seek(14 + dib_size)
+                palette = np.frombuffer(file.read(4 * (colors_used or 256)), np.uint8)
+                palette = palette.reshape(-1, 4)[:, 2::-1]
+                # grayscale palettes are kept single channel
+                if np.array_equal(palette[:, 0], palette[:, 1]) and np.array_equal(
+                    palette[:, 0], palette[:, 2]
+                ):
+                    palette = palette[:, :1]
+                self.palette = np.ascontiguousarray(palette)
+
+        self.width = width
+        self.height = abs(height)
+        self.channels = bits_per_pixel // 8
+        row_size = (width * self.channels + 3) & ~3
+        self._bottom_up = height > 0
+        self._data = np.memmap(
+            file_path,
+            dtype=np.uint8,
+            mode='r',
+            offset=offset,
+            shape=(self.height, row_size),
+        )
+
+    def read_rows(self, start: int, stop: int) -> np.ndarray:
+        """
+        Returns the rows `start` to `stop` (top to bottom) as `(rows, width, bands)`
+        array. Color images are returned as RGB(A).
+        """
+        if self._bottom_up:
+            rows = self._data[self.height - stop : self.height - start][::-1]
+        else:
+            rows = self._data[start:stop]
+        rows = rows[:, : self.width * self.channels].reshape(
+            stop - start, self.width, self.channels
+        )
+        if self.palette is not None:
+            return self.palette[rows[..., 0]]
+        if self.channels == 3:  # noqa: PLR2004
+            return np.ascontiguousarray(rows[..., ::-1])
+        return np.ascontiguousarray(rows[..., [2, 1, 0, 3]])
+
+
+class ArrayImage:
+    """
+    Fallback for image formats that can not be memory-mapped, e.g. compressed TIFFs.
+    """
+
+    def __init__(self, file_path: str):
+        with Image.open(file_path) as image:
+            if image.mode in ('L', 'RGB', 'RGBA'):
+                data = np.asarray(image)
+            else:
+                data = np.asarray(image.convert('RGB'))
+        self._data = data[..., np.newaxis] if data.ndim == 2 else data  # noqa: PLR2004
+        self.height, self.width, self.channels = self._data.shape
+
+    def read_rows(self, start: int, stop: int) -> np.ndarray:
+        return self._data[start:stop]
+
+
+def open_image(file_path: str) -> 'BMPImage | ArrayImage':
+    """
+    Opens an image for strip-wise reading, memory-mapped if possible.
+    """
+    try:
+        return BMPImage(file_path)
+    except ValueError:
+        return ArrayImage(file_path)
+
+
+def number_of_zoom_levels(width: int, height: int, tile_size: int) -> int:
+    """
+    Number of zoom levels needed until the whole image fits into a single tile.
+    """
+    return max(0, math.ceil(math.log2(max(width, height, 1) / tile_size))) + 1
+
+
+def downsample(rows: np.ndarray) -> np.ndarray:
+    """
+    Halves an image strip with an even number of rows by averaging 2x2 blocks.
+    Odd widths are padded by repeating the last column.
+    """
+    if rows.shape[1] % 2:
+        rows = np.concatenate((rows, rows[:, -1:]), axis=1)
+    rows = rows.astype(np.uint16)
+    summed = rows[0::2, 0::2] + rows[1::2, 0::2] + rows[0::2, 1::2] + rows[1::2, 1::2]
+    return ((summed + 2) // 4).astype(np.uint8)
+
+
+def save_tile(tile: np.ndarray, path: str, image_format: str) -> None:
+    """
+    Saves a tile array of shape `(rows, columns, bands)` as image file.
+    """
+    if tile.shape[2] == 1:
+        tile = tile[..., 0]
+    Image.fromarray(tile).save(path, format=image_format)
+
+
+class TilePyramidWriter:
+    """
+    Incrementally writes a multi-resolution tile pyramid from horizontal strips.
+
+    Strips are pushed top to bottom at full resolution. Each zoom level only buffers
+    the rows of its current tile row, and every complete pair of rows is averaged
+    and forwarded to the next coarser level. Memory therefore scales with
+    `tile_size * width` instead of the image size.
+
+    Tiles are written to `{output_dir}/{zoom}/{column}_{row}.{image_format}`, where
+    zoom level 0 holds the whole image in a single tile and the highest zoom level
+    has full resolution.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        output_dir: str,
+        width: int,
+        height: int,
+        *,
+        tile_size: int = 256,
+        image_format: str = 'png',
+        max_zoom: int = None,
+    ):
+        self.output_dir = output_dir
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.image_format = image_format
+        self.number_of_levels = number_of_zoom_levels(width, height, tile_size)
+        self.full_resolution_zoom = self.number_of_levels - 1
+        # zoom levels finer than `max_zoom` are computed but not written
+        if max_zoom is None or max_zoom > self.full_resolution_zoom:
+            max_zoom = self.full_resolution_zoom
+        self.max_zoom = max_zoom
+        self.number_of_tiles = 0
+
+        self._rows = {zoom: [] for zoom in range(self.number_of_levels)}
+        self._buffered = dict.fromkeys(self._rows, 0)
+        self._tile_row = dict.fromkeys(self._rows, 0)
+        self._carry = dict.fromkeys(self._rows)
+
+        for zoom in range(self.max_zoom + 1):
+            os.makedirs(os.path.join(output_dir, str(zoom)), exist_ok=True)
+
+    def push(self, strip: np.ndarray, zoom: int = None) -> None:
+        """
+        Adds the next strip of rows with shape `(rows, columns, bands)`.
+        """
+        if zoom is None:
+            zoom = self.full_resolution_zoom
+        if zoom <= self.max_zoom:
+            self._rows[zoom].append(strip)
+            self._buffered[zoom] += len(strip)
+            while self._buffered[zoom] >= self.tile_size:
+                self._write_tile_row(zoom, self.tile_size)
+
+        if zoom > 0:
+            if self._carry[zoom] is not None:
+                strip = np.concatenate((self._carry[zoom], strip))
+                self._carry[zoom] = None
+            if len(strip) % 2:
+                self._carry[zoom] = strip[-1:]
+                strip = strip[:-1]
+            if len(strip):
+                self.push(downsample(strip), zoom - 1)
+
+    def close(self) -> None:
+        """
+        Flushes incomplete tile rows and leftover odd rows of all zoom levels.
+        """
+        for zoom in range(self.full_resolution_zoom, -1, -1):
+            if zoom > 0 and self._carry[zoom] is not None:
+                carry = self._carry[zoom]
+                self._carry[zoom] = None
+                self.push(downsample(np.concatenate((carry, carry))), zoom - 1)
+            if zoom <= self.max_zoom and self._buffered[zoom]:
+                self._write_tile_row(zoom, self._buffered[zoom])
+
+    def _write_tile_row(self, zoom: int, number_of_rows: int) -> None:
+        rows = np.concatenate(self._rows[zoom])
+        tile_row, rest = rows[:number_of_rows], rows[number_of_rows:]
+        self._rows[zoom] = [rest] if len(rest) else []
+        self._buffered[zoom] = len(rest)
+
+        for column, x in enumerate(range(0, tile_row.shape[1], self.tile_size)):
+            path = os.path.join(
+                self.output_dir,
+                str(zoom),
+                f'{column}_{self._tile_row[zoom]}.{self.image_format}',
+            )
+            save_tile(tile_row[:, x : x + self.tile_size], path, self.image_format)
+            self.number_of_tiles += 1
+        self._tile_row[zoom] += 1
+
+
+def write_tile_pyramid(
+    image_path: str,
+    output_dir: str,
+    *,
+    tile_size: int = 256,
+    image_format: str = 'png',
+    max_zoom: int = None,
+) -> dict:
+    """
+    Writes a tile pyramid of an image, reading the image strip by strip.
+
+    Args:
+        image_path (str): Path to the image, BMPs are memory-mapped.
+        output_dir (str): Directory the zoom level folders are written to.
+        tile_size (int): Edge length of the square tiles in pixels.
+        image_format (str): Image format of the tiles, e.g. 'png' or 'webp'.
+        max_zoom (int): Finest zoom level to write. Defaults to full resolution.
+
+    Returns:
+        dict: Geometry of the written pyramid.
+    """
+    image = open_image(image_path)
+    writer = TilePyramidWriter(
+        output_dir,
+        image.width,
+        image.height,
+        tile_size=tile_size,
+        image_format=image_format,
+        max_zoom=max_zoom,
+    )
+    for start in range(0, image.height, tile_size):
+        writer.push(image.read_rows(start, min(start + tile_size, image.height)))
+    writer.close()
+
+    return dict(
+        width=image.width,
+        height=image.height,
+        tile_size=tile_size,
+        image_format=image_format,
+        max_zoom=writer.max_zoom,
+        full_resolution_zoom=writer.full_resolution_zoom,
+        number_of_tiles=writer.number_of_tiles,
+    )
+
+
+def write_overlay_pyramid(  # noqa: PLR0913
+    labels: np.ndarray,
+    cell_size: int,
+    colors: np.ndarray,
+    output_dir: str,
+    *,
+    width: int,
+    height: int,
+    tile_size: int = 256,
+    image_format: str = 'png',
+    max_zoom: int = None,
+) -> int:
+    """
+    Writes an RGBA overlay pyramid matching the geometry of `write_tile_pyramid`.
+
+    Args:
+        labels (np.ndarray): 2D integer grid, where `labels[i, j]` labels the image
+            region starting at pixel `(j * cell_size, i * cell_size)`.
+        cell_size (int): Edge length of a label cell in image pixels.
+        colors (np.ndarray): RGBA lookup table of shape `(number_of_labels, 4)`.
+        output_dir (str): Directory the zoom level folders are written to.
+        width (int): Width of the underlying image in pixels.
+        height (int): Height of the underlying image in pixels.
+        tile_size (int): Edge length of the square tiles in pixels.
+        image_format (str): Image format of the tiles, must support transparency.
+        max_zoom (int): Finest zoom level to write. Defaults to full resolution.
+
+    Returns:
+        int: Number of written tiles.
+    """
+    full_resolution_zoom = number_of_zoom_levels(width, height, tile_size) - 1
+    if max_zoom is None or max_zoom > full_resolution_zoom:
+        max_zoom = full_resolution_zoom
+    colors = np.asarray(colors, dtype=np.uint8)
+
+    number_of_tiles = 0
+    for zoom in range(max_zoom + 1):
+        os.makedirs(os.path.join(output_dir, str(zoom)), exist_ok=True)
+        scale = 2 ** (full_resolution_zoom - zoom)
+        level_width = math.ceil(width / scale)
+        level_height = math.ceil(height / scale)
+        # label cell of the center of every pixel column and row of this level
+        columns = np.minimum(
+            ((np.arange(level_width) + 0.5) * scale // cell_size).astype(int),
+            labels.shape[1] - 1,
+        )
+        rows = np.minimum(
+            ((np.arange(level_height) + 0.5) * scale // cell_size).astype(int),
+            labels.shape[0] - 1,
+        )
+        for tile_row, y in enumerate(range(0, level_height, tile_size)):
+            for tile_column, x in enumerate(range(0, level_width, tile_size)):
+                tile = colors[
+                    labels[np.ix_(rows[y : y + tile_size], columns[x : x + tile_size])]
+                ]
+                path = os.path.join(
+                    output_dir, str(zoom), f'{tile_column}_{tile_row}.{image_format}'
+                )
+                save_tile(tile, path, image_format)
+                number_of_tiles += 1
+    return number_of_tiles
+
+
+def tile_as_data_uri(path: str) -> str:
+    """
+    Returns an image file as base64 data URI, e.g. for plotly layout images.
+    """
+    image_format = os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, 'rb') as file:
+        encoded = base64.b64encode(file.read()).decode()
+    return f'data:image/{image_format};base64,{encoded}'
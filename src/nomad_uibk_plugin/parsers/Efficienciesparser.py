@@ -0,0 +1,58 @@
+import os
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Union
+
+from nomad.parsing.parser import MatchingParser
+
+from nomad_uibk_plugin.schema_packages.EfficienciesSchema import EfficienciesSchema
+
+if TYPE_CHECKING:
+    from nomad.datamodel.datamodel import EntryArchive
+    from structlog.stdlib import BoundLogger
+
+
+class EfficienciesParser(MatchingParser):
+    """
+    Parser for csv or xlsx result tables of solar simulators, importing all cells
+    of a table into one `EfficienciesSchema` entry.
+
+    Csv files are matched on the header row in the start of the file read for
+    matching, xlsx files only load the first rows of the workbook.
+    """
+
+    def is_mainfile(
+        self,
+        filename: str,
+        mime: str,
+        buffer: bytes,
+        decoded_buffer: str,
+        compression: str = None,
+    ) -> Union[bool, Iterable[str]]:
+        is_mainfile = super().is_mainfile(
+            filename, mime, buffer, decoded_buffer, compression
+        )
+        if not is_mainfile:
+            return is_mainfile
+
+        from nomad_uibk_plugin.filereader.Efficienciesreader import (
+            is_efficiency_table,
+        )
+
+        if filename.lower().endswith('.xlsx') and not buffer.startswith(b'PK'):
+            return False
+        try:
+            return is_efficiency_table(filename, decoded_buffer)
+        except (OSError, ValueError):
+            return False
+
+    def parse(
+        self,
+        mainfile: str,
+        archive: 'EntryArchive',
+        logger: 'BoundLogger',
+        child_archives: dict[str, 'EntryArchive'] = None,
+    ) -> None:
+        logger.info('EfficienciesParser.parse')
+        data_file = os.path.basename(mainfile)
+        archive.data = EfficienciesSchema(data_file=data_file)
+        archive.metadata.entry_name = f'{data_file} efficiencies'
@@ -0,0 +1,68 @@
+import os
+from typing import TYPE_CHECKING
+
+from nomad.parsing.parser import MatchingParser
+
+from nomad_uibk_plugin.schema_packages.IFMschema import IFMMeasurement
+
+if TYPE_CHECKING:
+    from nomad.datamodel.datamodel import EntryArchive
+    from structlog.stdlib import BoundLogger
+
+IMAGE_EXTENSIONS = ('.bmp', '.tif', '.tiff', '.png')
+
+
+def find_image_file(folder: str, metadata_file: str) -> str:
+    """
+    Finds the image belonging to an IFM metadata file in the same folder.
+
+    The image either has the name of the metadata file without the `_info` suffix,
+    e.g. `Sample_1_info.xml` -> `Sample_1.bmp`, or additionally without a trailing
+    image number, e.g. `Sample_1_info.xml` -> `Sample.bmp`.
+
+    Args:
+        folder (str): The folder containing the metadata file.
+        metadata_file (str): The name of the metadata file.
+
+    Returns:
+        str: The name of the image file or None if no image was found.
+    """
+    stem = os.path.splitext(metadata_file)[0].removesuffix('_info')
+    candidates = [stem]
+    base, separator, number = stem.rpartition('_')
+    if separator and number.isdigit():
+        candidates.append(base)
+
+    images = {
+        os.path.splitext(file)[0]: file
+        for file in sorted(os.listdir(folder))
+        if file.lower().endswith(IMAGE_EXTENSIONS)
+    }
+    for candidate in candidates:
+        if candidate in images:
+            return images[candidate]
+    return None
+
+
+class IFMParser(MatchingParser):
+    """
+    Parser for matching IFM xml files and creating an IFMMeasurement with the
+    metadata file and the corresponding image.
+    """
+
+    def parse(
+        self,
+        mainfile: str,
+        archive: 'EntryArchive',
+        logger: 'BoundLogger',
+        child_archives: dict[str, 'EntryArchive'] = None,
+    ) -> None:
+        logger.info('IFMParser.parse')
+        folder, metadata_file = os.path.split(mainfile)
+        entry = IFMMeasurement(metadata_file=metadata_file)
+        entry.image_file = find_image_file(folder, metadata_file)
+        if entry.image_file is None:
+            logger.warn(f'No image found for the IFM metadata file "{metadata_file}".')
+
+        archive.data = entry
+        archive.metadata.entry_name = f'{metadata_file} IFM measurement'
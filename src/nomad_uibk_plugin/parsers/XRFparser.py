@@ -1,12 +1,15 @@
-from typing import TYPE_CHECKING
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Union
 
 from nomad.config import config
 from nomad.datamodel.data import EntryData
 from nomad.datamodel.metainfo.annotations import ELNAnnotation
 from nomad.metainfo import Quantity
 from nomad.parsing.parser import MatchingParser
-from nomad_measurements.utils import create_archive
+from nomad.utils import generate_entry_id
+from nomad_measurements.utils import get_reference
 
+from nomad_uibk_plugin.schema_packages import XRFreader
 from nomad_uibk_plugin.schema_packages.XRFschema import ELNXRayFluorescence
 
 if TYPE_CHECKING:
@@ -23,6 +26,16 @@ class RawFileXRFData(EntryData):
 
     measurement = Quantity(
         type=ELNXRayFluorescence,
+        description='Measurement created from the data file by earlier versions.',
+        a_eln=ELNAnnotation(
+            component='ReferenceEditQuantity',
+        ),
+    )
+
+    measurements = Quantity(
+        type=ELNXRayFluorescence,
+        shape=['*'],
+        description='The measurements of the samples in the data file.',
         a_eln=ELNAnnotation(
             component='ReferenceEditQuantity',
         ),
@@ -32,8 +45,34 @@ class RawFileXRFData(EntryData):
 class XRFParser(MatchingParser):
     """
     Parser for matching XRF files and creating instances of XRayFlourescence.
+
+    Each sample in the file becomes a child entry with its own measurement, which is
+    populated while parsing the file once. Matching only scans the headers of the
+    measurements for the sample names.
     """
 
+    creates_children = True
+
+    def is_mainfile(
+        self,
+        filename: str,
+        mime: str,
+        buffer: bytes,
+        decoded_buffer: str,
+        compression: str = None,
+    ) -> Union[bool, Iterable[str]]:
+        is_mainfile = super().is_mainfile(
+            filename, mime, buffer, decoded_buffer, compression
+        )
+        if not is_mainfile:
+            return is_mainfile
+        try:
+            with open(filename, 'rb') as file:
+                sample_names = set(XRFreader.read_sample_names(file))
+        except OSError:
+            return is_mainfile
+        return sample_names or is_mainfile
+
     def parse(
         self,
         mainfile: str,
@@ -42,11 +81,46 @@ class XRFParser(MatchingParser):
         child_archives: dict[str, 'EntryArchive'] = None,
     ) -> None:
         logger.info('XRFParser.parse')
-        data_file = mainfile.split('/')[-1]
-        entry = ELNXRayFluorescence.m_from_dict(ELNXRayFluorescence.m_def.a_template)
-        entry.data_file = data_file
-        file_name = f'{"".join(data_file.split(".")[:-1])}.archive.json'
-        archive.data = RawFileXRFData(
-            measurement=create_archive(entry, archive, file_name)
-        )
+        data_file = mainfile.rsplit('/', maxsplit=1)[-1]
+        child_archives = child_archives or {}
+
+        # Sort the measurements by sample in a single pass over the file
+        samples = {}
+        end = 0
+        with open(mainfile, 'rb') as file:
+            for record, consumed in XRFreader.iter_xrf_records(file, logger):
+                # an unterminated last measurement is added by the children later
+                if record is not None and consumed > end:
+                    samples.setdefault(record.sample_name, []).append(record)
+                end = consumed
+            # the children read appended measurements from the parsed offset on
+            file.seek(0)
+            sha256 = XRFreader.checksum(file, end).hexdigest()
+
+        references = []
+        upload_id = archive.metadata.upload_id
+        for sample_name, child_archive in child_archives.items():
+            entry = ELNXRayFluorescence.m_from_dict(
+                ELNXRayFluorescence.m_def.a_template
+            )
+            entry.name = f'{sample_name} XRF measurement'
+            entry.write_xrf_data(samples.get(sample_name, []), child_archive, logger)
+            entry.data_file = data_file
+            entry.data_file_sample = sample_name
+            entry.data_file_parsed_sample = sample_name
+            entry.data_file_offset = end
+            entry.data_file_checksum = sha256
+            entry.reader_version = XRFreader.READER_VERSION
+            child_archive.data = entry
+            child_archive.metadata.entry_name = f'{sample_name} XRF measurement'
+            references.append(
+                get_reference(
+                    upload_id,
+                    generate_entry_id(
+                        upload_id, archive.metadata.mainfile, sample_name
+                    ),
+                )
+            )
+
+        archive.data = RawFileXRFData(measurements=references)
         archive.metadata.entry_name = f'{data_file} data file'
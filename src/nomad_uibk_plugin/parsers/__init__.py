@@ -41,20 +41,66 @@ xrfparser = XRFParserEntryPoint(
 # )
 
 
-# class IFMParserEntryPoint(ParserEntryPoint):
-#     """
-#     IFM Parser plugin entry point.
-#     """
+class IFMParserEntryPoint(ParserEntryPoint):
+    """
+    IFM Parser plugin entry point.
+    """
 
-#     def load(self):
-#         # lazy import to avoid circular dependencies
-#         from nomad_uibk_plugin.parsers.microcellparsers import IFMParser
+    def load(self):
+        # lazy import to avoid circular dependencies
+        from nomad_uibk_plugin.parsers.IFMparser import IFMParser
 
-#         return IFMParser(**self.dict())
+        return IFMParser(**self.dict())
 
 
-# ifmparser = IFMParserEntryPoint(
-#     name='IFMParser',
-#     description='IFM Parser for Overview tiff files.',
-#     mainfile_name_re='.*\.tiff',
-# )
+ifmparser = IFMParserEntryPoint(
+    name='IFMParser',
+    description='IFM Parser for xml metadata files and their images.',
+    mainfile_name_re=r'.*\.xml',
+    mainfile_content_re=r'<Object3D\s+type="IFM"',
+)
+
+
+class SampleManifestParserEntryPoint(ParserEntryPoint):
+    """
+    Sample manifest parser plugin entry point.
+    """
+
+    def load(self):
+        # lazy import to avoid circular dependencies
+        from nomad_uibk_plugin.parsers.sampleparser import SampleManifestParser
+
+        return SampleManifestParser(**self.dict())
+
+
+samplemanifestparser = SampleManifestParserEntryPoint(
+    name='SampleManifestParser',
+    description='Parser for csv or yaml manifests of UIBK samples.',
+    mainfile_name_re=r'.*\.samples\.(csv|ya?ml)$',
+)
+
+
+class EfficienciesParserEntryPoint(ParserEntryPoint):
+    """
+    Efficiencies parser plugin entry point.
+    """
+
+    def load(self):
+        # lazy import to avoid circular dependencies
+        from nomad_uibk_plugin.parsers.Efficienciesparser import EfficienciesParser
+
+        return EfficienciesParser(**self.dict())
+
+
+efficienciesparser = EfficienciesParserEntryPoint(
+    name='EfficienciesParser',
+    description='Parser for csv or xlsx result tables of solar simulators.',
+    mainfile_name_re=r'.*\.(csv|xlsx)$',
+    # xlsx workbooks are zip archives, csv files need a line with an efficiency
+    # and a Voc column like the header patterns of the reader
+    mainfile_binary_header_re=(
+        rb'(?im)\APK\x03\x04|^'
+        rb'(?=[^\n]*(?:\b(?:eff|efficiency|pce|eta)\b|\xce\xb7))'
+        rb'(?=[^\n]*\b(?:voc|v_oc|uoc)\b)'
+    ),
+)
@@ -0,0 +1,272 @@
+import csv
+import os
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Any, Union
+
+import yaml
+from nomad.datamodel.data import EntryData
+from nomad.datamodel.metainfo.annotations import ELNAnnotation
+from nomad.metainfo import Quantity
+from nomad.parsing.parser import MatchingParser
+from nomad.utils import generate_entry_id
+from nomad_measurements.utils import get_reference
+
+from nomad_uibk_plugin.schema_packages.sample import MicroCellArray, UIBKSample
+
+if TYPE_CHECKING:
+    from nomad.datamodel.datamodel import EntryArchive
+    from structlog.stdlib import BoundLogger
+
+# Columns of csv manifests describing the microcell array of a sample and the
+# MicroCellArray quantity and axis they set
+ARRAY_COLUMNS = {
+    'array_x': ('shape', 0),
+    'array_y': ('shape', 1),
+    'origin_x': ('origin', 0),
+    'origin_y': ('origin', 1),
+    'pitch_x': ('pitch', 0),
+    'pitch_y': ('pitch', 1),
+}
+
+# Quantities of the samples set from the manifest
+SAMPLE_FIELDS = ('name', 'lab_id', 'description')
+
+
+class ManifestLoader(yaml.SafeLoader):
+    """
+    Safe yaml loader which only resolves `null` implicitly, so that scalars like a
+    lab id `0012` or `yes` keep their text instead of becoming numbers or booleans.
+    """
+
+    yaml_implicit_resolvers = {
+        first: [
+            (tag, regexp)
+            for tag, regexp in resolvers
+            if tag == 'tag:yaml.org,2002:null'
+        ]
+        for first, resolvers in yaml.SafeLoader.yaml_implicit_resolvers.items()
+    }
+
+
+def read_csv_manifest(file_path: str) -> list[dict[str, Any]]:
+    """
+    Reads a csv manifest with one sample per row. The columns `name`, `lab_id` and
+    `description` and the array layout in `ARRAY_COLUMNS` are optional.
+    """
+    samples = []
+    with open(file_path, encoding='utf-8-sig', newline='') as file:
+        for raw_row in csv.DictReader(file):
+            row = {
+                key.strip(): (value or '').strip()
+                for key, value in raw_row.items()
+                if isinstance(key, str)
+            }
+            sample = {key: row[key] for key in SAMPLE_FIELDS if row.get(key)}
+            array = {}
+            for column, (quantity, axis) in ARRAY_COLUMNS.items():
+                if row.get(column):
+                    array.setdefault(quantity, [None, None])[axis] = row[column]
+            if array:
+                sample['array'] = array
+            samples.append(sample)
+    return samples
+
+
+def read_yaml_manifest(file_path: str) -> list[dict[str, Any]]:
+    """
+    Reads a yaml manifest with a list of `samples` and an optional `array` layout
+    used for all samples without their own `array`. All scalars except `null` are
+    read as strings, see `ManifestLoader`.
+
+    Raises:
+        ValueError: If the manifest, a sample or an array layout is not a mapping.
+    """
+    with open(file_path, encoding='utf-8') as file:
+        manifest = yaml.load(file, Loader=ManifestLoader) or {}
+    if isinstance(manifest, list):
+        manifest = {'samples': manifest}
+    if not isinstance(manifest, dict):
+        raise ValueError('The manifest is neither a mapping nor a list of samples.')
+    entries = manifest.get('samples') or []
+    if not isinstance(entries, list):
+        raise ValueError('The samples of the manifest are not a list.')
+    samples = []
+    for number, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f'Sample {number} of the manifest is not a mapping.')
+        sample = dict(entry)
+        if 'array' not in sample and manifest.get('array'):
+            sample['array'] = manifest['array']
+        if sample.get('array') is not None and not isinstance(sample['array'], dict):
+            raise ValueError(f'The array of sample {number} is not a mapping.')
+        samples.append(sample)
+    return samples
+
+
+def read_sample_manifest(
+    file_path: str, logger: 'BoundLogger' = None
+) -> dict[str, dict[str, Any]]:
+    """
+    Reads the samples of a csv or yaml manifest file. If several samples have the
+    same lab id, or the same name without lab id, only the first one is kept and the
+    duplicates are logged. The `SAMPLE_FIELDS` are converted to strings and samples
+    with a list or mapping in one of them are logged and left out.
+
+    Args:
+        file_path (str): The path of the manifest.
+        logger (BoundLogger): A structlog logger.
+
+    Returns:
+        dict[str, dict[str, Any]]: The samples by their lab id, or their name if they
+        have no lab id, in the order of the manifest.
+
+    Raises:
+        ValueError: If a yaml manifest is malformed, see `read_yaml_manifest`.
+    """
+    if file_path.lower().endswith('.csv'):
+        samples = read_csv_manifest(file_path)
+    else:
+        samples = read_yaml_manifest(file_path)
+    samples_by_key = {}
+    for number, sample in enumerate(samples, start=1):
+        invalid = [
+            field
+            for field in SAMPLE_FIELDS
+            if isinstance(sample.get(field), (dict, list))
+        ]
+        if invalid:
+            if logger is not None:
+                logger.warn(
+                    f'Sample {number} of the manifest is left out, its '
+                    f'{", ".join(invalid)} is not a single value.'
+                )
+            continue
+        for field in SAMPLE_FIELDS:
+            if sample.get(field) is None:
+                sample.pop(field, None)
+            else:
+                sample[field] = str(sample[field])
+        if not (sample.get('lab_id') or sample.get('name')):
+            continue
+        key = sample.get('lab_id') or sample.get('name')
+        if key in samples_by_key:
+            if logger is not None:
+                logger.warn(
+                    f'The manifest contains the sample "{key}" several times, only '
+                    'the first one is used.'
+                )
+            continue
+        samples_by_key[key] = sample
+    return samples_by_key
+
+
+def array_layout(array: dict[str, Any]) -> tuple:
+    """
+    Returns the shape, origin and pitch of an array layout of the manifest as a
+    hashable key, with None for missing values.
+    """
+    layout = []
+    for quantity, number_type in (('shape', int), ('origin', float), ('pitch', float)):
+        values = array.get(quantity)
+        if values is None or any(value in (None, '') for value in values):
+            layout.append(None)
+        else:
+            layout.append(tuple(number_type(value) for value in values))
+    return tuple(layout)
+
+
+class RawFileSampleManifest(EntryData):
+    """
+    Section for a manifest file of UIBK samples.
+    """
+
+    samples = Quantity(
+        type=UIBKSample,
+        shape=['*'],
+        description='The samples created from the manifest file.',
+        a_eln=ELNAnnotation(
+            component='ReferenceEditQuantity',
+        ),
+    )
+
+
+class SampleManifestParser(MatchingParser):
+    """
+    Parser for csv or yaml manifest files creating a `UIBKSample` child entry for
+    every sample with its microcell array.
+
+    Samples with the same array layout share one `MicroCellArray`, which is only
+    copied into each sample.
+    """
+
+    creates_children = True
+
+    def is_mainfile(
+        self,
+        filename: str,
+        mime: str,
+        buffer: bytes,
+        decoded_buffer: str,
+        compression: str = None,
+    ) -> Union[bool, Iterable[str]]:
+        is_mainfile = super().is_mainfile(
+            filename, mime, buffer, decoded_buffer, compression
+        )
+        if not is_mainfile:
+            return is_mainfile
+        try:
+            samples = read_sample_manifest(filename)
+        except (OSError, ValueError, yaml.YAMLError):
+            return False
+        return set(samples) or False
+
+    def parse(
+        self,
+        mainfile: str,
+        archive: 'EntryArchive',
+        logger: 'BoundLogger',
+        child_archives: dict[str, 'EntryArchive'] = None,
+    ) -> None:
+        logger.info('SampleManifestParser.parse')
+        manifest_file = os.path.basename(mainfile)
+        child_archives = child_archives or {}
+        samples = read_sample_manifest(mainfile, logger)
+
+        arrays = {}
+        references = []
+        upload_id = archive.metadata.upload_id
+        for key, child_archive in child_archives.items():
+            sample = samples.get(key, {})
+            entry = UIBKSample(
+                **{field: sample[field] for field in SAMPLE_FIELDS if field in sample}
+            )
+            if entry.name is None:
+                entry.name = key
+
+            if sample.get('array'):
+                try:
+                    layout = array_layout(sample['array'])
+                except (TypeError, ValueError) as e:
+                    logger.warn(f'Invalid array layout of sample "{key}": {e}')
+                    layout = (None, None, None)
+                if layout[0] is not None:
+                    if layout not in arrays:
+                        shape, origin, pitch = layout
+                        arrays[layout] = MicroCellArray(
+                            shape=list(shape),
+                            origin=None if origin is None else list(origin),
+                            pitch=None if pitch is None else list(pitch),
+                        )
+                    entry.arrays.append(arrays[layout].m_copy(deep=True))
+
+            child_archive.data = entry
+            child_archive.metadata.entry_name = f'{entry.name} sample'
+            references.append(
+                get_reference(
+                    upload_id,
+                    generate_entry_id(upload_id, archive.metadata.mainfile, key),
+                )
+            )
+
+        archive.data = RawFileSampleManifest(samples=references)
+        archive.metadata.entry_name = f'{manifest_file} sample manifest'
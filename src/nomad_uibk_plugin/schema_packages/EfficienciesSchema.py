@@ -1,8 +1,10 @@
 from typing import TYPE_CHECKING
 
+import numpy as np
+
 # import plotly.graph_objects as go
 from nomad.datamodel.data import (
-    # ArchiveSection,
+    ArchiveSection,
     EntryData,
 )
 from nomad.datamodel.metainfo.annotations import ELNAnnotation, ELNComponentEnum
@@ -12,7 +14,7 @@ from nomad.datamodel.metainfo.annotations import ELNAnnotation, ELNComponentEnum
 # CompositeSystemReference,
 # )
 # from nomad.datamodel.metainfo.plot import PlotlyFigure, PlotSection
-from nomad.metainfo import Quantity, SchemaPackage, Section
+from nomad.metainfo import Quantity, SchemaPackage, Section, SubSection
 
 from nomad_uibk_plugin.schema_packages import UIBKCategory
 
@@ -23,6 +25,51 @@ if TYPE_CHECKING:
 
 m_package = SchemaPackage()
 
+# Quantities holding the columns of the efficiency tables, see `Efficienciesreader`
+CELL_QUANTITIES = {
+    'cell_id': 'cell_ids',
+    'efficiency': 'efficiencies',
+    'open_circuit_voltage': 'open_circuit_voltages',
+    'short_circuit_current_density': 'short_circuit_current_densities',
+    'fill_factor': 'fill_factors',
+}
+
+
+class CellParameterStatistics(ArchiveSection):
+    """
+    Statistics of a parameter of the cells which are not flagged as outliers, in the
+    unit of the parameter.
+    """
+
+    name = Quantity(
+        type=str,
+        description='Name of the parameter, e.g. `efficiency`.',
+    )
+    mean = Quantity(
+        type=float,
+        description='Mean of the parameter.',
+    )
+    standard_deviation = Quantity(
+        type=float,
+        description='Standard deviation of the parameter.',
+    )
+    median = Quantity(
+        type=float,
+        description='Median of the parameter.',
+    )
+    minimum = Quantity(
+        type=float,
+        description='Minimum of the parameter.',
+    )
+    maximum = Quantity(
+        type=float,
+        description='Maximum of the parameter.',
+    )
+    number_of_cells = Quantity(
+        type=int,
+        description='Number of cells with a value of the parameter.',
+    )
+
 
 class EfficienciesSchema(EntryData):
     m_def = Section(
@@ -38,12 +85,170 @@ class EfficienciesSchema(EntryData):
 
     efficiency = Quantity(
         type=float,
-        description='Measured efficiency.',
+        description=(
+            'Measured efficiency. Defaults to the best efficiency of the imported '
+            'cells which are not flagged as outliers.'
+        ),
         a_eln=ELNAnnotation(component=ELNComponentEnum.NumberEditQuantity),
     )
 
+    data_file = Quantity(
+        type=str,
+        description='Csv or xlsx file with the results of the solar simulator.',
+        a_eln=ELNAnnotation(component=ELNComponentEnum.FileEditQuantity),
+    )
+
+    imported_file = Quantity(
+        type=str,
+        description='Data file the cells were imported from.',
+    )
+
+    number_of_cells = Quantity(
+        type=int,
+        description='Number of imported cells.',
+    )
+
+    cell_ids = Quantity(
+        type=str,
+        shape=['*'],
+        description='ID of every cell.',
+    )
+
+    efficiencies = Quantity(
+        type=np.float64,
+        shape=['*'],
+        description='Efficiency of every cell in %.',
+    )
+
+    open_circuit_voltages = Quantity(
+        type=np.float64,
+        shape=['*'],
+        unit='V',
+        description='Open circuit voltage of every cell.',
+    )
+
+    short_circuit_current_densities = Quantity(
+        type=np.float64,
+        shape=['*'],
+        unit='mA/cm**2',
+        description='Short circuit current density of every cell.',
+    )
+
+    fill_factors = Quantity(
+        type=np.float64,
+        shape=['*'],
+        description='Fill factor of every cell in %.',
+    )
+
+    outliers = Quantity(
+        type=bool,
+        shape=['*'],
+        description=(
+            'Whether a cell is an outlier, i.e. a parameter is unphysical or far from '
+            'the median of all cells.'
+        ),
+    )
+
+    number_of_outliers = Quantity(
+        type=int,
+        description='Number of cells flagged as outliers.',
+    )
+
+    statistics = SubSection(
+        section_def=CellParameterStatistics,
+        description='Statistics of the parameters of the cells.',
+        repeats=True,
+    )
+
+    def read_data_file(self, archive: 'EntryArchive', logger: 'BoundLogger') -> None:
+        """
+        Reads the columns of the cells from the data file, replacing the cells,
+        outliers and statistics of a previously imported file.
+        """
+        from nomad_uibk_plugin.filereader.Efficienciesreader import (
+            read_efficiency_table,
+        )
+
+        if self.imported_file is not None:
+            # the efficiency defaults to the best cell of the new file
+            self.efficiency = None
+        for quantity in (*CELL_QUANTITIES.values(), 'outliers', 'number_of_outliers'):
+            setattr(self, quantity, None)
+        self.number_of_cells = None
+        self.statistics = []
+        self.imported_file = self.data_file
+
+        with archive.m_context.raw_file(self.data_file, 'rb') as file:
+            table = read_efficiency_table(file.name, logger)
+        if table is None:
+            return
+        self.cell_ids = table['cell_id'].tolist()
+        for column, quantity in CELL_QUANTITIES.items():
+            if column != 'cell_id':
+                setattr(self, quantity, table[column].to_numpy(dtype=np.float64))
+
+    def cell_values(self) -> np.ndarray:
+        """
+        Returns the efficiency, Voc in V, Jsc in mA/cm² and fill factor of the cells
+        with one row per cell.
+        """
+        number_of_cells = len(self.cell_ids)
+        columns = []
+        for column, quantity in CELL_QUANTITIES.items():
+            if column == 'cell_id':
+                continue
+            values = getattr(self, quantity)
+            if values is None:
+                columns.append(np.full(number_of_cells, np.nan))
+            elif hasattr(values, 'magnitude'):
+                columns.append(np.asarray(values.magnitude, dtype=float))
+            else:
+                columns.append(np.asarray(values, dtype=float))
+        return np.column_stack(columns).reshape(number_of_cells, len(columns))
+
+    def summarize_cells(self, logger: 'BoundLogger') -> None:
+        """
+        Flags outliers and writes the statistics of the cells.
+        """
+        from nomad_uibk_plugin.filereader.Efficienciesreader import (
+            COLUMNS,
+            cell_statistics,
+            flag_outliers,
+        )
+
+        values = self.cell_values()
+        outliers = flag_outliers(values)
+        self.number_of_cells = len(values)
+        self.outliers = outliers
+        self.number_of_outliers = int(outliers.sum())
+
+        statistics = cell_statistics(values[~outliers])
+        self.statistics = [
+            CellParameterStatistics(
+                name=column,
+                **{
+                    name: (
+                        None
+                        if np.isnan(statistic[position])
+                        else statistic[position].item()
+                    )
+                    for name, statistic in statistics.items()
+                },
+            )
+            for position, column in enumerate(COLUMNS)
+        ]
+        if self.efficiency is None and statistics['number_of_cells'][0]:
+            self.efficiency = float(statistics['maximum'][0])
+
     def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger'):
         super().normalize(archive, logger)
 
+        if self.data_file is not None and self.data_file != self.imported_file:
+            logger.info('Efficiency table recognized. Parsing...')
+            self.read_data_file(archive, logger)
+
+        if self.cell_ids is not None:
+            self.summarize_cells(logger)
+
 
 m_package.__init_metainfo__()
@@ -16,13 +16,18 @@
 # limitations under the License.
 #
 
+import csv
+import hashlib
+import io
 import os
 from typing import (
     TYPE_CHECKING,
 )
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objs as go
+from nomad.config import config
 from nomad.datamodel.data import ArchiveSection, EntryData
 from nomad.datamodel.metainfo.annotations import ELNAnnotation, ELNComponentEnum
 from nomad.datamodel.metainfo.basesections import (
@@ -48,11 +53,78 @@ if TYPE_CHECKING:
     from nomad.datamodel import EntryArchive
     from structlog.stdlib import BoundLogger
 
+configuration = config.get_plugin_entry_point(
+    'nomad_uibk_plugin.schema_packages:ifmschema'
+)
+
 ureg = UnitRegistry()
 
 m_package = SchemaPackage()
 
 
+class ImagePyramid(ArchiveSection):
+    """
+    Multi-resolution tile pyramid of an image for fast viewing.
+    """
+
+    directory = Quantity(
+        type=str,
+        description=(
+            'Folder containing one subfolder per zoom level with the tiles named '
+            '`{column}_{row}.{image_format}`.'
+        ),
+    )
+    tile_size = Quantity(
+        type=int,
+        description='Edge length of the square tiles in pixels.',
+    )
+    image_format = Quantity(
+        type=str,
+        description='Image format of the tiles.',
+    )
+    max_zoom = Quantity(
+        type=int,
+        description=(
+            'Finest zoom level of the pyramid. Zoom level 0 shows the whole image in '
+            'a single tile, every further level doubles the resolution.'
+        ),
+    )
+    full_resolution_zoom = Quantity(
+        type=int,
+        description='Zoom level at which the tiles have the full image resolution.',
+    )
+    width = Quantity(
+        type=int,
+        description='Width of the full resolution image in pixels.',
+    )
+    height = Quantity(
+        type=int,
+        description='Height of the full resolution image in pixels.',
+    )
+    source_file = Quantity(
+        type=str,
+        description=(
+            'Image file the pyramid was generated from, or the prediction csv file '
+            'of a defect overlay.'
+        ),
+    )
+    source_checksum = Quantity(
+        type=str,
+        description=(
+            'SHA-256 checksum of the prediction csv file of a defect overlay. The '
+            'overlay is only written again if the checksum changes.'
+        ),
+    )
+
+    def tile_path(self, zoom: int, column: int, row: int) -> str:
+        """
+        Returns the path of a tile relative to the upload raw folder.
+        """
+        return os.path.join(
+            self.directory, str(zoom), f'{column}_{row}.{self.image_format}'
+        )
+
+
 class IFMMeasurement(ELNMeasurement):
     """
     IFM Measurement entry.
@@ -120,10 +192,183 @@ class IFMMeasurement(ELNMeasurement):
         description='Magnification used for the measurement.',
     )
 
+    processing_time = Quantity(
+        type=float,
+        description='Time needed for the measurement.',
+        unit='second',
+        a_eln=ELNAnnotation(defaultDisplayUnit='hour'),
+    )
+
+    product_id = Quantity(
+        type=str,
+        description='Product ID of the measurement device.',
+    )
+
+    serial_number = Quantity(
+        type=str,
+        description='Serial number of the measurement device.',
+    )
+
+    start_position = Quantity(
+        type=np.float64,
+        shape=[3],
+        description='x, y and z position at the start of the measurement.',
+        unit='meter',
+        a_eln=ELNAnnotation(defaultDisplayUnit='mm'),
+    )
+
+    end_position = Quantity(
+        type=np.float64,
+        shape=[3],
+        description='x, y and z position at the end of the measurement.',
+        unit='meter',
+        a_eln=ELNAnnotation(defaultDisplayUnit='mm'),
+    )
+
+    vertical_resolution = Quantity(
+        type=float,
+        description='Estimated vertical resolution.',
+        unit='meter',
+        a_eln=ELNAnnotation(defaultDisplayUnit='nm'),
+    )
+
+    lateral_resolution = Quantity(
+        type=float,
+        description='Estimated lateral resolution.',
+        unit='meter',
+        a_eln=ELNAnnotation(defaultDisplayUnit='µm'),
+    )
+
+    number_of_tile_rows = Quantity(
+        type=int,
+        description='Number of rows of single images stitched to the image.',
+    )
+
+    number_of_tile_columns = Quantity(
+        type=int,
+        description='Number of columns of single images stitched to the image.',
+    )
+
+    vignetting_correction = Quantity(
+        type=bool,
+        description='Whether the vignetting correction was applied.',
+    )
+
+    decimation = Quantity(
+        type=int,
+        description='Decimation used for the measurement.',
+    )
+
+    contrast = Quantity(
+        type=float,
+        description='Contrast used for the measurement.',
+    )
+
+    z_position = Quantity(
+        type=float,
+        description='z position before the measurement.',
+        unit='meter',
+        a_eln=ELNAnnotation(defaultDisplayUnit='µm'),
+    )
+
+    vertical_scan_range = Quantity(
+        type=float,
+        description='Vertical range covered by the measurement.',
+        unit='meter',
+        a_eln=ELNAnnotation(defaultDisplayUnit='µm'),
+    )
+
+    saturation = Quantity(
+        type=float,
+        description='Saturation used for the measurement.',
+    )
+
+    gain = Quantity(
+        type=float,
+        description='Gain used for the measurement.',
+    )
+
+    histogram_lower_limit = Quantity(
+        type=int,
+        description='Lower limit of the histogram out of 255.',
+    )
+
+    histogram_upper_limit = Quantity(
+        type=int,
+        description='Upper limit of the histogram out of 255.',
+    )
+
+    xsmartflash = Quantity(
+        type=bool,
+        description='Whether XSmartFlash was used.',
+    )
+
+    autofocus = Quantity(
+        type=bool,
+        description='Whether the autofocus was used.',
+    )
+
+    polarizer = Quantity(
+        type=str,
+        description='State of the polarizer.',
+    )
+
+    coaxial_light_intensity = Quantity(
+        type=float,
+        description='Intensity of the coaxial light.',
+    )
+
+    ring_light_intensity = Quantity(
+        type=float,
+        description='Intensity of the ring light.',
+    )
+
+    system_adjustment_status = Quantity(
+        type=str,
+        description='Adjustment and calibration status of the measurement device.',
+    )
+
+    image_pyramid = SubSection(
+        section_def=ImagePyramid,
+        description='Downsampled tiles of the image for fast viewing.',
+    )
+
+    def generate_image_pyramid(
+        self, archive: 'EntryArchive', logger: 'BoundLogger'
+    ) -> ImagePyramid:
+        """
+        Writes a tile pyramid of the image file into a `<image name>_tiles` folder
+        next to the image.
+        """
+        from nomad_uibk_plugin.filereader.IFMtiles import write_tile_pyramid
+
+        folder, filename_with_ext = os.path.split(self.image_file)
+        filename = os.path.splitext(filename_with_ext)[0]
+        directory = os.path.join(folder, f'{filename}_tiles')
+
+        try:
+            with archive.m_context.raw_file(self.image_file, 'rb') as image_file:
+                geometry = write_tile_pyramid(
+                    image_file.name,
+                    os.path.join(os.path.dirname(image_file.name), f'{filename}_tiles'),
+                    tile_size=configuration.tile_size,
+                    image_format=configuration.tile_format,
+                    max_zoom=configuration.max_tile_zoom,
+                )
+        except (OSError, ValueError) as e:
+            logger.warn(f'Could not create the image pyramid: {e}')
+            return None
+
+        geometry.pop('number_of_tiles')
+        return ImagePyramid(
+            directory=directory, source_file=self.image_file, **geometry
+        )
+
     def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger'):
         """
         Tasks in here:
         - Read the metadata file and extract information from it.
+        - Generate the tile pyramid of the image if not yet done for the image file.
         - Update the sample references if lab_id is given.
         """
 
@@ -139,6 +384,14 @@ class IFMMeasurement(ELNMeasurement):
                 measurement = read_ifm_xml(file, archive, logger)
                 merge_sections(self, measurement, logger)
 
+        # Generate tiles for viewing the image
+        if self.image_file is not None and (
+            self.image_pyramid is None
+            or self.image_pyramid.source_file != self.image_file
+        ):
+            logger.info('Image file recognized. Generating tiles...')
+            self.image_pyramid = self.generate_image_pyramid(archive, logger)
+
         # Update sample references
         if self.sample_id and not self.samples:
             self.samples = [
@@ -202,6 +455,73 @@ class IFMModel(Entity, EntryData):
                 merge_sections(self, model, logger)
 
 
+# labels of the defect types in the heatmap and the defect overlay
+DEFECT_LABELS = {
+    'Whiskers': 1,
+    'Chipping': 2,
+    'Scratch': 3,
+    'No Error': 4,
+}
+
+# quantities of `DefectPrevalence` holding the prevalence of each defect type
+DEFECT_QUANTITIES = {
+    'Whiskers': 'whiskers',
+    'Chipping': 'chipping',
+    'Scratch': 'scratch',
+    'No Error': 'no_error',
+}
+
+# RGBA colors of the defect overlay indexed by label, 0 marks unclassified regions
+DEFECT_COLORS = np.array(
+    [
+        [0, 0, 0, 0],
+        [228, 26, 28, 128],
+        [255, 127, 0, 128],
+        [55, 126, 184, 128],
+        [0, 0, 0, 0],
+    ],
+    dtype=np.uint8,
+)
+
+
+def read_prediction_csv(csv_path: str) -> tuple[pd.DataFrame, int, str]:
+    """
+    Reads a prediction csv file in one pass. The first two lines hold the image
+    name, patch size and stride, followed by the patch positions and the predicted
+    probabilities of the defect types.
+
+    Args:
+        csv_path (str): Path of the prediction csv file.
+
+    Returns:
+        tuple[pd.DataFrame, int, str]: The patches, the distance in pixels between
+        neighbouring patches and the SHA-256 checksum of the file.
+    """
+    with open(csv_path, 'rb') as file:
+        content = file.read()
+    text = io.StringIO(content.decode('utf-8'), newline='')
+    header = next(csv.DictReader([text.readline(), text.readline()]))
+    defect_data = pd.read_csv(text)
+    return defect_data, int(header['Stride']), hashlib.sha256(content).hexdigest()
+
+
+def overlay_is_current(
+    overlay: ImagePyramid, checksum: str, image_pyramid: ImagePyramid
+) -> bool:
+    """
+    Returns whether a defect overlay was written from a prediction csv file with the
+    given checksum and still matches the geometry of the image pyramid.
+    """
+    return (
+        overlay is not None
+        and overlay.source_checksum == checksum
+        and all(
+            getattr(overlay, name) == getattr(image_pyramid, name)
+            for name in ('tile_size', 'max_zoom', 'width', 'height')
+        )
+    )
+
+
 class DefectPrevalence(ArchiveSection):
     whiskers = Quantity(
         type=float,
@@ -219,6 +539,72 @@ class DefectPrevalence(ArchiveSection):
         type=float,
         description='Prevalence of no errors.',
     )
+    number_of_patches = Quantity(
+        type=int,
+        description='Number of classified image patches.',
+    )
+    defect_area_fraction = Quantity(
+        type=float,
+        description=(
+            'Fraction of the image area covered by patches classified as whiskers, '
+            'chipping or scratch.'
+        ),
+    )
+
+    def update_from_data(
+        self, defect_data: pd.DataFrame, stride: int, image_pyramid: ImagePyramid
+    ) -> None:
+        """
+        Sets the prevalence of each defect type and the defect area fraction from the
+        classified patches of an image.
+
+        Args:
+            defect_data (pd.DataFrame): Patch positions with their defect `type`.
+            stride (int): Distance in pixels between neighbouring patches.
+            image_pyramid (ImagePyramid): Image pyramid of the analyzed measurement,
+                the area of the classified patches is used if it is missing.
+        """
+        counts = defect_data['type'].value_counts()
+        number_of_patches = len(defect_data)
+        for name, quantity in DEFECT_QUANTITIES.items():
+            setattr(
+                self,
+                quantity,
+                counts.get(name, 0) / number_of_patches if number_of_patches else 0,
+            )
+        self.number_of_patches = number_of_patches
+
+        defects = number_of_patches - counts.get('No Error', 0)
+        area = number_of_patches * stride**2
+        if image_pyramid is not None and image_pyramid.width and image_pyramid.height:
+            area = image_pyramid.width * image_pyramid.height
+        self.defect_area_fraction = min(defects * stride**2 / area, 1) if area else 0
+
+    @classmethod
+    def combine(cls, prevalences: list['DefectPrevalence']) -> 'DefectPrevalence':
+        """
+        Combines the prevalences of several images weighted by their number of
+        patches.
+
+        Args:
+            prevalences (list[DefectPrevalence]): The prevalences of the images.
+
+        Returns:
+            DefectPrevalence: The prevalence of all images, None without patches.
+        """
+        weights = np.array(
+            [prevalence.number_of_patches or 0 for prevalence in prevalences],
+            dtype=float,
+        )
+        if not weights.sum():
+            return None
+        combined = cls(number_of_patches=int(weights.sum()))
+        for quantity in (*DEFECT_QUANTITIES.values(), 'defect_area_fraction'):
+            values = np.array(
+                [getattr(prevalence, quantity) or 0 for prevalence in prevalences]
+            )
+            setattr(combined, quantity, float(np.average(values, weights=weights)))
+        return combined
 
 
 class IFMAnalysisResult(ArchiveSection):
@@ -233,6 +619,14 @@ class IFMAnalysisResult(ArchiveSection):
         description='Prevalence of defects in the image.',
     )
 
+    defect_overlay = SubSection(
+        section_def=ImagePyramid,
+        description=(
+            'Semi-transparent defect tiles matching the image pyramid of the '
+            'measurement.'
+        ),
+    )
+
 
 class ImageReference(EntityReference):
     reference = Quantity(
@@ -298,6 +692,13 @@ class IFMTwoStepAnalysis(ELNAnalysis, PlotSection):
         section_def=ModelReference,
         description='Model for the automated image analysis.',
     )
+    defect_prevalence = SubSection(
+        section_def=DefectPrevalence,
+        description=(
+            'Prevalence of defects in all analyzed images. The quantities are '
+            'available in the search together with the names of the models.'
+        ),
+    )
 
     # Execution Quantity
     perform_analysis = Quantity(
@@ -310,6 +711,125 @@ class IFMTwoStepAnalysis(ELNAnalysis, PlotSection):
         a_eln=ELNAnnotation(component=ELNComponentEnum.BoolEditQuantity),
     )
 
+    def write_defect_overlay(  # noqa: PLR0913
+        self,
+        defect_data: pd.DataFrame,
+        stride: int,
+        image_pyramid: ImagePyramid,
+        *,
+        output_dir: str,
+        directory: str,
+        source_file: str,
+        checksum: str,
+        previous: ImagePyramid,
+        logger: 'BoundLogger',
+    ) -> ImagePyramid:
+        """
+        Rasterizes the classified patches and writes them as semi-transparent tile
+        pyramid with the same geometry as the image pyramid of the measurement.
+        Without classified patches the overlay is fully transparent. The previous
+        overlay is kept if it was written from the same prediction csv file for the
+        same image pyramid.
+
+        Args:
+            defect_data (pd.DataFrame): Patch positions with their defect `label`.
+            stride (int): Distance in pixels between neighbouring patches.
+            image_pyramid (ImagePyramid): Image pyramid of the analyzed measurement.
+            output_dir (str): Folder the tiles are written to.
+            directory (str): Same folder relative to the upload raw folder.
+            source_file (str): Prediction csv file relative to the upload raw folder.
+            checksum (str): SHA-256 checksum of the prediction csv file.
+            previous (ImagePyramid): Defect overlay of the last analysis or `None`.
+            logger (BoundLogger): A structlog logger.
+
+        Returns:
+            ImagePyramid: The geometry of the written defect overlay.
+        """
+        from nomad_uibk_plugin.filereader.IFMtiles import write_overlay_pyramid
+
+        if overlay_is_current(previous, checksum, image_pyramid):
+            return previous.m_copy()
+
+        columns = (defect_data['x'] // stride).to_numpy(dtype=int)
+        rows = (defect_data['y'] // stride).to_numpy(dtype=int)
+        labels = np.zeros(
+            (
+                max(rows.max(initial=-1) + 1, -(-image_pyramid.height // stride)),
+                max(columns.max(initial=-1) + 1, -(-image_pyramid.width // stride)),
+            ),
+            dtype=np.uint8,
+        )
+        labels[rows, columns] = defect_data['label'].to_numpy(dtype=np.uint8)
+
+        # the overlay needs transparency, which jpeg tiles do not support
+        image_format = configuration.tile_format
+        if image_format.lower() in {'jpg', 'jpeg'}:
+            image_format = 'png'
+
+        try:
+            write_overlay_pyramid(
+                labels,
+                cell_size=stride,
+                colors=DEFECT_COLORS,
+                output_dir=output_dir,
+                width=image_pyramid.width,
+                height=image_pyramid.height,
+                tile_size=image_pyramid.tile_size,
+                image_format=image_format,
+                max_zoom=image_pyramid.max_zoom,
+            )
+        except OSError as e:
+            logger.warn(f'Could not create the defect overlay: {e}')
+            return None
+
+        return ImagePyramid(
+            directory=directory,
+            tile_size=image_pyramid.tile_size,
+            image_format=image_format,
+            max_zoom=image_pyramid.max_zoom,
+            full_resolution_zoom=image_pyramid.full_resolution_zoom,
+            width=image_pyramid.width,
+            height=image_pyramid.height,
+            source_file=source_file,
+            source_checksum=checksum,
+        )
+
+    def image_background(
+        self,
+        archive: 'EntryArchive',
+        image_pyramid: ImagePyramid,
+        logger: 'BoundLogger',
+    ) -> dict:
+        """
+        Returns the overview tile of an image pyramid as plotly layout image spanning
+        the full resolution pixel coordinates.
+        """
+        if image_pyramid is None:
+            return None
+
+        from nomad_uibk_plugin.filereader.IFMtiles import tile_as_data_uri
+
+        try:
+            with archive.m_context.raw_file(image_pyramid.tile_path(0, 0, 0)) as tile:
+                source = tile_as_data_uri(tile.name)
+        except OSError as e:
+            logger.warn(f'Could not load the image overview tile: {e}')
+            return None
+
+        return dict(
+            source=source,
+            xref='x',
+            yref='y',
+            x=0,
+            y=0,
+            sizex=image_pyramid.width,
+            sizey=image_pyramid.height,
+            xanchor='left',
+            yanchor='top',
+            sizing='stretch',
+            layer='below',
+        )
+
     def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger'):
         super().normalize(archive, logger)
         self.method = 'IFM Two Step Analysis'
@@ -331,6 +851,12 @@ class IFMTwoStepAnalysis(ELNAnalysis, PlotSection):
         if self.inputs and self.model_binary and self.model_classification:
             logger.info('Two Models found. Ready for IFM Two Step Analysis.')
 
+            # overlays of unchanged prediction csv files are not written again
+            previous_overlays = {
+                output.file: output.defect_overlay
+                for output in self.outputs
+                if output.defect_overlay is not None
+            }
             self.outputs = []
             for input in self.inputs:
                 # here we execute Georgs code to extract the defects
@@ -374,18 +900,34 @@ class IFMTwoStepAnalysis(ELNAnalysis, PlotSection):
                     analysis_entry = IFMAnalysisResult(file=csv_path)
 
                     # read csv file and extract the defect prevalence
-                    defect_data = pd.read_csv(csv_path, skiprows=2)
+                    defect_data, stride, checksum = read_prediction_csv(csv_path)
                     defect_columns = ['Whiskers', 'Chipping', 'Scratch', 'No Error']
                     defect_data['type'] = defect_data[defect_columns].idxmax(axis=1)
-                    relative_share = defect_data['type'].value_counts(normalize=True)
 
-                    analysis_entry.defect_prevalence = DefectPrevalence(
-                        whiskers=relative_share.get('Whiskers', 0),
-                        chipping=relative_share.get('Chipping', 0),
-                        scratch=relative_share.get('Scratch', 0),
-                        no_error=relative_share.get('No Error', 0),
+                    image_pyramid = input.reference.image_pyramid
+                    analysis_entry.defect_prevalence = DefectPrevalence()
+                    analysis_entry.defect_prevalence.update_from_data(
+                        defect_data, stride, image_pyramid
                     )
 
+                    # create semi-transparent defect tiles on top of the image tiles
+                    defect_data['label'] = defect_data['type'].map(DEFECT_LABELS)
+                    if image_pyramid is not None:
+                        folder = os.path.dirname(input.reference.image_file)
+                        analysis_entry.defect_overlay = self.write_defect_overlay(
+                            defect_data,
+                            stride,
+                            image_pyramid,
+                            output_dir=os.path.join(path, f'{filename}_defects_tiles'),
+                            directory=os.path.join(folder, f'{filename}_defects_tiles'),
+                            source_file=os.path.join(
+                                folder, f'{filename}_prediction.csv'
+                            ),
+                            checksum=checksum,
+                            previous=previous_overlays.get(csv_path),
+                            logger=logger,
+                        )
+
                     # add the result to the analysis output and update the workflow
                     self.outputs.append(analysis_entry)
                     archive.workflow2.outputs.append(
@@ -396,14 +938,6 @@ class IFMTwoStepAnalysis(ELNAnalysis, PlotSection):
                     )
 
                     # create plot
-                    defect_mapping = {
-                        'Whiskers': 1,
-                        'Chipping': 2,
-                        'Scratch': 3,
-                        'No Error': 4,
-                    }
-                    defect_data['label'] = defect_data['type'].map(defect_mapping)
-
                     heatmap = go.Heatmap(
                         x=defect_data['x'],
                         y=defect_data['y'],
@@ -426,6 +960,15 @@ class IFMTwoStepAnalysis(ELNAnalysis, PlotSection):
                         autosize=True,
                     )
 
+                    # show the heatmap on top of the overview tile of the image
+                    background = self.image_background(archive, image_pyramid, logger)
+                    if background is not None:
+                        figure.update_traces(opacity=0.5)
+                        figure.update_layout(
+                            images=[background],
+                            yaxis=dict(autorange='reversed'),
+                        )
+
                     figure_json = figure.to_plotly_json()
                     figure_json['config'] = {'staticPlot': True}
                     self.figures.append(
@@ -438,5 +981,14 @@ class IFMTwoStepAnalysis(ELNAnalysis, PlotSection):
 
             self.perform_analysis = False
 
+        # summarize the prevalence of all images for the search
+        self.defect_prevalence = DefectPrevalence.combine(
+            [
+                output.defect_prevalence
+                for output in self.outputs
+                if output.defect_prevalence is not None
+            ]
+        )
+
 
 m_package.__init_metainfo__()
@@ -16,12 +16,22 @@
 # limitations under the License.
 #
 
+import hashlib
+import itertools
+import math
 import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, replace
 from datetime import datetime
-from typing import TYPE_CHECKING, Any
+from functools import cache
+from typing import TYPE_CHECKING, Any, BinaryIO, NamedTuple, Optional, TextIO, Union
 
-# import numpy as np
+import numpy as np
 from nomad.units import ureg
+from scipy.interpolate import griddata
+from scipy.spatial import QhullError
+
+from nomad_uibk_plugin.schema_packages.XRFconstants import RATIOS
 
 if TYPE_CHECKING:
     from structlog.stdlib import (
@@ -29,288 +39,1328 @@ if TYPE_CHECKING:
     )
 
 
+# Version of the reader, increase it whenever the parsed data changes so that
+# entries are parsed again
+READER_VERSION = '6'
+
+# Columns with one value per measurement
+MEASUREMENT_COLUMNS = ('application', 'sample_name', 'date', 'position')
+
+# Columns with one value per measurement, layer and element
+ROW_COLUMNS = (
+    'measurement',
+    'layer',
+    'thickness',
+    'element',
+    'mass_fraction',
+    'atomic_fraction',
+    'line',
+    'intensity_peak',
+    'intensity_background',
+    'intensity_background_2',
+)
+
+# Columns holding numbers, all others hold Python objects like strings and dates
+NUMERIC_COLUMNS = {
+    'measurement': np.int64,
+    'thickness': np.float64,
+    'mass_fraction': np.float64,
+    'atomic_fraction': np.float64,
+    'intensity_peak': np.float64,
+    'intensity_background': np.float64,
+    'intensity_background_2': np.float64,
+}
+
+# Row columns holding the intensities of the element lines
+INTENSITY_COLUMNS = ('intensity_peak', 'intensity_background', 'intensity_background_2')
+
+# Unit of the `thickness` column
+THICKNESS_UNIT = 'nm'
+
+# Row columns, for which the statistics of repeated measurements are computed
+STATISTICS_QUANTITIES = (
+    'thickness',
+    'mass_fraction',
+    'atomic_fraction',
+    'intensity_peak',
+    'intensity_background',
+    'intensity_background_2',
+)
+
+# Columns of the statistics of repeated measurements
+STATISTICS_COLUMNS = (
+    'series',
+    'layer',
+    'element',
+    'quantity',
+    'number_of_values',
+    'mean',
+    'std',
+    'minimum',
+    'maximum',
+    'outliers',
+)
+
+# Modified z-score above which a repeated value is flagged as outlier
+OUTLIER_THRESHOLD = 3.5
+
+# Position of a measurement on a mapped sample given by its x and y index
+POSITION_RE = re.compile(r'(\d+)-(\d+)')
+
+# Default number of grid points along each axis of composition maps
+MAP_RESOLUTION = 50
+
+# Energies in keV of the element lines in the XRF spectra
+LINE_ENERGIES = {
+    'Na-Ka': 1.041,
+    'Mo-La': 2.293,
+    'S-Ka': 2.307,
+    'Fe-Ka': 6.404,
+    'Cu-Ka': 8.048,
+    'Zn-Ka': 8.639,
+    'Ga-Ka': 9.252,
+    'Se-Ka': 11.222,
+    'Mo-Ka': 17.479,
+    'Cd-Ka': 23.174,
+    'In-Ka': 24.210,
+}
+
+# Default peak, background and second background energy regions in keV of the lines
+LINE_REGIONS = {
+    line: (
+        (energy - 0.15, energy + 0.15),
+        (energy - 0.45, energy - 0.25),
+        (energy + 0.25, energy + 0.45),
+    )
+    for line, energy in LINE_ENERGIES.items()
+}
+
+
+@cache
+def unit_factor(unit: str, target: str = THICKNESS_UNIT) -> float:
+    """
+    Returns the factor for converting values from `unit` to `target`. Every unit is
+    only parsed once.
+
+    Args:
+        unit (str): The unit of the values, e.g. `nm` or `um`.
+        target (str): The unit to convert to.
+
+    Returns:
+        float: The conversion factor.
+    """
+    return ureg(unit).to(target).magnitude
+
+
+def to_column(name: str, values: Iterable) -> np.ndarray:
+    """
+    Returns the values as an array with the data type of the column.
+    """
+    return np.asarray(list(values), dtype=NUMERIC_COLUMNS.get(name, object))
+
+
+def none_if_nan(value: Any) -> Any:
+    """
+    Returns `None` for missing numbers, which are stored as NaN in the columns.
+    """
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class XRFRecord(NamedTuple):
+    """
+    The metadata and the rows of a single parsed measurement as plain Python values.
+    The rows hold the values of the `ROW_COLUMNS` following `measurement`.
+    """
+
+    application: str
+    sample_name: str
+    date: datetime
+    position: str
+    rows: list[tuple]
+
+
+@dataclass
+class XRFTable:
+    """
+    Columnar representation of the X-ray fluorescence results of one or more
+    measurements.
+
+    The measurement columns `application`, `sample_name`, `date` and `position` hold
+    one value per measurement. All other columns hold one row per measurement, layer and
+    element, where `measurement` is the index of the measurement. Missing numbers
+    are NaN and missing strings are `None`. The thickness of the layers is given in
+    `THICKNESS_UNIT`. A layer without elements has a single row without element.
+    """
+
+    application: np.ndarray
+    sample_name: np.ndarray
+    date: np.ndarray
+    position: np.ndarray
+    measurement: np.ndarray
+    layer: np.ndarray
+    thickness: np.ndarray
+    element: np.ndarray
+    mass_fraction: np.ndarray
+    atomic_fraction: np.ndarray
+    line: np.ndarray
+    intensity_peak: np.ndarray
+    intensity_background: np.ndarray
+    intensity_background_2: np.ndarray
+
+    @classmethod
+    def from_columns(cls, **columns: Iterable) -> 'XRFTable':
+        """
+        Creates a table from the values of all columns.
+        """
+        return cls(
+            **{name: to_column(name, values) for name, values in columns.items()}
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[XRFRecord]) -> 'XRFTable':
+        """
+        Creates a table from parsed measurements. The values of all measurements are
+        collected in lists and every column is converted to an array only once.
+
+        Args:
+            records (Iterable[XRFRecord]): The measurements, e.g. yielded by
+                `iter_xrf_records`.
+
+        Returns:
+            XRFTable: The table containing all measurements.
+        """
+        columns = {name: [] for name in (*MEASUREMENT_COLUMNS, *ROW_COLUMNS)}
+        measurement = columns['measurement']
+        rows = []
+        for index, record in enumerate(records):
+            for name in MEASUREMENT_COLUMNS:
+                columns[name].append(getattr(record, name))
+            measurement.extend(itertools.repeat(index, len(record.rows)))
+            rows.extend(record.rows)
+        for name, values in zip(ROW_COLUMNS[1:], zip(*rows)):
+            columns[name] = values
+        return cls.from_columns(**columns)
+
+    @classmethod
+    def concatenate(cls, tables: Iterable['XRFTable']) -> 'XRFTable':
+        """
+        Concatenates the measurements of several tables into one table.
+
+        Args:
+            tables (Iterable[XRFTable]): The tables, e.g. yielded by
+                `iter_xrf_measurements`.
+
+        Returns:
+            XRFTable: The table containing all measurements.
+        """
+        columns = {name: [] for name in (*MEASUREMENT_COLUMNS, *ROW_COLUMNS)}
+        number_of_measurements = 0
+        for table in tables:
+            for name, values in columns.items():
+                column = getattr(table, name)
+                if name == 'measurement':
+                    column = column + number_of_measurements
+                values.append(column)
+            number_of_measurements += len(table.application)
+        return cls(
+            **{
+                name: np.concatenate(values) if values else to_column(name, values)
+                for name, values in columns.items()
+            }
+        )
+
+    def select(self, rows: Union[np.ndarray, slice]) -> 'XRFTable':
+        """
+        Returns a table with the selected rows and all measurements.
+
+        Args:
+            rows (Union[np.ndarray, slice]): A boolean mask or the indices of the
+                rows.
+
+        Returns:
+            XRFTable: The table with the selected rows.
+        """
+        return replace(
+            self, **{name: getattr(self, name)[rows] for name in ROW_COLUMNS}
+        )
+
+    def groupby(self, column: str) -> Iterator[tuple[Any, 'XRFTable']]:
+        """
+        Groups the rows by the values of a row column in the order of their first
+        occurrence.
+
+        Args:
+            column (str): The name of the row column, e.g. `measurement` or `layer`.
+
+        Yields:
+            tuple[Any, XRFTable]: The value and the table with its rows.
+        """
+        values = getattr(self, column)
+        if not len(values):
+            return
+        _, first, inverse = np.unique(
+            values.astype(str) if values.dtype == object else values,
+            return_index=True,
+            return_inverse=True,
+        )
+        inverse = inverse.ravel()
+        for key in np.argsort(first):
+            yield values[first[key]], self.select(inverse == key)
+
+    def series(self) -> tuple[np.ndarray, list[tuple[str, str]]]:
+        """
+        Groups repeated measurements of the same application and sample into series.
+
+        Returns:
+            tuple[np.ndarray, list[tuple[str, str]]]: The series index of each
+            measurement and the application and sample name of each series in the
+            order of their first measurement.
+        """
+        keys = {}
+        series = [
+            keys.setdefault(key, len(keys))
+            for key in zip(self.application, self.sample_name)
+        ]
+        return np.array(series, dtype=np.int64), list(keys)
+
+    def measurement_rows(self, index: int) -> 'XRFTable':
+        """
+        Returns the table with the rows of one measurement.
+        """
+        return self.select(self.measurement == index)
+
+    def values(
+        self, column: str, elements: Iterable[str], default: float = 0.0
+    ) -> np.ndarray:
+        """
+        Returns the values of a column for the given elements. If an element occurs
+        in several rows, the value of the last row is used.
+
+        Args:
+            column (str): The name of the numeric row column, e.g. `atomic_fraction`.
+            elements (Iterable[str]): The element symbols.
+            default (float): The value for elements without a row.
+
+        Returns:
+            np.ndarray: The values in the order of the elements.
+        """
+        index = {element: row for row, element in enumerate(self.element)}
+        values = getattr(self, column)
+        return np.array(
+            [
+                values[index[element]] if element in index else default
+                for element in elements
+            ],
+            dtype=np.float64,
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Exports the table as nested dictionaries of the measurements, layers and
+        elements, keyed by the application of the measurements. Only the first
+        measurement of every application is kept, see `to_series_dict` for all of
+        them.
+
+        Returns:
+            dict[str, Any]: The application, sample name, date and layers of the
+            first measurement of each application.
+        """
+        measurements = {}
+        for measurement in self.measurement_dicts():
+            measurements.setdefault(measurement['application'], measurement)
+        return measurements
+
+    def to_series_dict(self) -> dict[tuple[str, str], Any]:
+        """
+        Exports the table like `to_dict`, but keyed by the application and sample
+        name of the measurements like the `series`. Later measurements of the same
+        application and sample are listed under `repeats` of the first one.
+
+        Returns:
+            dict[tuple[str, str], Any]: The application, sample name, date and
+            layers of each measurement.
+        """
+        measurements = {}
+        for measurement in self.measurement_dicts():
+            key = (measurement['application'], measurement['sample_name'])
+            if key in measurements:
+                measurements[key].setdefault('repeats', []).append(measurement)
+            else:
+                measurements[key] = measurement
+        return measurements
+
+    def measurement_dicts(self) -> Iterator[dict[str, Any]]:
+        """
+        Yields the nested dictionary of the layers and elements of every measurement
+        in the order of the measurements.
+
+        The rows are sorted by measurement once and the rows of every measurement
+        are a contiguous slice, so the export is linear in the number of rows.
+        """
+        order = np.argsort(self.measurement, kind='stable')
+        bounds = np.searchsorted(
+            self.measurement[order], np.arange(len(self.application) + 1)
+        ).tolist()
+        columns = {name: getattr(self, name)[order].tolist() for name in ROW_COLUMNS}
+        layer, thickness, element, line = (
+            columns[name] for name in ('layer', 'thickness', 'element', 'line')
+        )
+        fraction_columns = ('mass_fraction', 'atomic_fraction')
+        fractions = [columns[name] for name in fraction_columns]
+        intensities = [columns[name] for name in INTENSITY_COLUMNS]
+        # the unit is parsed once instead of for every layer
+        unit = ureg.Unit(THICKNESS_UNIT)
+
+        for index, application in enumerate(self.application):
+            layers = {}
+            for row in range(bounds[index], bounds[index + 1]):
+                content = layers.get(layer[row])
+                if content is None:
+                    content = layers[layer[row]] = {}
+                    if not math.isnan(thickness[row]):
+                        content['thickness'] = ureg.Quantity(thickness[row], unit)
+                if element[row] is None:
+                    continue
+                values = {}
+                for name, column in zip(fraction_columns, fractions):
+                    if not math.isnan(column[row]):
+                        values[name] = column[row]
+                if line[row] is not None:
+                    values['line'] = line[row]
+                    for name, column in zip(INTENSITY_COLUMNS, intensities):
+                        values[name] = None if math.isnan(column[row]) else column[row]
+                content.setdefault('elements', {})[element[row]] = values
+            yield dict(
+                application=application,
+                sample_name=self.sample_name[index],
+                date=self.date[index],
+                layers=layers,
+            )
+
+
+def group_means(
+    groups: np.ndarray, values: np.ndarray, number_of_groups: int
+) -> np.ndarray:
+    """
+    Returns the mean of the values of each group, ignoring NaN values.
+
+    Args:
+        groups (np.ndarray): The group index of each value.
+        values (np.ndarray): The values.
+        number_of_groups (int): The number of groups.
+
+    Returns:
+        np.ndarray: The mean of each group, NaN for groups without values.
+    """
+    valid = ~np.isnan(values)
+    sums = np.bincount(groups[valid], values[valid], minlength=number_of_groups)
+    counts = np.bincount(groups[valid], minlength=number_of_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def group_medians(groups: np.ndarray, values: np.ndarray, counts: np.ndarray):
+    """
+    Returns the median of the values of each group.
+
+    Args:
+        groups (np.ndarray): The group index of each value.
+        values (np.ndarray): The values.
+        counts (np.ndarray): The number of values in each group.
+
+    Returns:
+        np.ndarray: The median of each group.
+    """
+    ordered = values[np.lexsort((values, groups))]
+    starts = np.cumsum(counts) - counts
+    return (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+
+
+def group_statistics(
+    groups: np.ndarray,
+    values: np.ndarray,
+    repeats: np.ndarray,
+    threshold: float = OUTLIER_THRESHOLD,
+) -> dict[str, np.ndarray]:
+    """
+    Computes the statistics of the values of each group.
+
+    Args:
+        groups (np.ndarray): The group index of each value, from 0 to the number of
+            groups.
+        values (np.ndarray): The values.
+        repeats (np.ndarray): The index of the repeat each value belongs to.
+        threshold (float): The modified z-score above which a value is an outlier.
+
+    Returns:
+        dict[str, np.ndarray]: The `number_of_values`, `mean`, `std`, `minimum`,
+        `maximum` and `outliers` of each group.
+    """
+    number_of_groups = groups.max() + 1
+    counts = np.bincount(groups, minlength=number_of_groups)
+    mean = np.bincount(groups, values, number_of_groups) / counts
+    squares = np.bincount(groups, (values - mean[groups]) ** 2, number_of_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(squares / (counts - 1))
+    minimum = np.full(number_of_groups, np.inf)
+    np.minimum.at(minimum, groups, values)
+    maximum = np.full(number_of_groups, -np.inf)
+    np.maximum.at(maximum, groups, values)
+
+    median = group_medians(groups, values, counts)
+    deviation = np.abs(values - median[groups])
+    mad = group_medians(groups, deviation, counts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_score = 0.6745 * deviation / mad[groups]
+    is_outlier = (deviation > 0) & ~(z_score <= threshold)
+    outliers = np.empty(number_of_groups, dtype=object)
+    outliers[:] = [[] for _ in range(number_of_groups)]
+    for group, repeat in zip(groups[is_outlier], repeats[is_outlier]):
+        outliers[group].append(int(repeat))
+
+    return dict(
+        number_of_values=counts,
+        mean=mean,
+        std=std,
+        minimum=minimum,
+        maximum=maximum,
+        outliers=outliers,
+    )
+
+
+def series_statistics(
+    table: XRFTable, threshold: float = OUTLIER_THRESHOLD
+) -> dict[str, np.ndarray]:
+    """
+    Computes the statistics of repeated measurements of the same application and
+    sample. The statistics of the layer thicknesses and of the fractions and
+    intensities of the elements are computed for all series at once.
+
+    Outliers are detected with the modified z-score `0.6745 * (x - median) / MAD`,
+    which unlike the standard deviation is not dominated by the outlier itself for
+    the few repeats of a series.
+
+    Args:
+        table (XRFTable): The table of the measurements.
+        threshold (float): The modified z-score above which a value is an outlier.
+
+    Returns:
+        dict[str, np.ndarray]: Columns with one row per series, layer, element and
+        quantity: `series`, `layer`, `element` (`None` for the thickness),
+        `quantity`, `number_of_values`, `mean`, `std` (NaN for single values),
+        `minimum`, `maximum` and `outliers`, the indices of the outlying repeats in
+        the series.
+    """
+    series, _ = table.series()
+    # index of each measurement within its series
+    order = np.argsort(series, kind='stable')
+    counts = np.bincount(series)
+    repeats = np.empty(len(series), dtype=np.int64)
+    repeats[order] = np.arange(len(series)) - np.repeat(
+        np.cumsum(counts) - counts, counts
+    )
+
+    _, layer_codes = np.unique(table.layer.astype(str), return_inverse=True)
+    _, element_codes = np.unique(table.element.astype(str), return_inverse=True)
+    keys = np.stack(
+        [series[table.measurement], layer_codes.ravel(), element_codes.ravel()], axis=1
+    )
+    # every layer thickness is only counted once per measurement
+    _, first_rows = np.unique(
+        np.stack([table.measurement, layer_codes.ravel()], axis=1),
+        axis=0,
+        return_index=True,
+    )
+    is_first_row = np.zeros(len(table.measurement), dtype=bool)
+    is_first_row[first_rows] = True
+    has_element = table.element != None  # noqa: E711
+
+    columns = {name: [] for name in STATISTICS_COLUMNS}
+    for quantity in STATISTICS_QUANTITIES:
+        values = getattr(table, quantity)
+        if quantity == 'thickness':
+            rows = is_first_row & ~np.isnan(values)
+            group_keys = keys[rows][:, :2]
+        else:
+            rows = has_element & ~np.isnan(values)
+            group_keys = keys[rows]
+        if not rows.any():
+            continue
+        values = values[rows]
+        repeat = repeats[table.measurement[rows]]
+        unique_keys, first, groups = np.unique(
+            group_keys, axis=0, return_index=True, return_inverse=True
+        )
+        groups = groups.ravel()
+        number_of_groups = len(unique_keys)
+        statistics = group_statistics(groups, values, repeat, threshold)
+        row = np.flatnonzero(rows)[first]
+        columns['series'].append(unique_keys[:, 0])
+        columns['layer'].append(table.layer[row])
+        columns['element'].append(
+            np.full(number_of_groups, None, dtype=object)
+            if quantity == 'thickness'
+            else table.element[row]
+        )
+        columns['quantity'].append(np.full(number_of_groups, quantity, dtype=object))
+        for name, column in statistics.items():
+            columns[name].append(column)
+
+    if not columns['series']:
+        return {name: np.array([]) for name in STATISTICS_COLUMNS}
+    statistics = {name: np.concatenate(values) for name, values in columns.items()}
+    order = np.argsort(statistics['series'], kind='stable')
+    return {name: values[order] for name, values in statistics.items()}
+
+
+def position_coordinates(positions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the coordinates of measurement positions like `3-12`, which give the x
+    and y index of the position on a mapped sample.
+
+    Args:
+        positions (np.ndarray): The positions of the measurements.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The x and y coordinates, NaN for positions in
+        another format.
+    """
+    coordinates = np.full((len(positions), 2), np.nan)
+    for index, position in enumerate(positions):
+        match = POSITION_RE.fullmatch(position or '')
+        if match:
+            coordinates[index] = match.groups()
+    return coordinates[:, 0], coordinates[:, 1]
+
+
+def layer_groups(table: XRFTable) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Groups the rows of a table into layers. The rows of a layer are consecutive rows
+    with the same measurement and layer name.
+
+    Args:
+        table (XRFTable): The table of the measurements.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The first row of each layer and the layer
+        index of each row.
+    """
+    starts = np.ones(len(table.measurement), dtype=bool)
+    starts[1:] = (table.measurement[1:] != table.measurement[:-1]) | (
+        table.layer[1:] != table.layer[:-1]
+    )
+    return np.flatnonzero(starts), np.cumsum(starts) - 1
+
+
+def layer_fractions(
+    table: XRFTable, elements: Iterable[str], column: str = 'atomic_fraction'
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """
+    Returns the fractions of the given elements in every layer of every measurement.
+    Missing elements and fractions count as zero. If an element occurs in several
+    rows of a layer, the value of the last row is used.
+
+    Args:
+        table (XRFTable): The table of the measurements.
+        elements (Iterable[str]): The element symbols.
+        column (str): The name of the fraction column.
+
+    Returns:
+        tuple[np.ndarray, dict[str, np.ndarray]]: The first row of each layer and the
+        fractions of each element per layer.
+    """
+    first_rows, layers = layer_groups(table)
+    values = np.nan_to_num(getattr(table, column))
+    fractions = {}
+    for element in elements:
+        if element in fractions:
+            continue
+        rows = table.element == element
+        fractions[element] = np.zeros(len(first_rows))
+        fractions[element][layers[rows]] = values[rows]
+    return first_rows, fractions
+
+
+def layer_ratios(
+    table: XRFTable,
+    ratios: dict[str, tuple[Iterable[str], Iterable[str]]] = None,
+    column: str = 'atomic_fraction',
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """
+    Calculates ratios of summed element fractions for every layer of every
+    measurement in one pass.
+
+    Missing elements and fractions count as zero. A ratio is NaN for layers where its
+    denominator is zero, e.g. GGI for a layer without gallium and indium.
+
+    Args:
+        table (XRFTable): The table of the measurements.
+        ratios (dict[str, tuple[Iterable[str], Iterable[str]]]): The element symbols
+            of the numerator and denominator of each ratio, defaults to `RATIOS`.
+        column (str): The name of the fraction column.
+
+    Returns:
+        tuple[np.ndarray, dict[str, np.ndarray]]: The first row of each layer and the
+        values of each ratio per layer.
+    """
+    if ratios is None:
+        ratios = RATIOS
+    first_rows, fractions = layer_fractions(
+        table,
+        [
+            element
+            for numerator, denominator in ratios.values()
+            for element in (*numerator, *denominator)
+        ],
+        column,
+    )
+
+    def total(elements: Iterable[str]) -> np.ndarray:
+        return sum(
+            (fractions[element] for element in elements), np.zeros(len(first_rows))
+        )
+
+    values_of_ratios = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, (numerator, denominator) in ratios.items():
+            numerator_values = total(numerator)
+            denominator_values = total(denominator)
+            values_of_ratios[name] = np.where(
+                denominator_values != 0,
+                numerator_values / denominator_values,
+                np.nan,
+            )
+    return first_rows, values_of_ratios
+
+
+def cigs_properties(table: XRFTable) -> dict[str, np.ndarray]:
+    """
+    Returns the thickness, GGI and CGI of the CIGS layer of each measurement.
+
+    Args:
+        table (XRFTable): The table of the measurements.
+
+    Returns:
+        dict[str, np.ndarray]: The `thickness` in `THICKNESS_UNIT`, `GGI` and `CGI`
+        of each measurement, NaN for measurements without CIGS layer.
+    """
+    number_of_measurements = len(table.application)
+    first_rows, ratios = layer_ratios(
+        table, {name: RATIOS[name] for name in ('GGI', 'CGI')}
+    )
+    cigs = table.layer[first_rows] == 'CIGS'
+    measurements = table.measurement[first_rows[cigs]]
+    properties = {}
+    for name, values in (
+        ('thickness', table.thickness[first_rows]),
+        ('GGI', ratios['GGI']),
+        ('CGI', ratios['CGI']),
+    ):
+        properties[name] = np.full(number_of_measurements, np.nan)
+        properties[name][measurements] = values[cigs]
+    return properties
+
+
+def grid_map(
+    x: np.ndarray,
+    y: np.ndarray,
+    values: np.ndarray,
+    resolution: int = MAP_RESOLUTION,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Interpolates scattered values onto a regular grid spanning the measured
+    positions. Repeated measurements at the same position are averaged first.
+
+    Values are interpolated linearly inside the convex hull of the positions and
+    left NaN outside of it. If the positions do not span an area, e.g. a single
+    line, the nearest value is used instead.
+
+    Args:
+        x (np.ndarray): The x coordinates of the values.
+        y (np.ndarray): The y coordinates of the values.
+        values (np.ndarray): The values, NaN values are ignored.
+        resolution (int): The maximal number of grid points along each axis. Axes
+            with fewer distinct coordinates use one grid point per coordinate.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: The x and y coordinates of the
+        grid and the values with shape `(len(y), len(x))`.
+    """
+    valid = ~(np.isnan(x) | np.isnan(y) | np.isnan(values))
+    points, groups = np.unique(
+        np.stack([x[valid], y[valid]], axis=1), axis=0, return_inverse=True
+    )
+    groups = groups.ravel()
+    averages = np.bincount(groups, values[valid]) / np.bincount(groups)
+
+    axes = []
+    for axis in points.T:
+        distinct = np.unique(axis)
+        if len(distinct) <= resolution:
+            axes.append(distinct)
+        else:
+            axes.append(np.linspace(distinct[0], distinct[-1], resolution))
+    grid_x, grid_y = np.meshgrid(*axes)
+    try:
+        grid = griddata(points, averages, (grid_x, grid_y), method='linear')
+    except (QhullError, ValueError):
+        grid = griddata(points, averages, (grid_x, grid_y), method='nearest')
+    return axes[0], axes[1], grid
+
+
 def group_composition_into_layers(
-    layers: dict = {},
-    names: list = [],
-    values: list = [],
-    units: list = [],
+    names: list[str],
+    values: list[float],
+    units: list[str],
+    file_name: str = None,
     logger: 'BoundLogger' = None,
-) -> dict:
+) -> dict[str, dict[str, Any]]:
     """
-    Function for grouping the composition data into layers.
+    Function for grouping the composition data into layers. Components with a length
+    unit start a new layer, all following elements belong to it. Elements following
+    the metal layer, which are not part of its name, belong to the substrate.
 
     Args:
-        layers (dict): The layers to group the data into.
-        names (list): The names of the layers.
-        values (list): The values of the layers.
-        units (list): The units of the layers.
+        names (list[str]): The names of the layers and elements.
+        values (list[float]): The thicknesses of the layers and the fractions of the
+            elements.
+        units (list[str]): The units of the values.
+        file_name (str): The name of the file, used for log messages.
+        logger (BoundLogger): A structlog logger.
 
     Returns:
-        dict: The data grouped into layers.
+        dict[str, dict[str, Any]]: The thickness in `THICKNESS_UNIT` and the mass and
+        atomic fractions of the elements of each layer.
     """
+    layers = {}
+    current_layer = None
     reached_metal_layer = False
     reached_substrate_layer = False
 
     for name, value, unit in zip(names, values, units):
         if '%' not in unit:
             current_layer = name
-            layers[current_layer] = dict()
-            layers[current_layer]['thickness'] = value * ureg(unit)
+            layers[current_layer] = dict(
+                thickness=value * unit_factor(unit), elements={}
+            )
             if 'layer' in current_layer.lower():
                 reached_metal_layer = True
-        else:
-            if reached_metal_layer and not reached_substrate_layer:
-                if name not in current_layer:
-                    reached_substrate_layer = True
-                    current_layer = 'Substrate'
-                    layers[current_layer] = dict()
-            if not layers[current_layer].get('elements'):
-                layers[current_layer]['elements'] = dict()
-            if unit == 'mass%':
-                layers[current_layer]['elements'][name] = dict(mass_fraction=value)
-            elif unit == 'at%':
-                layers[current_layer]['elements'][name] = dict(atomic_fraction=value)
-            elif logger is not None:
-                logger.warn(
-                    'read_UIBK_txt found unknown unit "{unit}" in file: "{file_path}"'
-                )
+            continue
+        if reached_metal_layer and not reached_substrate_layer:
+            if name not in current_layer:
+                reached_substrate_layer = True
+                current_layer = 'Substrate'
+                layers[current_layer] = dict(thickness=np.nan, elements={})
+        if current_layer is None:
+            continue
+        if unit == 'mass%':
+            layers[current_layer]['elements'][name] = (value, np.nan)
+        elif unit == 'at%':
+            layers[current_layer]['elements'][name] = (np.nan, value)
+        elif logger is not None:
+            logger.warn(
+                f'read_UIBK_txt found unknown unit "{unit}" in file: "{file_name}"'
+            )
     return layers
 
 
-def sort_intensity_values_into_layers(  # noqa: PLR0913
-    layers: dict = {},
-    int_peak_elements: list = [],
-    int_peak_lines: list = [],
-    int_peak_values: list = [],
-    int_background_lines: list = [],
-    int_background_types: list = [],
-    int_background_values: list = [],
-) -> dict:
+def index_intensity_values(tokens: dict[str, list]) -> dict[str, tuple]:
     """
-    Function for sorting the intensity values into layers.
+    Function for indexing the intensity values by the element they were measured
+    for.
 
     Args:
-        layers (dict): The layers to sort the data into.
-        int_peak_elements (list): The elements of the peak intensity values.
-        int_peak_lines (list): The lines of the peak intensity values.
-        int_peak_values (list): The values of the peak intensity values.
-        int_background_lines (list): The lines of the background intensity values.
-        int_background_types (list): The types of the background intensity values.
-        int_background_values (list): The values of the background intensity values.
+        tokens (dict[str, list]): The tokens of the intensity tables.
 
     Returns:
-        dict: Updated dictionary with the intensity values sorted into layers.
+        dict[str, tuple]: The element line, the peak intensity and the first and
+        second background intensity of each element. Missing intensities are NaN.
     """
-    int_dict = dict()
-
-    # Group peak intensity values into dictionary
-    for line, el, peak in zip(int_peak_lines, int_peak_elements, int_peak_values):
-        if line not in int_dict:
-            int_dict[line] = dict()
-        int_dict[line]['element'] = el
-        int_dict[line]['peak'] = peak
-
-    # Group background intensity values into dictionary
+    intensities = {}
+    for line, peak in zip(tokens['int_peak_lines'], tokens['int_peak_values']):
+        intensities[line] = [peak, np.nan, np.nan]
     for line, bg_type, bg in zip(
-        int_background_lines, int_background_types, int_background_values
+        tokens['int_background_lines'],
+        tokens['int_background_types'],
+        tokens['int_background_values'],
     ):
-        if bg_type == 'BG1':
-            int_dict[line]['BG1'] = bg
-        elif bg_type == 'BG2':
-            int_dict[line]['BG2'] = bg
-
-    # Sort intensity values into layers
-    for layer in layers.values():
-        for element, content in layer['elements'].items():
-            for line, int_values in int_dict.items():
-                if element in line:
-                    content['line'] = line
-                    content['intensity_peak'] = int_values.get('peak')
-                    content['intensity_background'] = int_values.get('BG1')
-                    content['intensity_background_2'] = int_values.get('BG2')
+        if bg_type in {'BG1', 'BG2'}:
+            values = intensities.setdefault(line, [np.nan, np.nan, np.nan])
+            values[1 if bg_type == 'BG1' else 2] = bg
+    return {
+        element: (line, *intensities[line])
+        for element, line in zip(tokens['int_peak_elements'], tokens['int_peak_lines'])
+    }
 
-    return layers
 
+# Header of a measurement, matched on the `PositionType` line and the line after it
+META_RE = re.compile(
+    r'PositionType\s+Application\s+Sample name\s+Date\s+(\S+)\s+'
+    r'Quant analysis\s+(\S+(?:\s\S+)*)\s+(\S+)\s+'
+    r'(\d{4})-\s*(\d{1,2})-\s*(\d{1,2})\s+(\d{1,2}):(\d{2})'
+)
+
+# Separator between two measurements
+SEPARATOR = '_' * 100
+
+# Labels of the table rows of a measurement
+ROW_LABELS = (
+    'Component',
+    'Analyzed value',
+    'Unit',
+    'Element line',
+    'Peak intensity',
+    'BG intensity',
+    'Peak/BG',
+    'Meas. intensity',
+)
+
+# Labels like `Component` or `Element line` start rows of different tables. The
+# table a row belongs to is given by the label of the row that follows it.
+ROW_TOKENS = {
+    ('Component', 'Analyzed value'): 'names',
+    ('Analyzed value', 'Unit'): 'values',
+    ('Unit', 'Component'): 'units',
+    ('Component', 'Element line'): 'int_peak_elements',
+    ('Element line', 'Peak intensity'): 'int_peak_lines',
+    ('Peak intensity', 'BG intensity'): 'int_peak_values',
+    ('Element line', 'Peak/BG'): 'int_background_lines',
+    ('Peak/BG', 'Meas. intensity'): 'int_background_types',
+}
+
+# Row labels by their first word, together with their second word if they have one
+ROW_LABEL_WORDS = {
+    label.split()[0]: (label, label.split()[1] if ' ' in label else None)
+    for label in ROW_LABELS
+}
 
-def read_xrf_txt(file_path: str, logger: 'BoundLogger' = None) -> dict[str, Any]:  # noqa: PLR0915, PLR0912
+# Tokens that are converted to floats
+NUMERIC_TOKENS = ('values', 'int_peak_values', 'int_background_values')
+
+
+def split_measurements(
+    lines: Iterable[Union[str, bytes]],
+) -> Iterator[tuple[list[str], int, bool]]:
     """
-    Function for reading the X-ray fluorescence data in a UIBK `.txt` file.
+    Splits the lines of a UIBK `.txt` file into the lines of the individual
+    measurements, which are separated by lines of at least 100 underscores.
+
+    The consumed lengths are byte offsets only if the lines are bytes, e.g. of a
+    file opened in binary mode. For text lines they count characters, which differ
+    from bytes for non-ASCII text, so they must not be used to seek in the file.
 
     Args:
-        file_path (str): The path to the `.txt` file.
-        logger (BoundLogger): A structlog logger.
+        lines (Iterable[Union[str, bytes]]): The lines of the file, e.g. the file
+            object. Files opened in binary mode are decoded as UTF-8.
+
+    Yields:
+        tuple[list[str], int, bool]: The lines of one measurement including their
+        line breaks, the length of the input consumed for it including the
+        separator, and whether it was terminated by a separator.
+    """
+    terminator = SEPARATOR + '\n'
+    block = []
+    size = 0
+    for line in lines:
+        size += len(line)
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace').replace('\r\n', '\n')  # noqa: PLW2901
+        if line.endswith(terminator):
+            prefix = line[:-1].rstrip('_')
+            if prefix:
+                block.append(prefix)
+            yield block, size, True
+            block = []
+            size = 0
+        else:
+            block.append(line)
+    yield block, size, False
+
+
+def tokenize_measurement(block: list[str]) -> dict[str, Any]:
+    """
+    Tokenizes the lines of one measurement in a single pass.
+
+    Every line is split into words once and classified by looking up its first
+    words in `ROW_LABEL_WORDS`. A row is assigned to its table as soon as the label
+    of the next non-empty line is known.
+
+    Args:
+        block (list[str]): The lines of the measurement.
 
     Returns:
-        dict[str, Any]: The X-ray fluorescence data in a Python dictionary.
+        dict[str, Any]: The header match under `meta` and the whitespace separated
+        tokens of all table rows as strings, e.g. under `names` or `int_peak_lines`.
     """
+    tokens = {key: [] for key in (*ROW_TOKENS.values(), 'int_background_values')}
+    tokens['meta'] = None
+    previous_label, previous_tokens = None, None
 
-    with open(file_path) as file:
-        data = file.read()
+    for index, line in enumerate(block):
+        words = line.split()
+        if not words:
+            continue
+        label, second_word = ROW_LABEL_WORDS.get(words[0], (None, None))
+        if second_word is not None:
+            if words[1:2] == [second_word]:
+                del words[1]
+            else:
+                label = None
+        if previous_label is not None:
+            key = ROW_TOKENS.get((previous_label, label))
+            if key is not None:
+                tokens[key].extend(previous_tokens)
+        previous_label, previous_tokens = label, words[1:]
+        if label is None:
+            if tokens['meta'] is None and words[0] == 'PositionType':
+                tokens['meta'] = META_RE.match(
+                    ''.join(block[index : index + 3]).lstrip()
+                )
+        elif label == 'Meas. intensity' and line.endswith('\n'):
+            tokens['int_background_values'].extend(previous_tokens)
 
-    xrf_dict = dict()
+    return tokens
 
-    # Splitting data into individual measurements
-    measurements = re.split(r'_{100,}\n', data)
-    for measurement in measurements:
-        if len(measurement) > 100:  # noqa: PLR2004
-            # Try to match meta information
-            meta_match = re.search(
-                (
-                    r'PositionType\s+Application\s+Sample name\s+Date\s+(\S+)\s+'
-                    r'Quant analysis\s+(\S+(?:\s\S+)*)\s+(\S+)\s+'
-                    r'(\d{4}-\s*\d{1,2}-\s*\d{1,2}\s+\d{1,2}:\d{2})'
-                ),
-                measurement,
-            )
 
-            # Try to match layers/elements and their thickness/shares
-            names_match = re.findall(r'Component\s+(.*?)\s+Analyzed value', measurement)
-            values_match = re.findall(r'Analyzed value\s+(.*?)\s+Unit', measurement)
-            units_match = re.findall(r'Unit\s+(.*?)\s+Component', measurement)
+def parse_measurement(
+    block: list[str], file_name: str = None, logger: 'BoundLogger' = None
+) -> Optional[XRFRecord]:
+    """
+    Function for parsing the lines of a single measurement.
 
-            # Try to match peak intensity values
-            int_peak_elements_match = re.findall(
-                r'Component\s+(.*?)\s+Element line', measurement
-            )
-            int_peak_lines_match = re.findall(
-                r'Element line\s+(.*?)\s+Peak intensity', measurement
-            )
-            int_peak_values_match = re.findall(
-                r'Peak intensity\s+(.*?)\s+BG intensity', measurement
-            )
+    Args:
+        block (list[str]): The lines of the measurement.
+        file_name (str): The name of the file, used for log messages.
+        logger (BoundLogger): A structlog logger.
 
-            # Try to match background intensity values
-            int_background_lines_match = re.findall(
-                r'Element line\s+(.*?)\s+Peak/BG', measurement
-            )
-            int_background_types_match = re.findall(
-                r'Peak/BG\s+(.*?)\s+Meas. intensity', measurement
+    Returns:
+        Optional[XRFRecord]: The measurement or `None` if it is incomplete.
+    """
+    if sum(len(line) for line in block) <= 100:  # noqa: PLR2004
+        return None
+    tokens = tokenize_measurement(block)
+    meta_match = tokens.pop('meta')
+
+    # Check if all necessary information was found
+    if not (meta_match and all(tokens.values())):
+        if logger is not None:
+            logger.warn(
+                'read_UIBK_txt failed to extract all necessary information '
+                f'from file: "{file_name}"'
             )
-            int_background_values_match = re.findall(
-                r'Meas. intensity\s+(.*?)\n', measurement
+        return None
+    for key in NUMERIC_TOKENS:
+        tokens[key] = [float(value) for value in tokens[key]]
+
+    # Extract metadata
+    position = meta_match.group(1)
+    application = meta_match.group(2).strip()
+    sample_name = meta_match.group(3).strip()
+    # the date is matched by its numbers, as zeros are missing, e.g. '2024- 3- 3  9:33'
+    date = datetime(*map(int, meta_match.group(4, 5, 6, 7, 8)))
+
+    # Check if all intensity values have the same length
+    if not all(
+        (
+            len(tokens['int_peak_elements'])
+            == len(tokens['int_peak_lines'])
+            == len(tokens['int_peak_values']),
+            len(tokens['int_background_lines'])
+            == len(tokens['int_background_types'])
+            == len(tokens['int_background_values']),
+        )
+    ):
+        if logger is not None:
+            logger.warn(
+                'read_UIBK_txt found inconsistent number of '
+                f'intensity values in file: "{file_name}"'
             )
 
-            # Check if all necessary information was found
-            if all(
+    # Group data into layers and look up the intensities of each element
+    layers = group_composition_into_layers(
+        tokens['names'], tokens['values'], tokens['units'], file_name, logger
+    )
+    intensities = index_intensity_values(tokens)
+    no_intensities = (None, np.nan, np.nan, np.nan)
+
+    rows = []
+    for layer, content in layers.items():
+        # Delete layers with thickness 0
+        if content['thickness'] == 0:
+            continue
+        elements = content['elements'] or {None: (np.nan, np.nan)}
+        for element, fractions in elements.items():
+            rows.append(
                 (
-                    meta_match,
-                    names_match,
-                    values_match,
-                    units_match,
-                    int_peak_elements_match,
-                    int_peak_lines_match,
-                    int_peak_values_match,
-                    int_background_lines_match,
-                    int_background_types_match,
-                    int_background_values_match,
-                )
-            ):
-                # Extract metadata
-                application = meta_match.group(2).strip()
-                sample_name = meta_match.group(3).strip()
-                # workaround for missing zeros
-                # e.g. '2024- 3- 3  9:33' -> '2024- 3- 3 T9:33' -> '2024-3-3T9:33'
-                date = 'T'.join(meta_match.group(4).strip().rsplit(' ', 1))
-                date = datetime.strptime(date.replace(' ', ''), '%Y-%m-%dT%H:%M')
-
-                # Extract elements and shares
-                names = [name for line in names_match for name in line.split()]
-                values = [
-                    float(value) for line in values_match for value in line.split()
-                ]
-                units = [unit for line in units_match for unit in line.split()]
-
-                # Extract intensity values
-                int_peak_elements = [
-                    element
-                    for line in int_peak_elements_match
-                    for element in line.split()
-                ]
-                int_peak_lines = [
-                    element for line in int_peak_lines_match for element in line.split()
-                ]
-                int_peak_values = [
-                    float(element)
-                    for line in int_peak_values_match
-                    for element in line.split()
-                ]
-                int_background_lines = [
-                    element
-                    for line in int_background_lines_match
-                    for element in line.split()
-                ]
-                int_background_types = [
-                    element
-                    for line in int_background_types_match
-                    for element in line.split()
-                ]
-                int_background_values = [
-                    float(element)
-                    for line in int_background_values_match
-                    for element in line.split()
-                ]
-
-                # Check if all intensity values have the same length
-                if not all(
-                    (
-                        len(int_peak_elements)
-                        == len(int_peak_lines)
-                        == len(int_peak_values),
-                        len(int_background_lines)
-                        == len(int_background_types)
-                        == len(int_background_values),
-                    )
-                ):
-                    if logger is not None:
-                        logger.warn(
-                            'read_UIBK_txt found inconsistent number of '
-                            'intensity values in file: "{file_path}"'
-                        )
-
-                # Check if application is not already in dictionary
-                if application not in xrf_dict:
-                    # Group data into layers
-                    layers = {}
-                    layers = group_composition_into_layers(
-                        layers, names, values, units, logger
-                    )
-                    layers = sort_intensity_values_into_layers(
-                        layers,
-                        int_peak_elements,
-                        int_peak_lines,
-                        int_peak_values,
-                        int_background_lines,
-                        int_background_types,
-                        int_background_values,
-                    )
-
-                    # Fill dictionary with data
-                    xrf_dict[application] = dict()
-                    xrf_dict[application]['application'] = application
-                    xrf_dict[application]['sample_name'] = sample_name
-                    xrf_dict[application]['date'] = date
-                    xrf_dict[application]['layers'] = layers
-                elif logger is not None:
-                    logger.warn(
-                        'read_UIBK_txt found duplicate application "{application}"'
-                        ' in file: "{file_path}".'
-                    )
-            elif logger is not None:
-                logger.warn(
-                    'read_UIBK_txt failed to extract all necessary information '
-                    'from file: "{file_path}"'
+                    layer,
+                    content['thickness'],
+                    element,
+                    *fractions,
+                    *intensities.get(element, no_intensities),
                 )
+            )
+
+    return XRFRecord(application, sample_name, date, position, rows)
+
+
+def iter_xrf_records(
+    file: Union[TextIO, BinaryIO],
+    logger: 'BoundLogger' = None,
+) -> Iterator[tuple[Optional[XRFRecord], int]]:
+    """
+    Generator for reading a UIBK `.txt` file one measurement at a time, together
+    with the position in the file up to which it was read.
+
+    Only measurements that will not change if the instrument appends to the file
+    are counted: the offset only advances past measurements terminated by a
+    separator. A complete last measurement without separator is yielded with the
+    offset of its start, so that readers resuming from the offset parse it again
+    once it is terminated and can skip it until then. An incomplete last
+    measurement might still be written and is not yielded.
+
+    The consumed lengths are byte offsets only for files opened in binary mode, see
+    `split_measurements`. Files have to be opened in binary mode to resume reading
+    from an offset like `ELNXRayFluorescence.read_data_file`.
+
+    Args:
+        file (Union[TextIO, BinaryIO]): The opened `.txt` file, positioned at the
+            start of a measurement.
+        logger (BoundLogger): A structlog logger.
+
+    Yields:
+        tuple[Optional[XRFRecord], int]: The measurement or `None` if the block
+        was incomplete, and the length of the input consumed up to the end of the
+        block, or up to its start if the block was not terminated.
+    """
+    file_name = getattr(file, 'name', None)
+    offset = 0
+
+    for block, size, terminated in split_measurements(file):
+        measurement = parse_measurement(
+            block, file_name, logger if terminated else None
+        )
+        if measurement is None and not terminated:
+            return
+        if terminated:
+            offset += size
+        yield measurement, offset
+
+
+def iter_xrf_measurements(
+    file: Union[TextIO, BinaryIO], logger: 'BoundLogger' = None
+) -> Iterator[XRFTable]:
+    """
+    Generator for reading the X-ray fluorescence data in a UIBK `.txt` file one
+    measurement at a time.
+
+    Only the lines of the current measurement are kept in memory, so the next
+    measurement can be processed before the whole file is read.
+
+    Args:
+        file (Union[TextIO, BinaryIO]): The opened `.txt` file.
+        logger (BoundLogger): A structlog logger.
+
+    Yields:
+        XRFTable: The table of a single measurement. Repeated measurements of an
+        application are yielded as well.
+    """
+    for record, _ in iter_xrf_records(file, logger):
+        if record is not None:
+            yield XRFTable.from_records([record])
+
+
+def read_xrf_table(
+    file: Union[TextIO, BinaryIO], logger: 'BoundLogger' = None
+) -> XRFTable:
+    """
+    Reads all measurements in a UIBK `.txt` file into one table. Unlike
+    concatenating the tables of `iter_xrf_measurements`, the columns are only
+    converted to arrays once for the whole file.
+
+    Args:
+        file (Union[TextIO, BinaryIO]): The opened `.txt` file.
+        logger (BoundLogger): A structlog logger.
 
-    # Delete layers with thickness 0
-    for application in xrf_dict.values():
-        layers_to_delete = []
-        for layer_key, layer in application['layers'].items():
-            try:
-                if layer['thickness'] == 0:
-                    layers_to_delete.append(layer_key)
-            except KeyError:
-                pass
-        for key in layers_to_delete:
-            del application['layers'][key]
+    Returns:
+        XRFTable: The table of all measurements including repeated ones.
+    """
+    return XRFTable.from_records(
+        record for record, _ in iter_xrf_records(file, logger) if record is not None
+    )
 
+
+def read_sample_names(file: Union[TextIO, BinaryIO]) -> list[str]:
+    """
+    Reads the sample names of the measurements in a UIBK `.txt` file from the header
+    and row labels only, without tokenizing the tables. Like in
+    `iter_xrf_measurements`, measurements without a `Meas. intensity` row are
+    incomplete and ignored.
+
+    Args:
+        file (Union[TextIO, BinaryIO]): The opened `.txt` file.
+
+    Returns:
+        list[str]: The unique sample names in the order of the file.
+    """
+    sample_names = {}
+    sample_name = None
+    lines = (
+        line.decode('utf-8', errors='replace') if isinstance(line, bytes) else line
+        for line in file
+    )
+    for line in lines:
+        stripped = line.lstrip()
+        if stripped.startswith('PositionType'):
+            # the header continues on the next line, see `META_RE`
+            match = META_RE.match(''.join((stripped, *itertools.islice(lines, 2))))
+            sample_name = match.group(3).strip() if match else None
+        elif sample_name is not None and stripped.startswith('Meas. intensity'):
+            sample_names[sample_name] = None
+            sample_name = None
+    return list(sample_names)
+
+
+def checksum(
+    file: BinaryIO,
+    size: int,
+    sha256: 'hashlib._Hash' = None,
+    chunk_size: int = 1 << 20,
+) -> 'hashlib._Hash':
+    """
+    Returns the SHA-256 hash object of the next `size` bytes of a file. The hash
+    object can be updated further, e.g. when more bytes were parsed.
+
+    Args:
+        file (BinaryIO): The file opened in binary mode.
+        size (int): The number of bytes to hash.
+        sha256 (hashlib._Hash): A hash object of the preceding bytes to update.
+        chunk_size (int): The number of bytes read at once.
+
+    Returns:
+        hashlib._Hash: The hash object.
+    """
+    if sha256 is None:
+        sha256 = hashlib.sha256()
+    while size > 0:
+        chunk = file.read(min(chunk_size, size))
+        if not chunk:
+            break
+        sha256.update(chunk)
+        size -= len(chunk)
+    return sha256
+
+
+def read_xrf_spectra(
+    file: Union[TextIO, BinaryIO], logger: 'BoundLogger' = None
+) -> tuple[list[str], np.ndarray, np.ndarray]:
+    """
+    Reads raw XRF spectra from a tab separated export with the energy in keV in the
+    first column and the counts of one spectrum per further column. The first line
+    contains the column names.
+
+    Args:
+        file (Union[TextIO, BinaryIO]): The spectra file.
+        logger (BoundLogger): A structlog logger.
+
+    Returns:
+        tuple[list[str], np.ndarray, np.ndarray]: The names of the spectra, the
+        ascending energies and the counts with one row per spectrum, both as float32.
+    """
+    header = file.readline()
+    if isinstance(header, bytes):
+        header = header.decode('utf-8', errors='replace')
+    names = [name.strip() for name in header.rstrip('\r\n').split('\t')[1:]]
+    data = np.loadtxt(file, dtype=np.float32, delimiter='\t', ndmin=2)
+    if data.shape[1] != len(names) + 1:
+        if logger is not None:
+            logger.warn(
+                f'The spectra file has {data.shape[1] - 1} count columns but '
+                f'{len(names)} names.'
+            )
+        names = [f'spectrum {index}' for index in range(data.shape[1] - 1)]
+    order = np.argsort(data[:, 0], kind='stable')
+    return names, data[order, 0], np.ascontiguousarray(data[order, 1:].T)
+
+
+def integrate_lines(
+    energy: np.ndarray,
+    counts: np.ndarray,
+    regions: Iterable[Iterable[tuple[float, float]]],
+) -> np.ndarray:
+    """
+    Integrates the counts of many spectra in the energy regions of many lines at
+    once. The counts of every spectrum are summed cumulatively once, so every region
+    is the difference of two cumulative sums.
+
+    Args:
+        energy (np.ndarray): The ascending energies shared by the spectra.
+        counts (np.ndarray): The counts with one row per spectrum.
+        regions (Iterable[Iterable[tuple[float, float]]]): The peak, background and
+            second background region of each line as lower and upper energy. Missing
+            or empty regions are NaN.
+
+    Returns:
+        np.ndarray: The summed counts of shape `(spectra, lines, 3)`.
+    """
+    regions = [list(line_regions)[:3] for line_regions in regions]
+    bounds = np.full((len(regions), 3, 2), np.nan)
+    for line, line_regions in enumerate(regions):
+        for region, limits in enumerate(line_regions):
+            if limits is not None:
+                bounds[line, region] = limits
+    counts = np.atleast_2d(counts)
+    cumulative = np.zeros((counts.shape[0], counts.shape[1] + 1))
+    np.cumsum(counts, axis=1, dtype=np.float64, out=cumulative[:, 1:])
+    lower = np.searchsorted(energy, np.nan_to_num(bounds[..., 0]), side='left')
+    upper = np.searchsorted(energy, np.nan_to_num(bounds[..., 1]), side='right')
+    intensities = cumulative[:, upper] - cumulative[:, lower]
+    missing = np.isnan(bounds).any(axis=-1) | (upper <= lower)
+    intensities[:, missing] = np.nan
+    return intensities
+
+
+def read_xrf_txt(file_path: str, logger: 'BoundLogger' = None) -> dict[str, Any]:
+    """
+    Function for reading the X-ray fluorescence data in a UIBK `.txt` file.
+    Measurements of an application that was already read are left out, use
+    `read_xrf_series` to keep repeated measurements.
+
+    Args:
+        file_path (str): The path to the `.txt` file.
+        logger (BoundLogger): A structlog logger.
+
+    Returns:
+        dict[str, Any]: The X-ray fluorescence data in a Python dictionary keyed by
+        the application, see `XRFTable.to_dict`.
+    """
+    with open(file_path) as file:
+        table = read_xrf_table(file, logger)
+    xrf_dict = table.to_dict()
+    if len(xrf_dict) < len(table.application) and logger is not None:
+        logger.warn(
+            f'read_xrf_txt left out {len(table.application) - len(xrf_dict)} '
+            f'measurements of duplicate applications in file: "{file_path}".'
+        )
     return xrf_dict
+
+
+def read_xrf_series(
+    file_path: str, logger: 'BoundLogger' = None
+) -> dict[tuple[str, str], Any]:
+    """
+    Function for reading the X-ray fluorescence data in a UIBK `.txt` file with
+    all repeated measurements.
+
+    Args:
+        file_path (str): The path to the `.txt` file.
+        logger (BoundLogger): A structlog logger.
+
+    Returns:
+        dict[tuple[str, str], Any]: The X-ray fluorescence data in a Python
+        dictionary keyed by the application and sample name, see
+        `XRFTable.to_series_dict`.
+    """
+    with open(file_path) as file:
+        return read_xrf_table(file, logger).to_series_dict()
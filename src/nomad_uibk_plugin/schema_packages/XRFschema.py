@@ -28,13 +28,18 @@ if TYPE_CHECKING:
         BoundLogger,
     )
 
+import math
+import os
+from collections.abc import Iterable
 from typing import (
     TYPE_CHECKING,
-    Any,
+    BinaryIO,
     Callable,
 )
 
 import numpy as np
+import plotly.graph_objects as go
+from ase.data import atomic_masses, atomic_numbers, chemical_symbols
 from nomad.config import config
 from nomad.datamodel.data import (
     ArchiveSection,
@@ -51,13 +56,19 @@ from nomad.datamodel.metainfo.basesections import (
     MeasurementResult,
     ReadableIdentifiers,
 )
+from nomad.datamodel.metainfo.plot import PlotlyFigure, PlotSection
 from nomad.datamodel.results import (
+    ElementalComposition as ResultsElementalComposition,
+)
+from nomad.datamodel.results import (
+    Material,
     Properties,
     Results,
     StructuralProperties,
+    System,
 )
 from nomad.metainfo import Datetime, Quantity, SchemaPackage, Section, SubSection
-from nomad_measurements.utils import merge_sections
+from nomad.units import ureg
 
 from nomad_uibk_plugin.schema_packages import UIBKCategory, XRFreader
 
@@ -70,6 +81,15 @@ configuration = config.get_plugin_entry_point(
 
 m_package = SchemaPackage(name='nomad_xrf')
 
+# Colorbar titles of the mapped values
+MAP_LABELS = {'thickness': f'thickness ({XRFreader.THICKNESS_UNIT})'}
+
+# Numeric columns of the XRF tables written to `XRFElementalComposition`
+ELEMENT_COLUMNS = ('mass_fraction', 'atomic_fraction', *XRFreader.INTENSITY_COLUMNS)
+
+# Intensities of `XRFLineIntensity` in the order of the regions of a line
+INTENSITY_COLUMNS = XRFreader.INTENSITY_COLUMNS
+
 
 class XRFElementalComposition(ElementalComposition):
     m_def = Section(
@@ -115,6 +135,81 @@ class XRFElementalComposition(ElementalComposition):
         super().normalize(archive, logger)
 
 
+class XRFLineIntensity(ArchiveSection):
+    """
+    Section containing the intensities of an element line integrated from a raw
+    spectrum.
+    """
+
+    m_def = Section(label_quantity='line')
+
+    line = Quantity(
+        type=str,
+        description='Elemental line, e.g. `Cu-Ka`',
+    )
+
+    intensity_peak = Quantity(
+        type=np.dtype(np.float64),
+        description='Summed counts in the peak region of the line',
+    )
+
+    intensity_background = Quantity(
+        type=np.dtype(np.float64),
+        description='Summed counts in the background region below the line',
+    )
+
+    intensity_background_2 = Quantity(
+        type=np.dtype(np.float64),
+        description='Summed counts in the background region above the line',
+    )
+
+
+class XRFSpectrum(ArchiveSection):
+    """
+    Section containing the raw spectrum of an X-ray fluorescence measurement.
+    """
+
+    m_def = Section(label_quantity='name')
+
+    name = Quantity(
+        type=str,
+        description='Name of the spectrum in the spectra file',
+    )
+
+    energy = Quantity(
+        type=np.dtype(np.float32),
+        unit='keV',
+        shape=['*'],
+        description='Ascending energies of the spectrum',
+    )
+
+    counts = Quantity(
+        type=np.dtype(np.float32),
+        shape=['*'],
+        description='Counts at the energies',
+    )
+
+    lines = SubSection(section_def=XRFLineIntensity, repeats=True)
+
+
+class XRFRatio(ArchiveSection):
+    """
+    Section containing a ratio of the summed element fractions of a layer.
+    """
+
+    m_def = Section(label_quantity='name')
+
+    name = Quantity(
+        type=str,
+        description='Name of the ratio, e.g. `GGI`',
+    )
+
+    value = Quantity(
+        type=np.dtype(np.float64),
+        description='Value of the ratio calculated from the atomic fractions',
+    )
+
+
 class XRFLayer(StructuralProperties):
     """
     Section containing the properties of a layer in an X-ray fluorescence measurement.
@@ -135,6 +230,8 @@ class XRFLayer(StructuralProperties):
 
     elements = SubSection(section_def=XRFElementalComposition, repeats=True)
 
+    ratios = SubSection(section_def=XRFRatio, repeats=True)
+
 
 class CIGSLayer(XRFLayer):
     """
@@ -167,6 +264,207 @@ class XRFResult(MeasurementResult):
         description='Date of the measurement',
     )
 
+    sample_name = Quantity(
+        type=str,
+        a_eln=ELNAnnotation(component=ELNComponentEnum.StringEditQuantity),
+        description='Name of the measured sample',
+    )
+
+    position = Quantity(
+        type=str,
+        a_eln=ELNAnnotation(component=ELNComponentEnum.StringEditQuantity),
+        description='Position of the measurement on the sample, e.g. `3-12`',
+    )
+
+    spectrum = SubSection(section_def=XRFSpectrum)
+
+
+class XRFStatistics(ArchiveSection):
+    """
+    Section containing the statistics of a value over the repeated measurements of a
+    series.
+    """
+
+    m_def = Section(label_quantity='quantity')
+
+    quantity = Quantity(
+        type=str,
+        description="""
+        Name of the value, e.g. `thickness` of a layer or `atomic_fraction` of an
+        element. Thicknesses are given in nm.
+        """,
+    )
+
+    layer = Quantity(
+        type=str,
+        description='Name of the layer',
+    )
+
+    element = Quantity(
+        type=str,
+        description='Symbol of the element, not set for the thickness of a layer',
+    )
+
+    number_of_values = Quantity(
+        type=int,
+        description='Number of measurements in the series with a value',
+    )
+
+    mean = Quantity(
+        type=np.dtype(np.float64),
+        description='Mean of the values',
+    )
+
+    std = Quantity(
+        type=np.dtype(np.float64),
+        description='Sample standard deviation of the values',
+    )
+
+    minimum = Quantity(
+        type=np.dtype(np.float64),
+        description='Minimum of the values',
+    )
+
+    maximum = Quantity(
+        type=np.dtype(np.float64),
+        description='Maximum of the values',
+    )
+
+    outliers = Quantity(
+        type=np.dtype(np.int64),
+        shape=['*'],
+        description="""
+        Indices of the measurements in the series with an outlying value, detected
+        with a modified z-score above 3.5.
+        """,
+    )
+
+
+class XRFSeries(ArchiveSection):
+    """
+    Section containing repeated measurements of the same application and sample.
+    """
+
+    m_def = Section(label_quantity='name')
+
+    name = Quantity(
+        type=str,
+        description='Application of the measurements',
+    )
+
+    sample_name = Quantity(
+        type=str,
+        description='Name of the measured sample',
+    )
+
+    number_of_measurements = Quantity(
+        type=int,
+        description='Number of measurements in the series',
+    )
+
+    results = Quantity(
+        type=np.dtype(np.int64),
+        shape=['*'],
+        description='Indices of the results of the measurements in the series',
+    )
+
+    statistics = SubSection(section_def=XRFStatistics, repeats=True)
+
+
+class XRFMap(ArchiveSection):
+    """
+    Section containing a value of the measurements on a sample interpolated onto a
+    regular grid of positions.
+    """
+
+    m_def = Section(label_quantity='name')
+
+    name = Quantity(
+        type=str,
+        description='Name of the mapped value, e.g. `GGI`',
+    )
+
+    sample_name = Quantity(
+        type=str,
+        description='Name of the mapped sample',
+    )
+
+    number_of_points = Quantity(
+        type=int,
+        description='Number of measurements the map was interpolated from',
+    )
+
+    x = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*'],
+        description='x coordinates of the grid',
+    )
+
+    y = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*'],
+        description='y coordinates of the grid',
+    )
+
+    values = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*', '*'],
+        description='Values on the grid with one row per y coordinate',
+    )
+
+
+class XRFLayerSummary(ArchiveSection):
+    """
+    Section containing the mean properties of all layers with the same name. The
+    quantities are scalars so that they are available in the search.
+    """
+
+    m_def = Section(label_quantity='name')
+
+    name = Quantity(
+        type=str,
+        description='Name of the layer, e.g. `CIGS`',
+    )
+
+    number_of_measurements = Quantity(
+        type=int,
+        description='Number of results containing the layer',
+    )
+
+    thickness = Quantity(
+        type=np.dtype(np.float64),
+        unit='nm',
+        description='Mean thickness of the layer',
+    )
+
+    GGI = Quantity(
+        type=np.dtype(np.float64),
+        description='Mean Gallium to Gallium+Indium ratio of the layer',
+    )
+
+    CGI = Quantity(
+        type=np.dtype(np.float64),
+        description='Mean Copper to Gallium+Indium ratio of the layer',
+    )
+
+    elements = Quantity(
+        type=str,
+        shape=['*'],
+        description='Symbols of the elements measured in the layer',
+    )
+
+    atomic_fractions = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*'],
+        description='Mean atomic fraction of each element, NaN if not measured',
+    )
+
+    mass_fractions = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*'],
+        description='Mean mass fraction of each element, NaN if not measured',
+    )
+
 
 class XRFSettings(ArchiveSection):
     """
@@ -216,6 +514,156 @@ class XRayFluorescence(Measurement):
     results = Measurement.results.m_copy()
     results.section_def = XRFResult
 
+    series = SubSection(section_def=XRFSeries, repeats=True)
+
+    maps = SubSection(section_def=XRFMap, repeats=True)
+
+    layer_summaries = SubSection(section_def=XRFLayerSummary, repeats=True)
+
+    def results_table(self) -> XRFreader.XRFTable:
+        """
+        Collects the values of all results in a table.
+
+        Returns:
+            XRFTable: The table with one measurement per result.
+        """
+
+        def missing(value):
+            return np.nan if value is None else value
+
+        records = []
+        for result in self.results:
+            rows = []
+            for layer in result.layer:
+                thickness = np.nan
+                if layer.thickness is not None:
+                    thickness = layer.thickness.to(XRFreader.THICKNESS_UNIT).magnitude
+                for composition in layer.elements or [XRFElementalComposition()]:
+                    rows.append(
+                        (
+                            layer.name,
+                            thickness,
+                            composition.element,
+                            missing(composition.mass_fraction),
+                            missing(composition.atomic_fraction),
+                            composition.line,
+                            missing(composition.intensity_peak),
+                            missing(composition.intensity_background),
+                            missing(composition.intensity_background_2),
+                        )
+                    )
+            records.append(
+                XRFreader.XRFRecord(
+                    result.name, result.sample_name, result.date, result.position, rows
+                )
+            )
+        return XRFreader.XRFTable.from_records(records)
+
+    def summarize_layers(self) -> None:
+        """
+        Summarizes the layers of all results by their name into `layer_summaries`
+        with the mean thickness, GGI, CGI and element fractions of each layer name.
+        """
+        table = self.results_table()
+        ratios = {
+            name: configuration.ratios[name]
+            for name in ('GGI', 'CGI')
+            if name in configuration.ratios
+        }
+        first_rows, layer_ratios = XRFreader.layer_ratios(table, ratios)
+        layer_names = list(dict.fromkeys(table.layer[first_rows]))
+        index = {name: layer for layer, name in enumerate(layer_names)}
+        summary_index = np.array(
+            [index[name] for name in table.layer[first_rows]], dtype=int
+        )
+        row_index = summary_index[XRFreader.layer_groups(table)[1]]
+
+        def means(groups: np.ndarray, values: np.ndarray) -> list:
+            return [
+                XRFreader.none_if_nan(value)
+                for value in XRFreader.group_means(groups, values, len(layer_names))
+            ]
+
+        counts = np.bincount(summary_index, minlength=len(layer_names))
+        thickness = means(summary_index, table.thickness[first_rows])
+        values_of_ratios = {
+            name: means(summary_index, values) for name, values in layer_ratios.items()
+        }
+
+        compositions = [{} for _ in layer_names]
+        for element in dict.fromkeys(table.element):
+            if element not in chemical_symbols:
+                continue
+            rows = table.element == element
+            fractions = {
+                column: XRFreader.group_means(
+                    row_index[rows], getattr(table, column)[rows], len(layer_names)
+                )
+                for column in ('atomic_fraction', 'mass_fraction')
+            }
+            for layer in np.unique(row_index[rows]):
+                compositions[layer][element] = (
+                    fractions['atomic_fraction'][layer],
+                    fractions['mass_fraction'][layer],
+                )
+
+        self.layer_summaries = [
+            XRFLayerSummary(
+                name=name,
+                number_of_measurements=int(counts[layer]),
+                thickness=thickness[layer],
+                **{ratio: values[layer] for ratio, values in values_of_ratios.items()},
+                elements=list(compositions[layer]),
+                atomic_fractions=[value[0] for value in compositions[layer].values()],
+                mass_fractions=[value[1] for value in compositions[layer].values()],
+            )
+            for layer, name in enumerate(layer_names)
+        ]
+
+    def write_search_results(self, archive: 'EntryArchive') -> None:
+        """
+        Writes one system per summarized layer into the topology of the material in
+        the archive results, so that compositions, thicknesses, GGI and CGI of the
+        layers can be searched without loading the archive.
+
+        The `layer_summaries` are only computed again if they are missing, e.g.
+        because new measurements were read.
+
+        Args:
+            archive (EntryArchive): The archive containing the section.
+        """
+        if not self.layer_summaries:
+            self.summarize_layers()
+
+        if not archive.results.material:
+            archive.results.material = Material()
+        archive.results.material.topology = [
+            System(
+                label=summary.name,
+                method='parser',
+                description=f'{summary.name} layer measured by X-ray fluorescence',
+                elements=sorted(summary.elements or []),
+                elemental_composition=[
+                    ResultsElementalComposition(
+                        element=element,
+                        atomic_fraction=XRFreader.none_if_nan(float(atomic_fraction)),
+                        mass_fraction=XRFreader.none_if_nan(float(mass_fraction)),
+                        mass=atomic_masses[atomic_numbers[element]] * ureg.amu,
+                    )
+                    for element, atomic_fraction, mass_fraction in (
+                        zip(
+                            summary.elements,
+                            summary.atomic_fractions,
+                            summary.mass_fractions,
+                        )
+                        if summary.elements
+                        else []
+                    )
+                ],
+            )
+            for summary in self.layer_summaries
+        ]
+
     def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger'):
         """
         The normalize function of the `XRayFluorescence` section.
@@ -236,10 +684,12 @@ class XRayFluorescence(Measurement):
         #             xrf=XRFMethod()
         #         )
         #     )
+        if self.results:
+            self.write_search_results(archive)
         super().normalize(archive, logger)
 
 
-class ELNXRayFluorescence(XRayFluorescence, EntryData):
+class ELNXRayFluorescence(XRayFluorescence, EntryData, PlotSection):
     """
     Example section for how XRayFluorescence can be implemented with a general reader
     for some XRF file types.
@@ -264,6 +714,67 @@ class ELNXRayFluorescence(XRayFluorescence, EntryData):
         ),
     )
 
+    data_file_sample = Quantity(
+        type=str,
+        description="""
+        Sample name of the measurements read from the data file, e.g. for the entries
+        of the samples in a data file with several samples. All measurements are read
+        if not set.
+        """,
+    )
+
+    data_file_offset = Quantity(
+        type=int,
+        description="""
+        Number of bytes of the data file that were parsed. When the instrument
+        appends to the file, only the bytes after the offset are parsed again.
+        """,
+    )
+
+    data_file_checksum = Quantity(
+        type=str,
+        description='SHA-256 checksum of the parsed bytes of the data file',
+    )
+
+    reader_version = Quantity(
+        type=str,
+        description='Version of the reader that parsed the data file',
+    )
+
+    data_file_parsed_sample = Quantity(
+        type=str,
+        description="""
+        Value of `data_file_sample` when the data file was parsed. The whole file is
+        parsed again if the sample changes.
+        """,
+    )
+
+    spectra_file = Quantity(
+        type=str,
+        description="""
+        Tab separated file with the energy in keV in the first column and the raw
+        counts of the results in the following columns, in the order of the results.
+        """,
+        a_eln=ELNAnnotation(
+            component=ELNComponentEnum.FileEditQuantity,
+        ),
+    )
+
+    spectra_file_checksum = Quantity(
+        type=str,
+        description='SHA-256 checksum of the spectra file the spectra were read from',
+    )
+
+    create_maps = Quantity(
+        type=bool,
+        default=False,
+        description="""
+        Whether the thickness, GGI and CGI of the CIGS layer are mapped over the
+        measurement positions of each sample.
+        """,
+        a_eln=ELNAnnotation(component=ELNComponentEnum.BoolEditQuantity),
+    )
+
     measurement_identifiers = SubSection(
         section_def=ReadableIdentifiers,
     )
@@ -277,118 +788,445 @@ class ELNXRayFluorescence(XRayFluorescence, EntryData):
         """
         # TODO: Reader selection must be more specific
         if self.data_file.endswith('.txt'):
-            return XRFreader.read_xrf_txt
+            return XRFreader.iter_xrf_records
 
-    def calculate_GGI_CGI(self, list_of_ElementalCompositions) -> tuple[float, float]:
+    def update_material(
+        self,
+        table: XRFreader.XRFTable,
+        archive: 'EntryArchive',
+        logger: 'BoundLogger',
+    ) -> None:
         """
-        Calculate GGI and CGI from the list of ElementalCompositions.
+        Adds the elements of a table to `results.material` in one pass. The result is
+        the same as normalizing an `XRFElementalComposition` for each row, which looks
+        up and rewrites the material for every single element.
 
         Args:
-            list_of_ElementalCompositions (list[XRFElementalComposition]): List of
-            ElementalCompositions.
+            table (XRFTable): The table of the measurements.
+            archive (EntryArchive): The archive containing the section.
+            logger (BoundLogger): A structlog logger.
+        """
+        elements = dict.fromkeys(element for element in table.element if element)
+        if not elements:
+            return
+        has_fraction = (np.nan_to_num(table.atomic_fraction) != 0) | (
+            np.nan_to_num(table.mass_fraction) != 0
+        )
+        # the fractions of the last row of an element are used
+        fractions = {
+            table.element[row]: (
+                XRFreader.none_if_nan(float(table.atomic_fraction[row])),
+                XRFreader.none_if_nan(float(table.mass_fraction[row])),
+            )
+            for row in np.flatnonzero(has_fraction & (table.element != None))  # noqa: E711
+        }
+
+        for element in elements:
+            if element not in chemical_symbols and logger is not None:
+                logger.warn(
+                    f"'{element}' is not a valid element symbol and this "
+                    'elemental_composition section will be ignored.'
+                )
+        if not archive.results:
+            archive.results = Results()
+        if not archive.results.material:
+            archive.results.material = Material()
+        material = archive.results.material
+
+        known_elements = set(material.elements or [])
+        material.elements = [
+            *(material.elements or []),
+            *(
+                element
+                for element in elements
+                if element in chemical_symbols and element not in known_elements
+            ),
+        ]
+        existing = {
+            composition.element: composition
+            for composition in material.elemental_composition
+        }
+        for element, (atomic_fraction, mass_fraction) in fractions.items():
+            if element not in chemical_symbols:
+                continue
+            composition = existing.get(element)
+            if composition is None:
+                composition = ResultsElementalComposition(element=element)
+                material.m_add_sub_section(Material.elemental_composition, composition)
+            composition.atomic_fraction = atomic_fraction
+            composition.mass_fraction = mass_fraction
+            composition.mass = atomic_masses[atomic_numbers[element]] * ureg.amu
+
+    def create_results(self, table: XRFreader.XRFTable) -> list[XRFResult]:
+        """
+        Creates the `XRFResult`s of all measurements of a table in one pass over its
+        layers, with an `XRFLayer`, or a `CIGSLayer` for CIGS, per layer and an
+        `XRFElementalComposition` per element.
+
+        The configured ratios of all layers are calculated together and the finite
+        ones are written to the `ratios` of the layers. The GGI and CGI of CIGS layers
+        are set from the ratios of the same name. All values are set before the
+        sections are added to a parent and none of the sections is normalized.
+
+        Args:
+            table (XRFTable): The table of the measurements.
 
         Returns:
-            tuple[float, float]: GGI and CGI values.
+            list[XRFResult]: The results in the order of the measurements.
         """
-        gallium = 0
-        indium = 0
-        copper = 0
-        for element in list_of_ElementalCompositions:
-            if element.element == 'Ga':
-                gallium = element.atomic_fraction
-            elif element.element == 'In':
-                indium = element.atomic_fraction
-            elif element.element == 'Cu':
-                copper = element.atomic_fraction
-        GGI = gallium / (gallium + indium)
-        CGI = copper / (gallium + indium)
-        return GGI, CGI
+        first_rows, ratios = XRFreader.layer_ratios(table, configuration.ratios)
+        ratios = {name: values.tolist() for name, values in ratios.items()}
+        columns = {
+            name: getattr(table, name).tolist() for name in XRFreader.ROW_COLUMNS
+        }
+        bounds = [*first_rows.tolist(), len(columns['measurement'])]
+        unit = ureg.Unit(XRFreader.THICKNESS_UNIT)
+
+        layers = [[] for _ in table.application]
+        for index, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            name = columns['layer'][start]
+            layer = CIGSLayer() if name == 'CIGS' else XRFLayer()
+            layer.name = name
+            if not math.isnan(columns['thickness'][start]):
+                layer.thickness = ureg.Quantity(columns['thickness'][start], unit)
+
+            compositions = []
+            for row in range(start, end):
+                if columns['element'][row] is None:
+                    continue
+                composition = XRFElementalComposition()
+                composition.element = columns['element'][row]
+                if columns['line'][row] is not None:
+                    composition.line = columns['line'][row]
+                for column in ELEMENT_COLUMNS:
+                    if not math.isnan(columns[column][row]):
+                        setattr(composition, column, columns[column][row])
+                compositions.append(composition)
+            layer.elements = compositions
+
+            list_of_ratios = []
+            for ratio_name, values in ratios.items():
+                if not math.isfinite(values[index]):
+                    continue
+                ratio = XRFRatio()
+                ratio.name = ratio_name
+                ratio.value = values[index]
+                list_of_ratios.append(ratio)
+                if isinstance(layer, CIGSLayer) and ratio_name in {'GGI', 'CGI'}:
+                    setattr(layer, ratio_name, values[index])
+            layer.ratios = list_of_ratios
+            layers[columns['measurement'][start]].append(layer)
+
+        results = []
+        for index, application in enumerate(table.application):
+            result = XRFResult()
+            result.name = application
+            result.date = table.date[index]
+            result.sample_name = table.sample_name[index]
+            result.position = table.position[index]
+            result.layer = layers[index]
+            results.append(result)
+        return results
 
     def write_xrf_data(
         self,
-        xrf_dict: dict[str, Any],
+        records: Iterable[XRFreader.XRFRecord],
         archive: 'EntryArchive',
         logger: 'BoundLogger',
     ) -> None:
         """
-        Write method for populating the `ELNXRayFluorescence` section from a dict.
+        Write method for populating the `ELNXRayFluorescence` section from the
+        measurements yielded by a reader.
+
+        The results are created in bulk by `create_results` and added to the existing
+        results of the section, and samples are added if their lab ID is new. The
+        elements are added to the material together in `update_material`.
 
         Args:
-            xrf_dict (dict[str, Any]): A dictionary with the XRF data.
+            records (Iterable[XRFRecord]): The parsed XRF measurements.
             archive (EntryArchive): The archive containing the section.
             logger (BoundLogger): A structlog logger.
         """
-        # Initialize results and samples lists
-        list_of_results = []
-        list_of_samples = []
-
-        # write for each measurement in xrf_dict
-        for data in xrf_dict.values():
-            name = data.get('application', None)
-            date = data.get('date', None)
-
-            # create list of XRFLayers each with a list of XRFElementalCompositions
-            list_of_XRFLayers = []
-            for layer, content in data.get('layers', []).items():
-                list_of_ElementalCompositions = []
-                for element, attributes in content.get('elements', {}).items():
-                    xel = XRFElementalComposition(
-                        element=element,
-                        mass_fraction=attributes.get('mass_fraction'),
-                        atomic_fraction=attributes.get('atomic_fraction'),
-                        line=attributes.get('line'),
-                        intensity_peak=attributes.get('intensity_peak'),
-                        intensity_background=attributes.get('intensity_background'),
-                        intensity_background_2=attributes.get('intensity_background_2'),
-                    )
-                    xel.normalize(archive, logger)
-                    list_of_ElementalCompositions.append(xel)
-                if layer == 'CIGS':
-                    GGI, CGI = self.calculate_GGI_CGI(list_of_ElementalCompositions)
-                    list_of_XRFLayers.append(
-                        CIGSLayer(
-                            name=layer,
-                            thickness=content.get('thickness', None),
-                            elements=list_of_ElementalCompositions,
-                            GGI=GGI,
-                            CGI=CGI,
-                        )
-                    )
-                else:
-                    list_of_XRFLayers.append(
-                        XRFLayer(
-                            name=layer,
-                            thickness=content.get('thickness', None),
-                            elements=list_of_ElementalCompositions,
-                        )
-                    )
+        table = XRFreader.XRFTable.from_records(records)
+        if self.xrf_settings is None:
+            self.xrf_settings = XRFSettings()
+        if not len(table.application):
+            return
 
-            sample = CompositeSystemReference(
-                lab_id=data.get('sample_name', None),
-            )
-            # append new sample to samples list
-            if sample not in list_of_samples:
+        lab_ids = {sample.lab_id for sample in self.samples}
+        for lab_id in dict.fromkeys(table.sample_name):
+            if lab_id not in lab_ids:
+                lab_ids.add(lab_id)
+                sample = CompositeSystemReference(lab_id=lab_id)
+                self.m_add_sub_section(ELNXRayFluorescence.samples, sample)
                 sample.normalize(archive, logger)
-                list_of_samples.append(sample)
 
-            # append new result to results list
-            result = XRFResult(
-                name=name,
-                date=date,
-                layer=list_of_XRFLayers,
+        # only existing results are read back, the new ones are already in the table
+        all_results = table
+        if self.results:
+            all_results = XRFreader.XRFTable.concatenate([self.results_table(), table])
+        for result in self.create_results(table):
+            self.m_add_sub_section(ELNXRayFluorescence.results, result)
+        # the layers are summarized again with the new measurements
+        self.layer_summaries = []
+        self.update_material(table, archive, logger)
+
+        self.write_series(all_results)
+        if self.create_maps:
+            self.write_maps(all_results)
+
+    def write_series(self, table: XRFreader.XRFTable) -> None:
+        """
+        Groups repeated measurements of the same application and sample into
+        `XRFSeries` with the statistics of their layer thicknesses, fractions and
+        intensities. Measurements that were not repeated get no series.
+
+        Args:
+            table (XRFTable): The table of all results.
+        """
+        series, keys = table.series()
+        statistics = XRFreader.series_statistics(table)
+        list_of_series = []
+        for index, (application, sample_name) in enumerate(keys):
+            results = np.flatnonzero(series == index)
+            if len(results) < 2:  # noqa: PLR2004
+                continue
+            rows = np.flatnonzero(statistics['series'] == index)
+            list_of_series.append(
+                XRFSeries(
+                    name=application,
+                    sample_name=sample_name,
+                    number_of_measurements=len(results),
+                    results=results,
+                    statistics=[
+                        XRFStatistics(
+                            quantity=statistics['quantity'][row],
+                            layer=statistics['layer'][row],
+                            element=statistics['element'][row],
+                            number_of_values=int(statistics['number_of_values'][row]),
+                            mean=statistics['mean'][row],
+                            std=XRFreader.none_if_nan(statistics['std'][row]),
+                            minimum=statistics['minimum'][row],
+                            maximum=statistics['maximum'][row],
+                            outliers=statistics['outliers'][row],
+                        )
+                        for row in rows
+                    ],
+                )
             )
-            result.normalize(archive, logger)
-            list_of_results.append(result)
+        self.series = list_of_series
 
-        xrf_settings = XRFSettings()
-        xrf_settings.normalize(archive, logger)
+    def write_maps(self, table: XRFreader.XRFTable) -> None:
+        """
+        Interpolates the thickness, GGI and CGI of the CIGS layer of each sample onto a
+        regular grid of the measurement positions and plots the maps. Samples with
+        fewer than two measured positions are not mapped.
 
-        xrf = ELNXRayFluorescence(
-            results=list_of_results,
-            xrf_settings=xrf_settings,
-            samples=list_of_samples,
-        )
-        merge_sections(self, xrf, logger)
+        Args:
+            table (XRFTable): The table of all results.
+        """
+        x, y = XRFreader.position_coordinates(table.position)
+        properties = XRFreader.cigs_properties(table)
+        list_of_maps = []
+        for sample_name in dict.fromkeys(table.sample_name):
+            measurements = (table.sample_name == sample_name) & ~np.isnan(x)
+            if len(np.unique(table.position[measurements])) < 2:  # noqa: PLR2004
+                continue
+            for name, values in properties.items():
+                valid = measurements & ~np.isnan(values)
+                if not valid.any():
+                    continue
+                grid_x, grid_y, grid = XRFreader.grid_map(
+                    x[valid], y[valid], values[valid], configuration.map_resolution
+                )
+                list_of_maps.append(
+                    XRFMap(
+                        name=name,
+                        sample_name=sample_name,
+                        number_of_points=int(np.count_nonzero(valid)),
+                        x=grid_x,
+                        y=grid_y,
+                        values=grid,
+                    )
+                )
+        self.maps = list_of_maps
+
+        self.figures = []
+        for xrf_map in self.maps:
+            figure = go.Figure(
+                data=go.Heatmap(
+                    x=xrf_map.x,
+                    y=xrf_map.y,
+                    z=np.where(np.isnan(xrf_map.values), None, xrf_map.values),
+                    colorbar=dict(title=MAP_LABELS.get(xrf_map.name, xrf_map.name)),
+                )
+            )
+            figure.update_layout(
+                title=f'{xrf_map.name} of {xrf_map.sample_name}',
+                template='plotly_white',
+                xaxis=dict(title='x position'),
+                yaxis=dict(title='y position', scaleanchor='x'),
+            )
+            self.figures.append(
+                PlotlyFigure(
+                    label=f'{xrf_map.name} map {xrf_map.sample_name}',
+                    figure=figure.to_plotly_json(),
+                )
+            )
+
+    def read_data_file(
+        self,
+        file: BinaryIO,
+        read_function: Callable,
+        archive: 'EntryArchive',
+        logger: 'BoundLogger',
+    ) -> None:
+        """
+        Reads the data file starting from the stored offset if the checksum of the
+        already parsed bytes still matches and neither the reader nor the
+        `data_file_sample` changed. Otherwise the whole file is parsed again and the
+        previous results are replaced. An unchanged file is not parsed at all, even
+        if it contained no measurements. Only measurements of the `data_file_sample`
+        are read if it is set.
+
+        A last measurement without separator is not read, since the offset does not
+        advance past it, and is added once the instrument terminates it.
+
+        Args:
+            file (BinaryIO): The data file opened in binary mode.
+            read_function (Callable): The read function yielding each measurement
+                together with the number of bytes consumed.
+            archive (EntryArchive): The archive containing the section.
+            logger (BoundLogger): A structlog logger.
+        """
+        offset = 0
+        sha256 = None
+        if (
+            self.data_file_offset
+            and self.data_file_checksum
+            and self.reader_version == XRFreader.READER_VERSION
+            and self.data_file_parsed_sample == self.data_file_sample
+        ):
+            sha256 = XRFreader.checksum(file, self.data_file_offset)
+            if sha256.hexdigest() == self.data_file_checksum:
+                if not file.read(1):
+                    return
+                offset = self.data_file_offset
+            else:
+                sha256 = None
+        file.seek(offset)
+        if sha256 is None:
+            self.results = []
+            self.layer_summaries = []
+            # the spectra of the replaced results are read again
+            self.spectra_file_checksum = None
+
+        end = offset
+
+        def measurements():
+            nonlocal end
+            for measurement, consumed in read_function(file, logger):
+                if offset + consumed == end:
+                    # not terminated yet, read again once the offset passes it
+                    continue
+                end = offset + consumed
+                if measurement is not None and (
+                    self.data_file_sample is None
+                    or measurement.sample_name == self.data_file_sample
+                ):
+                    yield measurement
+
+        self.write_xrf_data(measurements(), archive, logger)
+
+        # extend the checksum of the already parsed bytes by the new bytes
+        file.seek(offset)
+        sha256 = XRFreader.checksum(file, end - offset, sha256)
+        self.data_file_offset = end
+        self.data_file_checksum = sha256.hexdigest()
+        self.reader_version = XRFreader.READER_VERSION
+        self.data_file_parsed_sample = self.data_file_sample
+
+    def read_spectra_file(self, file: BinaryIO, logger: 'BoundLogger') -> None:
+        """
+        Reads the raw spectra and assigns them to the results in the order of their
+        columns. The spectra are not read again if the checksum of the spectra file
+        did not change, so that the line intensities are only integrated for new
+        spectra.
+
+        Args:
+            file (BinaryIO): The spectra file opened in binary mode.
+            logger (BoundLogger): A structlog logger.
+        """
+        size = file.seek(0, os.SEEK_END)
+        file.seek(0)
+        sha256 = XRFreader.checksum(file, size).hexdigest()
+        if sha256 == self.spectra_file_checksum:
+            return
+        file.seek(0)
+
+        names, energy, counts = XRFreader.read_xrf_spectra(file, logger)
+        if len(names) != len(self.results) and logger is not None:
+            logger.warn(
+                f'The spectra file contains {len(names)} spectra for '
+                f'{len(self.results)} results.'
+            )
+        for result, name, result_counts in zip(self.results, names, counts):
+            spectrum = XRFSpectrum()
+            spectrum.name = name
+            spectrum.energy = energy
+            spectrum.counts = result_counts
+            result.spectrum = spectrum
+        self.spectra_file_checksum = sha256
+
+    def write_line_intensities(self) -> None:
+        """
+        Integrates the peak and background regions of the element lines of all
+        results, whose raw spectrum has no line intensities yet. Spectra sharing the
+        same energies are integrated together in one array operation. The regions
+        are the `LINE_REGIONS` of the reader updated by the `line_regions` of the
+        plugin configuration.
+        """
+        regions = {**XRFreader.LINE_REGIONS, **(configuration.line_regions or {})}
+        groups = {}
+        for result in self.results:
+            spectrum = result.spectrum
+            if spectrum is None or spectrum.counts is None or spectrum.lines:
+                continue
+            energy = np.asarray(spectrum.energy.to('keV').magnitude)
+            groups.setdefault(energy.tobytes(), (energy, []))[1].append(result)
+
+        for energy, results in groups.values():
+            lines = {
+                composition.line: None
+                for result in results
+                for layer in result.layer
+                for composition in layer.elements
+                if composition.line in regions
+            }
+            index = {line: column for column, line in enumerate(lines)}
+            intensities = XRFreader.integrate_lines(
+                energy,
+                np.stack([result.spectrum.counts for result in results]),
+                [regions[line] for line in lines],
+            )
+            for result, result_intensities in zip(results, intensities):
+                result_lines = dict.fromkeys(
+                    composition.line
+                    for layer in result.layer
+                    for composition in layer.elements
+                    if composition.line in index
+                )
+                list_of_lines = []
+                for line in result_lines:
+                    line_intensity = XRFLineIntensity()
+                    line_intensity.line = line
+                    for name, value in zip(
+                        INTENSITY_COLUMNS, result_intensities[index[line]].tolist()
+                    ):
+                        if not math.isnan(value):
+                            setattr(line_intensity, name, value)
+                    list_of_lines.append(line_intensity)
+                result.spectrum.lines = list_of_lines
 
     def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger'):
         """
@@ -407,15 +1245,20 @@ class ELNXRayFluorescence(XRayFluorescence, EntryData):
                         f'No compatible reader found for the file: "{self.data_file}".'
                     )
             else:
-                with archive.m_context.raw_file(self.data_file) as file:
-                    xrf_dict = read_function(file.name, logger)
-                if xrf_dict:
-                    self.write_xrf_data(xrf_dict, archive, logger)
-                elif logger is not None:
+                with archive.m_context.raw_file(self.data_file, 'rb') as file:
+                    self.read_data_file(file, read_function, archive, logger)
+                if not self.results and logger is not None:
                     logger.warn(f'No XRF data found in file: "{self.data_file}".')
+        else:
+            # results entered in the ELN are summarized on every save
+            self.layer_summaries = []
+        if self.spectra_file is not None:
+            with archive.m_context.raw_file(self.spectra_file, 'rb') as file:
+                self.read_spectra_file(file, logger)
+        self.write_line_intensities()
+        if self.create_maps and self.results and not self.maps:
+            self.write_maps(self.results_table())
         super().normalize(archive, logger)
-        if not self.results:
-            return
 
 
 m_package.__init_metainfo__()
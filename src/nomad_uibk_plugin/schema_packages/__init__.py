@@ -1,6 +1,11 @@
+from typing import Optional
+
 from nomad.config.models.plugins import SchemaPackageEntryPoint
 from nomad.datamodel.data import EntryDataCategory
 from nomad.metainfo.metainfo import Category
+from pydantic import Field
+
+from nomad_uibk_plugin.schema_packages.XRFconstants import RATIOS
 
 
 class UIBKCategory(EntryDataCategory):
@@ -12,6 +17,18 @@ class UIBKCategory(EntryDataCategory):
 
 
 class SampleSchemaPackageEntryPoint(SchemaPackageEntryPoint):
+    plot_cell_limit: int = Field(
+        2500,
+        description=(
+            'Maximal number of microcells plotted individually in the sample '
+            'overview, larger arrays are binned onto a grid.'
+        ),
+    )
+    plot_resolution: int = Field(
+        100,
+        description='Number of bins along each axis of binned sample overviews.',
+    )
+
     def load(self):
         from nomad_uibk_plugin.schema_packages.sample import m_package
 
@@ -25,6 +42,28 @@ sample = SampleSchemaPackageEntryPoint(
 
 
 class XRFSchemaPackageEntryPoint(SchemaPackageEntryPoint):
+    map_resolution: int = Field(
+        50, description='Maximal number of grid points along each axis of XRF maps.'
+    )
+    ratios: dict[str, tuple[list[str], list[str]]] = Field(
+        default_factory=lambda: {
+            name: (list(numerator), list(denominator))
+            for name, (numerator, denominator) in RATIOS.items()
+        },
+        description=(
+            'Ratios calculated for every XRF layer, given by the element symbols '
+            'summed in their numerator and denominator. Defaults to the `RATIOS` of '
+            'the XRF reader.'
+        ),
+    )
+    line_regions: Optional[dict[str, list[tuple[float, float]]]] = Field(
+        None,
+        description=(
+            'Peak, background and second background energy regions in keV of XRF '
+            'element lines, extending or replacing the default regions.'
+        ),
+    )
+
     def load(self):
         from nomad_uibk_plugin.schema_packages.XRFschema import m_package
 
@@ -38,6 +77,20 @@ xrfschema = XRFSchemaPackageEntryPoint(
 
 
 class IFMSchemaPackageEntryPoint(SchemaPackageEntryPoint):
+    tile_size: int = Field(
+        256, description='Edge length in pixels of the image pyramid tiles.'
+    )
+    tile_format: str = Field(
+        'png', description='Image format of the image pyramid tiles, e.g. "webp".'
+    )
+    max_tile_zoom: Optional[int] = Field(
+        None,
+        description=(
+            'Finest zoom level written to the image pyramid. Defaults to full '
+            'resolution.'
+        ),
+    )
+
     def load(self):
         from nomad_uibk_plugin.schema_packages.IFMschema import m_package
 
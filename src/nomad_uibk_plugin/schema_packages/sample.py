@@ -1,6 +1,9 @@
-from typing import TYPE_CHECKING
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Optional
 
+import numpy as np
 import plotly.graph_objects as go
+from nomad.config import config
 from nomad.datamodel.data import (
     ArchiveSection,
     EntryData,
@@ -12,6 +15,7 @@ from nomad.datamodel.metainfo.basesections import (
 )
 from nomad.datamodel.metainfo.plot import PlotlyFigure, PlotSection
 from nomad.metainfo import Quantity, SchemaPackage, Section, SubSection
+from scipy.spatial import cKDTree
 
 from nomad_uibk_plugin.schema_packages import UIBKCategory
 
@@ -22,10 +26,67 @@ if TYPE_CHECKING:
 
 m_package = SchemaPackage()
 
+configuration = config.get_plugin_entry_point(
+    'nomad_uibk_plugin.schema_packages:sample'
+)
+
+# Colors of the microcell status in the sample overview
+STATUS_COLORS = (
+    '#2A4CDF',
+    '#E41A1C',
+    '#4DAF4A',
+    '#FF7F00',
+    '#984EA3',
+    '#A65628',
+    '#F781BF',
+    '#999999',
+)
+
+
+def bin_cells(
+    positions: np.ndarray, codes: np.ndarray, resolution: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Bins microcells onto a regular grid spanning their positions.
+
+    Args:
+        positions (np.ndarray): The x and y position of every microcell.
+        codes (np.ndarray): A category of every microcell, e.g. its status, as
+            integers starting at 0.
+        resolution (int): The number of bins along each axis.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The x and y centers of
+        the bins, the number of microcells and the most frequent category of each bin
+        with shape `(len(y), len(x))`. The category of empty bins is NaN.
+    """
+    centers, bins = [], []
+    for axis in positions.T:
+        edges = np.linspace(axis.min(), axis.max(), resolution + 1)
+        if edges[0] == edges[-1]:
+            edges = edges[0] + np.arange(resolution + 1) - resolution / 2
+        centers.append((edges[:-1] + edges[1:]) / 2)
+        bins.append(
+            np.clip(np.searchsorted(edges, axis, 'right') - 1, 0, resolution - 1)
+        )
+    number_of_codes = int(codes.max()) + 1 if len(codes) else 1
+    flat = (bins[1] * resolution + bins[0]) * number_of_codes + codes
+    counts = np.bincount(flat, minlength=resolution**2 * number_of_codes).reshape(
+        resolution, resolution, number_of_codes
+    )
+    totals = counts.sum(axis=2)
+    categories = np.where(totals > 0, counts.argmax(axis=2), np.nan)
+    return centers[0], centers[1], totals, categories
+
 
 class MicroCell(CompositeSystem):
     m_def = Section()
 
+    index = Quantity(
+        type=int,
+        description='Index of the microcell in the cells of its array',
+    )
+
     x = Quantity(
         type=float,
         description='X position of the microcell on the sample',
@@ -63,8 +124,308 @@ class ArrayGenerator(ArchiveSection):
 
 
 class MicroCellArray(ArchiveSection):
+    """
+    Array of microcells on a sample.
+
+    Regular arrays are stored compactly by their shape, origin and pitch, optionally
+    with the position, name and status of every cell as arrays. `MicroCell` sections
+    are only created for individual cells when they are needed, e.g. to reference
+    them, see `cell`. Arrays given only by their `cells` are supported as well.
+    """
+
+    shape = Quantity(
+        type=int,
+        shape=[2],
+        description='Number of microcells in x and y direction',
+    )
+    origin = Quantity(
+        type=float,
+        shape=[2],
+        description='X and y position of the first microcell, defaults to (1, 1)',
+    )
+    pitch = Quantity(
+        type=float,
+        shape=[2],
+        description='Distance between neighbouring microcells in x and y direction, '
+        'defaults to (1, 1)',
+    )
+    positions = Quantity(
+        type=np.float64,
+        shape=['*', 2],
+        description='X and y position of every microcell if they are not on the grid',
+    )
+    names = Quantity(
+        type=str,
+        shape=['*'],
+        description='Name of every microcell, defaults to `Cell <x> <y>`',
+    )
+    status = Quantity(
+        type=str,
+        shape=['*'],
+        description='Status of every microcell, e.g. `working` or `shunted`',
+    )
+    number_of_cells = Quantity(
+        type=int,
+        description='Number of microcells in the array',
+    )
     cells = SubSection(section_def=MicroCell, label='MicroCells', repeats=True)
 
+    def cell_count(self) -> int:
+        """
+        Returns the number of microcells in the array.
+        """
+        if self.shape is not None:
+            return int(np.prod(self.shape))
+        if self.positions is not None:
+            return len(self.positions)
+        return len(self.cells)
+
+    def grid_indices(self) -> np.ndarray:
+        """
+        Returns the 1-based x and y index of every microcell of a regular array, with
+        the y index running fastest.
+        """
+        nx, ny = self.shape
+        x, y = np.meshgrid(np.arange(1, nx + 1), np.arange(1, ny + 1), indexing='ij')
+        return np.column_stack([x.ravel(), y.ravel()])
+
+    def cell_positions(self) -> np.ndarray:
+        """
+        Returns the x and y position of every microcell.
+
+        Returns:
+            np.ndarray: The positions with one row per microcell.
+        """
+        if self.positions is not None:
+            return np.asarray(self.positions, dtype=float)
+        if self.shape is not None:
+            origin = np.ones(2) if self.origin is None else np.asarray(self.origin)
+            pitch = np.ones(2) if self.pitch is None else np.asarray(self.pitch)
+            return origin + (self.grid_indices() - 1) * pitch
+        return np.array([[cell.x, cell.y] for cell in self.cells], dtype=float).reshape(
+            -1, 2
+        )
+
+    def cell_name(self, index: int) -> str:
+        """
+        Returns the name of a microcell, `Cell <x> <y>` with the 1-based grid indices
+        of regular arrays without names.
+        """
+        if self.names is not None:
+            return self.names[index]
+        if self.shape is not None:
+            return f'Cell {index // self.shape[1] + 1} {index % self.shape[1] + 1}'
+        if self.positions is not None:
+            return f'Cell {index + 1}'
+        return self.cells[index].name
+
+    def cell_names(self) -> list[str]:
+        """
+        Returns the name of every microcell.
+        """
+        if self.names is not None:
+            return list(self.names)
+        return [self.cell_name(index) for index in range(self.cell_count())]
+
+    def cell(self, index: int) -> MicroCell:
+        """
+        Returns the `MicroCell` section of a microcell and adds it to the `cells` of
+        the array if it does not exist yet, so that it can be referenced.
+
+        Args:
+            index (int): The index of the microcell.
+
+        Returns:
+            MicroCell: The section of the microcell.
+        """
+        if self.shape is None and self.positions is None:
+            return self.cells[index]
+        if not 0 <= index < self.cell_count():
+            raise IndexError(f'Microcell {index} is not in the array.')
+        for cell in self.cells:
+            if cell.index == index:
+                return cell
+        if self.positions is not None:
+            x, y = self.positions[index]
+        else:
+            x, y = self.cell_positions()[index]
+        cell = MicroCell(
+            index=index, x=float(x), y=float(y), name=self.cell_name(index)
+        )
+        self.cells.append(cell)
+        return cell
+
+    def normalize(self, archive: 'EntryArchive', logger: 'BoundLogger') -> None:
+        super().normalize(archive, logger)
+        self.number_of_cells = self.cell_count()
+        for name in ('positions', 'names', 'status'):
+            values = getattr(self, name)
+            if values is not None and len(values) != self.number_of_cells:
+                if logger is not None:
+                    logger.warn(
+                        f'The array has {self.number_of_cells} microcells but '
+                        f'{len(values)} {name}.'
+                    )
+
+
+class MicroCellIndex:
+    """
+    Lookup of the microcells of several arrays by their position, name or lab id.
+
+    Positions on the grid of regular arrays are resolved arithmetically, other
+    positions, names and lab ids through dictionaries built on first use. The
+    nearest microcells of physical coordinates are found with KD-trees over the
+    positions of all arrays or of a single array, which are also built on first use.
+    """
+
+    def __init__(self, arrays: Iterable['MicroCellArray']) -> None:
+        self.arrays = list(arrays)
+        positions = [array.cell_positions() for array in self.arrays]
+        self.positions = np.concatenate([np.zeros((0, 2)), *positions])
+        self.array_indices = np.repeat(
+            np.arange(len(self.arrays)), [len(p) for p in positions]
+        )
+        self.cell_indices = np.concatenate(
+            [np.zeros(0, dtype=int), *(np.arange(len(p)) for p in positions)]
+        )
+        self.layouts = [self.array_layout(array) for array in self.arrays]
+        self._positions = {}
+        self._names = None
+        self._lab_ids = None
+        self._tree = None
+        self._trees = {}
+
+    @staticmethod
+    def array_layout(array: 'MicroCellArray') -> tuple:
+        """
+        Returns the number of cells, shape, origin and pitch of an array and its
+        stored positions and names, which determine the lookup of its microcells.
+        """
+        return (
+            array.cell_count(),
+            *(
+                None if values is None else tuple(values)
+                for values in (array.shape, array.origin, array.pitch)
+            ),
+            array.positions,
+            array.names,
+        )
+
+    def matches(self, arrays: Iterable['MicroCellArray']) -> bool:
+        """
+        Returns whether the index is still valid for the arrays, i.e. the arrays were
+        not replaced and neither their number of cells, shape, origin and pitch nor
+        their stored positions and names were set to new values. Positions and names
+        changed in place are only detected after normalizing the sample.
+        """
+        arrays = list(arrays)
+        if len(arrays) != len(self.arrays):
+            return False
+        for array, indexed_array, layout in zip(arrays, self.arrays, self.layouts):
+            current = self.array_layout(array)
+            if (
+                array is not indexed_array
+                or current[:4] != layout[:4]
+                or any(a is not b for a, b in zip(current[4:], layout[4:]))
+            ):
+                return False
+        return True
+
+    def find_position(self, array: int, x: float, y: float) -> Optional[int]:
+        """
+        Returns the index of the microcell of an array at the given position.
+
+        Args:
+            array (int): The index of the array.
+            x (float): The x position of the microcell.
+            y (float): The y position of the microcell.
+
+        Returns:
+            Optional[int]: The index of the microcell, None if there is none.
+        """
+        micro_cell_array = self.arrays[array]
+        if micro_cell_array.shape is not None and micro_cell_array.positions is None:
+            origin = micro_cell_array.origin
+            pitch = micro_cell_array.pitch
+            origin = np.ones(2) if origin is None else np.asarray(origin)
+            pitch = np.ones(2) if pitch is None else np.asarray(pitch)
+            grid = (np.array([x, y]) - origin) / pitch
+            i, j = np.rint(grid).astype(int)
+            nx, ny = micro_cell_array.shape
+            if np.allclose(grid, (i, j)) and 0 <= i < nx and 0 <= j < ny:
+                return int(i * ny + j)
+            return None
+
+        if array not in self._positions:
+            rows = np.flatnonzero(self.array_indices == array)
+            self._positions[array] = dict(
+                zip(map(tuple, self.positions[rows].tolist()), range(len(rows)))
+            )
+        return self._positions[array].get((float(x), float(y)))
+
+    def find_name(self, name: str) -> Optional[tuple[int, int]]:
+        """
+        Returns the microcell with the given name or lab id.
+
+        Args:
+            name (str): The name or the lab id of the microcell.
+
+        Returns:
+            Optional[tuple[int, int]]: The index of the array and of the microcell,
+            None if there is none.
+        """
+        if self._names is None:
+            self._names = {}
+            for array, micro_cell_array in enumerate(self.arrays):
+                for index, cell_name in enumerate(micro_cell_array.cell_names()):
+                    self._names.setdefault(cell_name, (array, index))
+        if name in self._names:
+            return self._names[name]
+
+        # lab ids are only known for cells with sections, which can be added lazily
+        materialized = tuple(len(array.cells) for array in self.arrays)
+        if self._lab_ids is None or self._lab_ids[0] != materialized:
+            lab_ids = {}
+            for array, micro_cell_array in enumerate(self.arrays):
+                for position, cell in enumerate(micro_cell_array.cells):
+                    if cell.lab_id:
+                        index = position if cell.index is None else cell.index
+                        lab_ids.setdefault(cell.lab_id, (array, index))
+            self._lab_ids = (materialized, lab_ids)
+        return self._lab_ids[1].get(name)
+
+    def nearest(
+        self, x: np.ndarray, y: np.ndarray, array: int = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Finds the microcell closest to each of the given positions.
+
+        Args:
+            x (np.ndarray): The x coordinates.
+            y (np.ndarray): The y coordinates.
+            array (int): The index of the array to search, all arrays by default.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: The index of the array and of
+            the microcell and the distance for each position.
+        """
+        points = np.column_stack([np.ravel(x), np.ravel(y)]).astype(float)
+        if array is not None:
+            if array not in self._trees:
+                rows = np.flatnonzero(self.array_indices == array)
+                self._trees[array] = (rows, cKDTree(self.positions[rows]))
+            rows, tree = self._trees[array]
+        else:
+            if self._tree is None:
+                self._tree = cKDTree(self.positions)
+            rows, tree = None, self._tree
+        if not tree.n:
+            raise ValueError('There are no microcells to search.')
+        distances, found = tree.query(points)
+        if rows is not None:
+            found = rows[found]
+        return self.array_indices[found], self.cell_indices[found], distances
+
 
 class UIBKSample(CompositeSystem, EntryData, PlotSection):
     m_def = Section(
@@ -84,20 +445,21 @@ class UIBKSample(CompositeSystem, EntryData, PlotSection):
 
     def normalize(self, archive, logger):
         super().normalize(archive, logger)
+        # the arrays might have been changed in place
+        self.m_cache.pop('cell_index', None)
 
         # generate a new microcell array if requested
         if (
             self.array_generator
             and self.array_generator.create_array
-            and self.array_generator.array_x > 0
-            and self.array_generator.array_y > 0
+            and self.array_generator.x > 0
+            and self.array_generator.y > 0
         ):
-            cells = [
-                MicroCell(x=x, y=y, name=f'Cell {str(x)} {str(y)}')
-                for x in range(1, self.array_generator.x + 1)
-                for y in range(1, self.array_generator.y + 1)
-            ]
-            self.arrays.append(MicroCellArray(cells=cells))
+            array = MicroCellArray(
+                shape=[self.array_generator.x, self.array_generator.y]
+            )
+            self.arrays.append(array)
+            array.normalize(archive, logger)
             self.array_generator = None
 
         # plot microcell array
@@ -106,37 +468,72 @@ class UIBKSample(CompositeSystem, EntryData, PlotSection):
             self.plot(archive, logger)
 
     def plot(self, archive: 'EntryArchive', logger: 'BoundLogger') -> None:
-        x_values, y_values = self.list_microcell_positions(
-            archive.data.arrays[0], logger
-        )
-        fig = go.Figure(
-            data=go.Scatter(
-                x=x_values,
-                y=y_values,
-                mode='markers',
-                marker=dict(color='#2A4CDF', size=10),
+        """
+        Plots the microcells of the first array colored by their status. Arrays with
+        more than `plot_cell_limit` cells are binned onto a grid, so that the size of
+        the figure does not depend on the number of cells.
+        """
+        array = self.arrays[0]
+        positions = array.cell_positions()
+        if not len(positions):
+            return
+        status = array.status
+        if status is None or len(status) != len(positions):
+            status = ['Microcell'] * len(positions)
+        labels, codes = np.unique(np.asarray(status, dtype=str), return_inverse=True)
+        codes = codes.ravel()
+        colors = [STATUS_COLORS[i % len(STATUS_COLORS)] for i in range(len(labels))]
+
+        if len(positions) <= configuration.plot_cell_limit:
+            names = np.asarray(array.cell_names(), dtype=object)
+            size = float(np.clip(300 / np.sqrt(len(positions)), 3, 10))
+            traces = [
+                go.Scattergl(
+                    x=positions[codes == code, 0],
+                    y=positions[codes == code, 1],
+                    mode='markers',
+                    name=str(label),
+                    text=names[codes == code].tolist(),
+                    hoverinfo='text',
+                    marker=dict(color=colors[code], size=size),
+                )
+                for code, label in enumerate(labels)
+            ]
+        else:
+            x, y, counts, categories = bin_cells(
+                positions, codes, configuration.plot_resolution
             )
-        )
-        annotations = []
-        for i, (x, y) in enumerate(zip(x_values, y_values)):
-            annotations.append(
-                dict(
+            # discrete colorscale with one band per status
+            colorscale = []
+            for code, color in enumerate(colors):
+                colorscale += [
+                    [code / len(labels), color],
+                    [(code + 1) / len(labels), color],
+                ]
+            traces = [
+                go.Heatmap(
                     x=x,
                     y=y,
-                    # text=f'<a href="{url}">MicroCell {int(x)}-{int(y)}</a>',
-                    showarrow=True,
-                    arrowhead=2,
-                    ax=0,
-                    ay=-20,
+                    z=categories,
+                    zmin=-0.5,
+                    zmax=len(labels) - 0.5,
+                    customdata=counts,
+                    colorscale=colorscale,
+                    colorbar=dict(
+                        tickvals=list(range(len(labels))),
+                        ticktext=labels.tolist(),
+                        title='Most frequent status',
+                    ),
+                    hovertemplate='%{customdata} microcells<extra></extra>',
                 )
-            )
+            ]
+
+        fig = go.Figure(data=traces)
         fig.update_layout(
-            title='Sample Overview',
+            title=f'Sample Overview ({len(positions)} microcells)',
             template='plotly_white',
-            # hovermode='closest',
             dragmode=False,
-            annotations=annotations,
-            # clickmode='event+select',
+            yaxis=dict(scaleanchor='x'),
         )
         plot_json = fig.to_plotly_json()
         plot_json['config'] = dict(
@@ -149,12 +546,22 @@ class UIBKSample(CompositeSystem, EntryData, PlotSection):
             )
         )
 
+    def cell_index(self) -> MicroCellIndex:
+        """
+        Returns the lookup of the microcells of all arrays. It is cached in the
+        `m_cache` of the sample, which is not written to the archive, and rebuilt
+        when arrays are replaced or their layout changes, see
+        `MicroCellIndex.matches`, and after normalizing the sample.
+        """
+        arrays = list(self.arrays)
+        cached = self.m_cache.get('cell_index')
+        if cached is None or not cached.matches(arrays):
+            cached = self.m_cache['cell_index'] = MicroCellIndex(arrays)
+        return cached
+
     def list_microcell_positions(self, array, logger: 'BoundLogger'):
-        x_values, y_values = [], []
-        for cell in array.cells:
-            x_values.append(cell.x)
-            y_values.append(cell.y)
-        return x_values, y_values
+        positions = array.cell_positions()
+        return positions[:, 0].tolist(), positions[:, 1].tolist()
 
 
 class UIBKSampleReference(CompositeSystemReference):
@@ -0,0 +1,148 @@
+import os.path
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+from nomad.client import normalize_all, parse
+
+from nomad_uibk_plugin.filereader.Efficienciesreader import (
+    cell_statistics,
+    flag_outliers,
+    is_efficiency_table,
+    read_efficiency_table,
+)
+
+
+def write_table(path: str, number_of_cells: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    values = np.column_stack(
+        [
+            rng.normal(15, 0.5, number_of_cells),
+            rng.normal(0.65, 0.01, number_of_cells),
+            rng.normal(33, 0.5, number_of_cells),
+            rng.normal(0.7, 0.01, number_of_cells),
+        ]
+    )
+    values[3] = [1.0, 0.2, 10.0, 0.3]
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('Solar simulator export;;;;\nOperator;test;;;\n;;;;\n')
+        file.write('Cell;Eff (%);Voc (V);Jsc (mA/cm2);FF\n')
+        for index, row in enumerate(values):
+            numbers = ';'.join(f'{value:.4f}'.replace('.', ',') for value in row)
+            file.write(f'A{index + 1};{numbers}\n')
+        file.write('Mean;15,0;0,65;33,0;0,7\n')
+    return values
+
+
+def test_read_efficiency_table(tmp_path):
+    path = os.path.join(tmp_path, 'results.csv')
+    values = write_table(path, 20)
+    assert is_efficiency_table(path)
+
+    table = read_efficiency_table(path)
+    assert len(table) == 20  # noqa: PLR2004
+    assert table['cell_id'][0] == 'A1'
+    assert np.allclose(table['efficiency'], values[:, 0], atol=1e-4)
+    # fill factors given as fraction are converted to percent
+    assert np.allclose(table['fill_factor'], values[:, 3] * 100, atol=1e-2)
+
+    xlsx_path = os.path.join(tmp_path, 'results.xlsx')
+    pd.DataFrame(
+        {'Device': ['1', '2'], 'PCE': [12.5, 13.0], 'Voc': [0.6, 0.61]}
+    ).to_excel(xlsx_path, index=False)
+    table = read_efficiency_table(xlsx_path)
+    assert table['cell_id'].tolist() == ['1', '2']
+    assert table['efficiency'].tolist() == [12.5, 13.0]
+    assert table['fill_factor'].isna().all()
+
+    with open(path, encoding='utf-8') as file:
+        assert is_efficiency_table(path, file.read(200))
+        assert not is_efficiency_table(path, 'Solar simulator export;;;;\n')
+
+    other_path = os.path.join(tmp_path, 'other.csv')
+    with open(other_path, 'w', encoding='utf-8') as file:
+        file.write('x,y,Whiskers\n1,2,0.5\n')
+    assert not is_efficiency_table(other_path)
+    assert read_efficiency_table(other_path) is None
+
+
+def test_read_efficiency_table_units(tmp_path):
+    path = os.path.join(tmp_path, 'results.csv')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('Cell,Eff (%),Voc (mV),Jsc (A/m2),FF (%)\n')
+        file.write('A1,15.2,650,330,70.1\nA2,15.0,648,328,70.4\n')
+    table = read_efficiency_table(path)
+    assert table['open_circuit_voltage'].tolist() == pytest.approx([0.65, 0.648])
+    assert table['short_circuit_current_density'].tolist() == pytest.approx(
+        [33.0, 32.8]
+    )
+    assert table['fill_factor'].tolist() == pytest.approx([70.1, 70.4])
+
+    # fill factors with unit are only converted by their unit
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('Cell,Eff (%),Voc (V),FF (%)\nA1,0.2,0.1,0.5\nA2,0.3,0.1,0.6\n')
+    assert read_efficiency_table(path)['fill_factor'].tolist() == [0.5, 0.6]
+
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('Cell,Eff (%),Voc (a.u.)\nA1,15.2,650\n')
+    assert read_efficiency_table(path) is None
+
+
+def test_cell_statistics():
+    values = np.array(
+        [[15.0, 0.65], [15.2, 0.66], [14.8, np.nan], [2.0, 0.64], [15.1, -0.1]]
+    )
+    values = np.column_stack([values, np.full((5, 2), np.nan)])
+    assert flag_outliers(values).tolist() == [False, False, False, True, True]
+
+    statistics = cell_statistics(values[:3])
+    assert statistics['mean'][0] == pytest.approx(15.0)
+    assert statistics['number_of_cells'].tolist() == [3, 2, 0, 0]
+    assert statistics['median'][1] == pytest.approx(0.655)
+    assert np.isnan(statistics['maximum'][2])
+
+
+def test_efficiencies_parser_matching(tmp_path):
+    from nomad_uibk_plugin.parsers import efficienciesparser
+
+    header_re = re.compile(efficienciesparser.mainfile_binary_header_re)
+    path = os.path.join(tmp_path, 'results.csv')
+    write_table(path, 5)
+    with open(path, 'rb') as file:
+        assert header_re.search(file.read())
+    assert header_re.search('Zelle;η [%];Voc [mV]\n'.encode())
+    assert header_re.search(b'PK\x03\x04\x14\x00')
+    assert not header_re.search(b'x,y,Whiskers,Chipping\n1,2,0.5,0.1\n')
+    # the columns have to be in the same line
+    assert not header_re.search(b'Efficiency report\nVoc;Jsc\n')
+
+
+def test_EfficienciesParser(tmp_path):
+    path = os.path.join(tmp_path, 'W200_results.csv')
+    values = write_table(path, 400)
+
+    archive = parse(path)[0]
+    normalize_all(archive)
+    data = archive.data
+    assert archive.metadata.entry_name == 'W200_results.csv efficiencies'
+    assert data.number_of_cells == len(data.cell_ids) == 400  # noqa: PLR2004
+    assert data.open_circuit_voltages[0].to('mV').magnitude == pytest.approx(
+        values[0, 1] * 1000, abs=0.1
+    )
+    assert data.outliers[3]
+    assert data.number_of_outliers >= 1
+    efficiency = data.statistics[0]
+    assert efficiency.name == 'efficiency'
+    assert efficiency.number_of_cells == 400 - data.number_of_outliers
+    assert efficiency.mean == pytest.approx(15, abs=0.2)
+    assert data.efficiency == efficiency.maximum
+
+    # replacing the data file imports the cells of the new file
+    other_path = os.path.join(tmp_path, 'W201_results.csv')
+    write_table(other_path, 10, seed=1)
+    data.data_file = 'W201_results.csv'
+    normalize_all(archive)
+    assert data.imported_file == 'W201_results.csv'
+    assert data.number_of_cells == len(data.outliers) == 10  # noqa: PLR2004
+    assert data.efficiency == data.statistics[0].maximum
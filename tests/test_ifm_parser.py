@@ -0,0 +1,38 @@
+import os.path
+import shutil
+
+import numpy as np
+from nomad.client import normalize_all, parse
+from PIL import Image
+
+
+def test_IFMParser(tmp_path):
+    shutil.copy(
+        os.path.join(os.path.dirname(__file__), 'data', 'IFM_Sample_1_info.xml'),
+        tmp_path,
+    )
+    Image.fromarray(np.zeros((40, 60, 3), dtype=np.uint8)).save(
+        os.path.join(tmp_path, 'IFM_Sample.bmp')
+    )
+
+    entry_archive = parse(os.path.join(tmp_path, 'IFM_Sample_1_info.xml'))[0]
+    normalize_all(entry_archive)
+
+    assert entry_archive.metadata.entry_type == 'IFMMeasurement'
+    assert entry_archive.data.metadata_file == 'IFM_Sample_1_info.xml'
+    assert entry_archive.data.image_file == 'IFM_Sample.bmp'
+    assert entry_archive.data.sample_id == '20240829_A1-2'
+    assert entry_archive.data.number_of_tile_rows == 34  # noqa: PLR2004
+    assert entry_archive.data.image_pyramid.width == 60  # noqa: PLR2004
+    assert os.path.exists(os.path.join(tmp_path, 'IFM_Sample_tiles', '0', '0_0.png'))
+    assert entry_archive.data.image_pyramid.source_file == 'IFM_Sample.bmp'
+
+    # replacing the image regenerates the pyramid
+    Image.fromarray(np.zeros((20, 30, 3), dtype=np.uint8)).save(
+        os.path.join(tmp_path, 'IFM_Other.bmp')
+    )
+    entry_archive.data.image_file = 'IFM_Other.bmp'
+    normalize_all(entry_archive)
+    assert entry_archive.data.image_pyramid.source_file == 'IFM_Other.bmp'
+    assert entry_archive.data.image_pyramid.width == 30  # noqa: PLR2004
+    assert os.path.exists(os.path.join(tmp_path, 'IFM_Other_tiles', '0', '0_0.png'))
@@ -1,5 +1,6 @@
 import os.path
 
+import pytest
 from nomad.client import normalize_all, parse
 
 from nomad_uibk_plugin.schema_packages.IFMschema import ureg
@@ -50,3 +51,138 @@ def test_IFMAnalysis():
     assert entry_archive.data.method == 'IFM Two Step Analysis'
     assert entry_archive.metadata.entry_name == 'Analysis'
     assert entry_archive.metadata.entry_type == 'IFMTwoStepAnalysis'
+
+
+def test_read_ifm_xml():
+    from nomad_uibk_plugin.filereader.IFMreader import read_ifm_xml
+
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'IFM_Sample_1_info.xml')
+    with open(test_file, encoding='utf-8') as file:
+        measurement = read_ifm_xml(file, None, None)
+
+    assert measurement.sample_id == '20240829_A1-2'
+    assert measurement.magnification == 9.98687  # noqa: PLR2004
+    assert measurement.exposure_time.to('µs').magnitude == pytest.approx(199.0)
+    assert measurement.start_time.isoformat().startswith('2024-09-30T16:17:34')
+    assert measurement.end_time.isoformat().startswith('2024-09-30T18:16:00')
+    assert measurement.serial_number == '017111212409'
+    assert measurement.end_position.to('cm').magnitude == pytest.approx([3, 3, 0])
+    assert measurement.lateral_resolution.to('µm').magnitude == pytest.approx(3.9142)
+    assert measurement.number_of_tile_rows == 34  # noqa: PLR2004
+    assert measurement.number_of_tile_columns == 25  # noqa: PLR2004
+    assert measurement.decimation == 2  # noqa: PLR2004
+    assert measurement.contrast == 0.05  # noqa: PLR2004
+    assert measurement.histogram_upper_limit == 255  # noqa: PLR2004
+    assert measurement.vignetting_correction is False
+    assert measurement.autofocus is True
+
+
+def test_parse_datetime():
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime
+
+    from nomad_uibk_plugin.filereader.IFMreader import parse_datetime
+
+    assert parse_datetime('Montag, 30. September 2024 16:17:34') == datetime(
+        2024, 9, 30, 16, 17, 34
+    )
+    assert parse_datetime('3. März 2025 08:05:00') == datetime(2025, 3, 3, 8, 5)
+    assert parse_datetime('Freitag, 1. Dez. 2023 23:59:59') == datetime(
+        2023, 12, 1, 23, 59, 59
+    )
+    with pytest.raises(ValueError):
+        parse_datetime('30. Foo 2024 16:17:34')
+
+    # parsing does not depend on global state and can run in a thread pool
+    values = [f'{day}. Januar 2025 12:00:00' for day in range(1, 29)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(parse_datetime, values))
+    assert [result.day for result in results] == list(range(1, 29))
+
+
+def test_DefectPrevalence():
+    import pandas as pd
+
+    from nomad_uibk_plugin.schema_packages.IFMschema import (
+        DefectPrevalence,
+        ImagePyramid,
+        read_prediction_csv,
+    )
+
+    test_file = os.path.join(
+        os.path.dirname(__file__), 'data', 'IFM_Sample_prediction.csv'
+    )
+    defect_data, stride, checksum = read_prediction_csv(test_file)
+    assert defect_data.equals(pd.read_csv(test_file, skiprows=2))
+    defect_columns = ['Whiskers', 'Chipping', 'Scratch', 'No Error']
+    defect_data['type'] = defect_data[defect_columns].idxmax(axis=1)
+    assert stride == 64  # noqa: PLR2004
+    assert len(checksum) == 64  # noqa: PLR2004
+
+    prevalence = DefectPrevalence()
+    prevalence.update_from_data(defect_data, stride, None)
+    assert prevalence.number_of_patches == len(defect_data)
+    assert prevalence.whiskers + prevalence.chipping + prevalence.scratch == (
+        pytest.approx(1 - prevalence.no_error)
+    )
+    assert prevalence.defect_area_fraction == pytest.approx(1 - prevalence.no_error)
+
+    # the area of the whole image is used if the image geometry is known
+    image_pyramid = ImagePyramid(width=64 * 1000, height=64 * 1000)
+    in_image = DefectPrevalence()
+    in_image.update_from_data(defect_data, stride, image_pyramid)
+    assert in_image.defect_area_fraction == pytest.approx(
+        (1 - prevalence.no_error) * len(defect_data) / 1000**2
+    )
+
+    empty = DefectPrevalence()
+    empty.update_from_data(defect_data.iloc[:0], stride, None)
+    assert empty.number_of_patches == 0
+    combined = DefectPrevalence.combine([prevalence, empty, in_image])
+    assert combined.number_of_patches == 2 * len(defect_data)
+    assert combined.chipping == pytest.approx(prevalence.chipping)
+    assert combined.defect_area_fraction == pytest.approx(
+        (prevalence.defect_area_fraction + in_image.defect_area_fraction) / 2
+    )
+    assert DefectPrevalence.combine([empty]) is None
+
+
+def test_write_defect_overlay(tmp_path):
+    from nomad_uibk_plugin.schema_packages.IFMschema import (
+        IFMTwoStepAnalysis,
+        ImagePyramid,
+        read_prediction_csv,
+    )
+
+    test_file = os.path.join(
+        os.path.dirname(__file__), 'data', 'IFM_Sample_prediction.csv'
+    )
+    defect_data, stride, checksum = read_prediction_csv(test_file)
+    image_pyramid = ImagePyramid(tile_size=256, max_zoom=1, width=300, height=200)
+    analysis = IFMTwoStepAnalysis()
+
+    def write(previous):
+        return analysis.write_defect_overlay(
+            defect_data.iloc[:0].assign(label=[]),
+            stride,
+            image_pyramid,
+            output_dir=str(tmp_path),
+            directory='tiles',
+            source_file='IFM_Sample_prediction.csv',
+            checksum=checksum,
+            previous=previous,
+            logger=None,
+        )
+
+    # a prediction without patches gives a fully transparent overlay
+    overlay = write(None)
+    assert overlay.source_checksum == checksum
+    assert os.path.exists(os.path.join(tmp_path, '0', '0_0.png'))
+
+    # the overlay of an unchanged prediction is not written again
+    os.remove(os.path.join(tmp_path, '0', '0_0.png'))
+    assert write(overlay).source_checksum == checksum
+    assert not os.path.exists(os.path.join(tmp_path, '0', '0_0.png'))
+    image_pyramid.width = 400
+    write(overlay)
+    assert os.path.exists(os.path.join(tmp_path, '0', '0_0.png'))
@@ -0,0 +1,55 @@
+import os.path
+
+import numpy as np
+from PIL import Image
+
+from nomad_uibk_plugin.filereader.IFMtiles import (
+    BMPImage,
+    write_overlay_pyramid,
+    write_tile_pyramid,
+)
+
+
+def test_bmp_memmap(tmp_path):
+    image = np.random.default_rng(0).integers(0, 256, (37, 51, 3), dtype=np.uint8)
+    image_path = os.path.join(tmp_path, 'image.bmp')
+    Image.fromarray(image).save(image_path)
+
+    bmp = BMPImage(image_path)
+    assert (bmp.width, bmp.height) == (51, 37)
+    np.testing.assert_array_equal(bmp.read_rows(0, 37), image)
+    np.testing.assert_array_equal(bmp.read_rows(10, 20), image[10:20])
+
+
+def test_tile_pyramid(tmp_path):
+    image = np.random.default_rng(0).integers(0, 256, (300, 520), dtype=np.uint8)
+    image_path = os.path.join(tmp_path, 'image.bmp')
+    Image.fromarray(image).save(image_path)
+
+    output_dir = os.path.join(tmp_path, 'tiles')
+    geometry = write_tile_pyramid(image_path, output_dir, tile_size=128)
+
+    # 520 px -> 260 px -> 130 px -> 65 px
+    assert geometry['full_resolution_zoom'] == 3  # noqa: PLR2004
+    assert geometry['number_of_tiles'] == 1 + 2 * 1 + 3 * 2 + 5 * 3
+    with Image.open(os.path.join(output_dir, '0', '0_0.png')) as tile:
+        assert tile.size == (65, 38)
+    with Image.open(os.path.join(output_dir, '3', '4_2.png')) as tile:
+        np.testing.assert_array_equal(np.asarray(tile), image[256:, 512:])
+    with Image.open(os.path.join(output_dir, '2', '0_0.png')) as tile:
+        expected = image[:256, :256].reshape(128, 2, 128, 2).astype(int).sum((1, 3))
+        np.testing.assert_array_equal(np.asarray(tile), (expected + 2) // 4)
+
+    colors = np.array([[0, 0, 0, 0], [255, 0, 0, 128]])
+    labels = np.zeros((5, 9), dtype=np.uint8)
+    labels[1, 2] = 1
+    output_dir = os.path.join(tmp_path, 'overlay')
+    write_overlay_pyramid(
+        labels, 64, colors, output_dir, width=520, height=300, tile_size=128
+    )
+    with Image.open(os.path.join(output_dir, '3', '1_0.png')) as tile:
+        overlay = np.asarray(tile)
+    assert overlay.shape == (128, 128, 4)
+    assert (overlay[64:, :64] == [255, 0, 0, 128]).all()
+    assert (overlay[64:, 64:] == 0).all()
+    assert (overlay[:64] == 0).all()
@@ -0,0 +1,150 @@
+import nomad.client  # noqa: F401, loads the plugins before the schema packages
+import numpy as np
+import pytest
+from nomad.datamodel import EntryArchive, EntryMetadata
+
+from nomad_uibk_plugin.schema_packages.sample import (
+    ArrayGenerator,
+    MicroCell,
+    MicroCellArray,
+    UIBKSample,
+)
+
+
+def test_generate_microcell_array():
+    archive = EntryArchive(metadata=EntryMetadata())
+    archive.data = sample = UIBKSample(
+        name='Sample',
+        array_generator=ArrayGenerator(create_array=True, x=100, y=100),
+    )
+    sample.normalize(archive, None)
+
+    assert sample.array_generator is None
+    array = sample.arrays[0]
+    assert array.number_of_cells == 100 * 100
+    assert not array.cells
+    positions = array.cell_positions()
+    assert positions.shape == (100 * 100, 2)
+    assert positions[:3].tolist() == [[1, 1], [1, 2], [1, 3]]
+    assert array.cell_names()[100] == 'Cell 2 1'
+
+    cell = array.cell(101)
+    assert (cell.x, cell.y, cell.name, cell.index) == (2, 2, 'Cell 2 2', 101)
+    assert array.cell(101) is cell
+    assert len(array.cells) == 1
+    with pytest.raises(IndexError):
+        array.cell(100 * 100)
+
+
+def test_microcell_array_per_cell_data():
+    array = MicroCellArray(
+        shape=[2, 3], origin=[0.5, 0.25], pitch=[2.0, 1.0], status=['working'] * 6
+    )
+    assert array.cell_positions()[-1].tolist() == [2.5, 2.25]
+
+    array = MicroCellArray(
+        positions=np.array([[0.0, 0.0], [1.5, 0.2]]), names=['left', 'right']
+    )
+    array.normalize(None, None)
+    assert array.number_of_cells == 2  # noqa: PLR2004
+    cell = array.cell(1)
+    assert (cell.x, cell.y, cell.name) == (1.5, 0.2, 'right')
+
+    # arrays given by their cells
+    array = MicroCellArray(cells=[MicroCell(x=3, y=4, name='only')])
+    assert array.cell_positions().tolist() == [[3, 4]]
+    assert array.cell_names() == ['only']
+    assert array.cell(0) is array.cells[0]
+
+
+def test_sample_overview():
+    import json
+
+    archive = EntryArchive(metadata=EntryMetadata())
+    archive.data = sample = UIBKSample(
+        name='Sample',
+        arrays=[MicroCellArray(shape=[3, 2], status=['working', 'shunted'] * 3)],
+    )
+    sample.normalize(archive, None)
+    figure = sample.figures[0].figure
+    assert not figure['layout'].get('annotations')
+    assert [trace['type'] for trace in figure['data']] == ['scattergl'] * 2
+    assert [trace['name'] for trace in figure['data']] == ['shunted', 'working']
+    assert list(figure['data'][0]['text']) == ['Cell 1 2', 'Cell 2 2', 'Cell 3 2']
+
+    # large arrays are binned, so the size of the figure is bounded
+    sizes = []
+    for size in (200, 400):
+        sample.arrays[0] = MicroCellArray(shape=[size, size])
+        sample.normalize(archive, None)
+        figure = sample.figures[0].figure
+        assert [trace['type'] for trace in figure['data']] == ['heatmap']
+        assert np.sum(figure['data'][0]['customdata']) == size * size
+        sizes.append(len(json.dumps(sample.figures[0].m_to_dict())))
+    assert max(sizes) < 200_000  # noqa: PLR2004
+
+
+def test_bin_cells():
+    from nomad_uibk_plugin.schema_packages.sample import bin_cells
+
+    positions = np.array([[0, 0], [0, 0.1], [1, 1], [1, 0]], dtype=float)
+    x, y, counts, categories = bin_cells(positions, np.array([1, 0, 1, 0]), 2)
+    assert x.tolist() == [0.25, 0.75]
+    assert counts.tolist() == [[2, 1], [0, 1]]
+    assert np.isnan(categories[1, 0])
+    assert categories[0, 1] == 0
+    assert categories[1, 1] == 1
+
+
+def test_microcell_index():
+    sample = UIBKSample(
+        name='Sample',
+        arrays=[
+            MicroCellArray(shape=[100, 100], origin=[0.0, 0.0], pitch=[0.5, 0.5]),
+            MicroCellArray(
+                positions=np.array([[100.0, 0.0], [101.0, 0.5]]),
+                names=['left', 'right'],
+            ),
+        ],
+    )
+    index = sample.cell_index()
+    assert sample.cell_index() is index
+    # the index is cached outside of the archive
+    assert sample.m_cache['cell_index'] is index
+    assert 'cell_index' not in sample.m_to_dict()
+
+    assert index.find_position(0, 1.0, 0.5) == 2 * 100 + 1
+    assert index.find_position(0, 1.2, 0.5) is None
+    assert index.find_position(0, 50.0, 0.0) is None
+    assert index.find_position(1, 101.0, 0.5) == 1
+    assert index.find_name('Cell 3 2') == (0, 2 * 100 + 1)
+    assert index.find_name('right') == (1, 1)
+    assert index.find_name('unknown') is None
+
+    sample.arrays[0].cell(5).lab_id = 'S1_cell5'
+    assert sample.cell_index() is index
+    assert index.find_name('S1_cell5') == (0, 5)
+
+    arrays, cells, distances = index.nearest([1.1, 100.9], [0.45, 0.2])
+    assert arrays.tolist() == [0, 1]
+    assert cells.tolist() == [2 * 100 + 1, 1]
+    assert np.allclose(distances, [np.hypot(0.1, 0.05), np.hypot(0.1, 0.3)])
+    arrays, cells, _ = index.nearest(100.9, 0.2, array=0)
+    assert (arrays.tolist(), cells.tolist()) == ([0], [99 * 100])
+    # the tree of a single array is built once
+    tree = index._trees[0]
+    index.nearest(0.0, 0.0, array=0)
+    assert index._trees[0] is tree
+
+    # a new geometry or new names with the same number of cells rebuild the index
+    sample.arrays[0].origin = [10.0, 0.0]
+    assert sample.cell_index() is not index
+    assert sample.cell_index().find_position(0, 11.0, 0.5) == 2 * 100 + 1
+    index = sample.cell_index()
+    sample.arrays[1].names = ['first', 'second']
+    assert sample.cell_index() is not index
+    assert sample.cell_index().find_name('second') == (1, 1)
+
+    sample.arrays.append(MicroCellArray(shape=[1, 1], origin=[-5.0, -5.0]))
+    assert sample.cell_index() is not index
+    assert sample.cell_index().nearest(-4, -4)[0].tolist() == [2]
@@ -0,0 +1,126 @@
+import os.path
+from unittest import mock
+
+from nomad.client import normalize_all, parse
+from nomad.datamodel.metainfo.basesections import CompositeSystemReference
+
+from nomad_uibk_plugin.parsers.sampleparser import (
+    SampleManifestParser,
+    read_sample_manifest,
+)
+
+MANIFEST = """\
+array:
+  shape: [20, 30]
+  pitch: [0.5, 0.5]
+samples:
+  - name: Sample 1
+    lab_id: W200_A1
+  - name: Sample 2
+    lab_id: W200_A2
+    description: Reference sample
+  - lab_id: W200_A3
+    array:
+      shape: [2, 2]
+"""
+
+
+def test_SampleManifestParser_yaml(tmp_path, monkeypatch):
+    # resolving the samples requires a search index
+    monkeypatch.setattr(
+        CompositeSystemReference, 'normalize', lambda self, archive, logger: None
+    )
+    manifest = os.path.join(tmp_path, 'batch.samples.yaml')
+    with open(manifest, 'w', encoding='utf-8') as file:
+        file.write(MANIFEST)
+
+    archives = parse(manifest)
+    for archive in archives:
+        normalize_all(archive)
+
+    main_archive, *child_archives = archives
+    assert main_archive.metadata.entry_name == 'batch.samples.yaml sample manifest'
+    assert len(main_archive.data.samples) == len(child_archives) == 3  # noqa: PLR2004
+
+    samples = {
+        child_archive.metadata.mainfile_key: child_archive.data
+        for child_archive in child_archives
+    }
+    assert samples['W200_A2'].description == 'Reference sample'
+    assert samples['W200_A1'].arrays[0].number_of_cells == 20 * 30
+    assert list(samples['W200_A2'].arrays[0].pitch) == [0.5, 0.5]
+    assert samples['W200_A1'].arrays[0] is not samples['W200_A2'].arrays[0]
+    assert samples['W200_A3'].name == 'W200_A3'
+    assert list(samples['W200_A3'].arrays[0].shape) == [2, 2]
+    assert samples['W200_A3'].figures
+
+
+def test_SampleManifestParser_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        CompositeSystemReference, 'normalize', lambda self, archive, logger: None
+    )
+    manifest = os.path.join(tmp_path, 'batch.samples.csv')
+    with open(manifest, 'w', encoding='utf-8') as file:
+        file.write('name,lab_id,array_x,array_y,pitch_x,pitch_y\n')
+        for index in range(50):
+            file.write(f'Sample {index},W300_{index:02d},10,10,0.2,0.3\n')
+        file.write('No array,W300_50,,,,\n')
+
+    main_archive, *child_archives = parse(manifest)
+    assert len(child_archives) == 51  # noqa: PLR2004
+    samples = {
+        child_archive.metadata.mainfile_key: child_archive.data
+        for child_archive in child_archives
+    }
+    assert samples['W300_07'].name == 'Sample 7'
+    assert list(samples['W300_07'].arrays[0].shape) == [10, 10]
+    assert list(samples['W300_07'].arrays[0].pitch) == [0.2, 0.3]
+    assert not samples['W300_50'].arrays
+
+
+def test_read_sample_manifest_duplicates(tmp_path):
+    manifest = os.path.join(tmp_path, 'batch.samples.csv')
+    with open(manifest, 'w', encoding='utf-8') as file:
+        file.write('name,lab_id\nFirst,W400_A1\nSecond,W400_A1\nNo lab id,\n')
+        file.write('No lab id,\n')
+
+    logger = mock.Mock()
+    samples = read_sample_manifest(manifest, logger)
+    assert list(samples) == ['W400_A1', 'No lab id']
+    assert samples['W400_A1']['name'] == 'First'
+    assert logger.warn.call_count == 2  # noqa: PLR2004
+
+
+def test_SampleManifestParser_invalid_yaml(tmp_path):
+    parser = SampleManifestParser()
+    for content in (
+        'samples:\n  - 1\n',
+        'samples:\n  - W500_A1\n',
+        'samples:\n  - lab_id: W500_A1\n    array: [2, 2]\n',
+        'samples: W500_A1\n',
+        'W500_A1\n',
+    ):
+        manifest = os.path.join(tmp_path, 'batch.samples.yaml')
+        with open(manifest, 'w', encoding='utf-8') as file:
+            file.write(content)
+        assert not parser.is_mainfile(manifest, 'text/plain', b'', content)
+
+
+def test_read_sample_manifest_yaml_scalars(tmp_path):
+    manifest = os.path.join(tmp_path, 'batch.samples.yaml')
+    with open(manifest, 'w', encoding='utf-8') as file:
+        file.write(
+            'array:\n  shape: [2, 3]\n  pitch: [0.5, 0.5]\n'
+            'samples:\n'
+            '  - lab_id: 0012\n    name: yes\n    description:\n'
+            '  - lab_id: [W600_A1, W600_A2]\n'
+            '  - lab_id: 1.50\n'
+        )
+
+    logger = mock.Mock()
+    samples = read_sample_manifest(manifest, logger)
+    assert list(samples) == ['0012', '1.50']
+    assert samples['0012']['name'] == 'yes'
+    assert 'description' not in samples['0012']
+    assert samples['0012']['array'] == {'shape': ['2', '3'], 'pitch': ['0.5', '0.5']}
+    assert logger.warn.call_count == 1
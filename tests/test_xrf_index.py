@@ -0,0 +1,85 @@
+import json
+import os.path
+
+import nomad.client  # noqa: F401, loads the plugins before the schema packages
+import numpy as np
+from nomad.datamodel import EntryArchive, EntryMetadata
+from nomad.datamodel.metainfo.basesections import CompositeSystemReference
+
+from nomad_uibk_plugin.schema_packages.XRFreader import (
+    XRFTable,
+    iter_xrf_measurements,
+    iter_xrf_records,
+)
+from nomad_uibk_plugin.schema_packages.XRFschema import ELNXRayFluorescence
+from nomad_uibk_plugin.XRFindex import XRFLayerIndex, layer_features
+
+TEST_FILE = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+
+
+def read_table() -> XRFTable:
+    with open(TEST_FILE) as file:
+        return XRFTable.concatenate(list(iter_xrf_measurements(file)))
+
+
+def test_layer_features():
+    table = read_table()
+    results, features = layer_features(table)
+    assert list(results) == [0, 1, 2, 3]
+    assert features.shape == (4, 7)
+    assert features[0, 0] == 1850.2  # noqa: PLR2004
+    assert np.isclose(features[0, 1], 8.43 / (8.43 + 17.02))
+    assert list(features[0, 3:]) == [22.51, 8.43, 17.02, 52.04]
+
+
+def test_xrf_layer_index(tmp_path):
+    table = read_table()
+    _, features = layer_features(table)
+    index = XRFLayerIndex()
+    index.update('first', table)
+    index.update('second', table)
+    assert len(index) == 8  # noqa: PLR2004
+
+    neighbours = index.query(features[2], k=3)
+    assert {neighbour[:2] for neighbour in neighbours[:2]} == {
+        ('first', 2),
+        ('second', 2),
+    }
+    assert neighbours[0][2] == 0
+    assert neighbours[2][2] > 0
+    named = dict(zip(index.feature_names, features[2]))
+    assert index.query(named, k=2) == neighbours[:2]
+
+    # updated and removed entries are replaced without rebuilding the tree
+    index.update('first', table.measurement_rows(0))
+    index.remove('second')
+    assert len(index) == 1
+    assert index.query(features[2], k=3) == [
+        ('first', 0, index.query(features[2], k=1)[0][2])
+    ]
+
+    path = os.path.join(tmp_path, 'index.npz')
+    index.save(path)
+    loaded = XRFLayerIndex.load(path)
+    assert loaded.elements == index.elements
+    assert loaded.query(features[0], k=1) == [('first', 0, 0.0)]
+    assert loaded.query_table(table.measurement_rows(0), k=1) == [[('first', 0, 0.0)]]
+
+
+def test_xrf_layer_index_from_archives(tmp_path, monkeypatch):
+    # resolving the samples requires a search index
+    monkeypatch.setattr(
+        CompositeSystemReference, 'normalize', lambda self, archive, logger: None
+    )
+    archive = EntryArchive(metadata=EntryMetadata(entry_id='xrf_entry'))
+    archive.data = xrf = ELNXRayFluorescence(data_file='XRF_example.txt')
+    with open(TEST_FILE, 'rb') as file:
+        xrf.read_data_file(file, iter_xrf_records, archive, None)
+    path = os.path.join(tmp_path, 'xrf.archive.json')
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(archive.m_to_dict(), file)
+
+    index = XRFLayerIndex.from_archives([path])
+    assert len(index) == len(xrf.results)
+    _, features = layer_features(xrf.results_table())
+    assert index.query(features[1], k=1) == [('xrf_entry', 1, 0.0)]
@@ -0,0 +1,46 @@
+import os.path
+import shutil
+
+from nomad.client import normalize_all, parse
+from nomad.datamodel.metainfo.basesections import CompositeSystemReference
+
+
+def test_XRFParser(tmp_path, monkeypatch):
+    # resolving the samples requires a search index
+    monkeypatch.setattr(
+        CompositeSystemReference, 'normalize', lambda self, archive, logger: None
+    )
+    shutil.copy(
+        os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt'), tmp_path
+    )
+
+    archives = parse(os.path.join(tmp_path, 'XRF_example.txt'))
+    for archive in archives:
+        # the children read the data file of the main entry
+        archive.m_context = archives[0].m_context
+        normalize_all(archive)
+
+    main_archive, *child_archives = archives
+    assert main_archive.metadata.entry_name == 'XRF_example.txt data file'
+    assert len(main_archive.data.measurements) == len(child_archives) == 3  # noqa: PLR2004
+
+    measurements = {
+        child_archive.metadata.mainfile_key: child_archive.data
+        for child_archive in child_archives
+    }
+    assert len(measurements['W123_A1'].results) == 2  # noqa: PLR2004
+    assert measurements['W123_A1'].results[0].name == 'CIGS on Mo'
+    assert measurements['W124_B3'].results[0].name == 'CdS CIGS stack'
+    assert [sample.lab_id for sample in measurements['W124_B3'].samples] == ['W124_B3']
+
+    # the children re-read only their sample from the unchanged data file
+    measurement = measurements['W123_A1']
+    assert measurement.data_file == 'XRF_example.txt'
+    assert measurement.data_file_sample == 'W123_A1'
+    offset = measurement.data_file_offset
+    assert offset == os.path.getsize(os.path.join(tmp_path, 'XRF_example.txt'))
+    for child_archive in child_archives:
+        normalize_all(child_archive)
+    assert len(measurement.results) == 2  # noqa: PLR2004
+    assert measurement.data_file_offset == offset
+    assert {result.sample_name for result in measurement.results} == {'W123_A1'}
@@ -0,0 +1,499 @@
+import datetime
+import hashlib
+import io
+import json
+import os.path
+import subprocess
+import sys
+
+import nomad.client  # noqa: F401, loads the plugins before the schema packages
+import numpy as np
+from nomad.config import config
+from nomad.datamodel import EntryArchive
+from nomad.datamodel.metainfo.basesections import CompositeSystemReference
+from nomad.datamodel.results import Results
+from xrf_synthetic import generate_xrf_export
+
+from nomad_uibk_plugin.schema_packages import XRFreader
+from nomad_uibk_plugin.schema_packages.XRFreader import (
+    XRFTable,
+    checksum,
+    grid_map,
+    integrate_lines,
+    iter_xrf_measurements,
+    iter_xrf_records,
+    layer_ratios,
+    position_coordinates,
+    read_xrf_series,
+    read_xrf_table,
+    read_xrf_txt,
+    series_statistics,
+    split_measurements,
+)
+from nomad_uibk_plugin.schema_packages.XRFschema import ELNXRayFluorescence
+
+
+def to_json(xrf_dict):
+    if isinstance(xrf_dict, dict):
+        return {
+            ' / '.join(key) if isinstance(key, tuple) else key: to_json(value)
+            for key, value in xrf_dict.items()
+        }
+    if isinstance(xrf_dict, list):
+        return [to_json(value) for value in xrf_dict]
+    if isinstance(xrf_dict, datetime.datetime):
+        return xrf_dict.isoformat()
+    if hasattr(xrf_dict, 'magnitude'):
+        return [xrf_dict.magnitude, str(xrf_dict.units)]
+    return xrf_dict
+
+
+def test_read_xrf_txt():
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    expected_file = os.path.join(
+        os.path.dirname(__file__), 'data', 'XRF_example_expected.json'
+    )
+    with open(expected_file, encoding='utf-8') as file:
+        expected = json.load(file)
+
+    # output of the regex based reader before the single pass tokenizer
+    assert to_json(read_xrf_txt(test_file)) == expected
+
+    # the series keep the repeated measurements, keyed by application and sample name
+    series_file = os.path.join(
+        os.path.dirname(__file__), 'data', 'XRF_example_series_expected.json'
+    )
+    with open(series_file, encoding='utf-8') as file:
+        expected = json.load(file)
+    assert to_json(read_xrf_series(test_file)) == expected
+
+
+def test_iter_xrf_measurements():
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    with open(test_file) as file:
+        lines = file.readlines()
+
+    consumed = []
+
+    def stream():
+        for line in lines:
+            consumed.append(line)
+            yield line
+
+    measurements = iter_xrf_measurements(stream())
+    first = next(measurements)
+    assert first.application[0] == 'CIGS on Mo'
+    # the first measurement is available before the whole file is read
+    assert len(consumed) < len(lines) / 2
+    # repeated measurements of an application are kept
+    assert [measurement.sample_name[0] for measurement in measurements] == [
+        'W123_A2',
+        'W124_B3',
+        'W123_A1',
+    ]
+
+
+def test_iter_xrf_records_from_offset():
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    with open(test_file, 'rb') as file:
+        data = file.read()
+
+    # the instrument is still writing the fourth measurement
+    head = data[: data.index(b'Broken') + 10]
+    records = list(iter_xrf_records(io.BytesIO(head)))
+    offset = records[-1][1]
+    assert [m.sample_name for m, _ in records if m] == [
+        'W123_A1',
+        'W123_A2',
+        'W124_B3',
+    ]
+    assert head[:offset].endswith(b'_' * 100 + b'\n')
+
+    # a complete last measurement without separator does not advance the offset
+    unterminated = data[: data.rindex(b'_' * 100)]
+    records = list(iter_xrf_records(io.BytesIO(unterminated)))
+    assert records[-1][0].sample_name == 'W123_A1'
+    assert records[-1][1] == records[-2][1]
+
+    # only the appended tail is parsed on the next read
+    tail = io.BytesIO(data)
+    tail.seek(offset)
+    records = list(iter_xrf_records(tail))
+    assert [m.sample_name for m, _ in records if m] == ['W123_A1']
+    assert offset + records[-1][1] == len(data)
+
+    sha256 = checksum(io.BytesIO(data), offset)
+    sha256 = checksum(io.BytesIO(data[offset:]), len(data) - offset, sha256)
+    assert sha256.hexdigest() == hashlib.sha256(data).hexdigest()
+
+
+def test_split_measurements_counts_bytes():
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    with open(test_file, 'rb') as file:
+        data = file.read().replace(b'CIGS on Mo', 'CIGS on Mo ü'.encode())
+
+    # the offsets of binary lines are bytes, so non-ASCII text can be resumed
+    sizes = [size for _, size, _ in split_measurements(io.BytesIO(data))]
+    assert sum(sizes) == len(data)
+    # the lengths of text lines are characters
+    text = data.decode()
+    assert sum(size for _, size, _ in split_measurements(io.StringIO(text))) == len(
+        text
+    )
+    assert len(text) < len(data)
+
+
+def test_xrf_table():
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    with open(test_file) as file:
+        table = read_xrf_table(file)
+    with open(test_file) as file:
+        tables = list(iter_xrf_measurements(file))
+
+    # the columns of the whole file equal the concatenated measurements
+    for name, column in vars(XRFTable.concatenate(tables)).items():
+        np.testing.assert_array_equal(getattr(table, name), column)
+    assert list(table.sample_name) == ['W123_A1', 'W123_A2', 'W124_B3', 'W123_A1']
+    assert len(table.element) == len(table.measurement) == 23  # noqa: PLR2004
+    layers = [layer for layer, _ in table.measurement_rows(0).groupby('layer')]
+    assert layers == ['CIGS', 'Mo-layer', 'Substrate']
+
+    cigs = table.measurement_rows(2).select(table.measurement_rows(2).layer == 'CIGS')
+    gallium, indium = cigs.values('atomic_fraction', ('Ga', 'In'))
+    assert (gallium, indium) == (9.1, 16.5)
+    # lines are looked up by element instead of substrings of the line
+    assert table.line[table.element == 'Se'][0] == 'Se-Ka'
+    assert np.isnan(table.thickness[table.layer == 'Substrate']).all()
+
+
+def test_xrf_table_to_dict():
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    with open(test_file) as file:
+        table = XRFTable.concatenate(iter_xrf_measurements(file))
+
+    # only the first measurement of an application is exported by default
+    assert list(table.to_dict()) == ['CIGS on Mo', 'CdS CIGS stack']
+    assert table.to_dict()['CIGS on Mo']['sample_name'] == 'W123_A1'
+
+    # measurements of the same application on two samples are not repeats
+    measurements = table.to_series_dict()
+    assert list(measurements) == [
+        ('CIGS on Mo', 'W123_A1'),
+        ('CIGS on Mo', 'W123_A2'),
+        ('CdS CIGS stack', 'W124_B3'),
+    ]
+    repeats = measurements['CIGS on Mo', 'W123_A1']['repeats']
+    assert [repeat['sample_name'] for repeat in repeats] == ['W123_A1']
+    assert 'repeats' not in measurements['CIGS on Mo', 'W123_A2']
+    _, keys = table.series()
+    assert list(measurements) == keys
+
+
+def test_read_data_file(monkeypatch):
+    # resolving the samples requires a search index
+    monkeypatch.setattr(
+        CompositeSystemReference, 'normalize', lambda self, archive, logger: None
+    )
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    with open(test_file, 'rb') as file:
+        data = file.read()
+    head = data[: data.index(b'Broken')]
+
+    archive = EntryArchive()
+    archive.data = xrf = ELNXRayFluorescence(data_file='XRF_example.txt')
+    xrf.read_data_file(io.BytesIO(head), iter_xrf_records, archive, None)
+    assert [result.sample_name for result in xrf.results] == [
+        'W123_A1',
+        'W123_A2',
+        'W124_B3',
+    ]
+    first_result = xrf.results[0]
+
+    # an unchanged file is skipped, appended measurements are added, a last
+    # measurement is only added once its separator was written
+    xrf.read_data_file(io.BytesIO(head), iter_xrf_records, archive, None)
+    unterminated = data[: data.rindex(b'_' * 100)]
+    xrf.read_data_file(io.BytesIO(unterminated), iter_xrf_records, archive, None)
+    assert len(xrf.results) == 3  # noqa: PLR2004
+    assert xrf.data_file_offset < len(unterminated)
+    xrf.read_data_file(io.BytesIO(data), iter_xrf_records, archive, None)
+    assert xrf.results[0] is first_result
+    assert len(xrf.results) == 4  # noqa: PLR2004
+    assert xrf.data_file_offset == len(data)
+    series = xrf.series[0]
+    assert series.sample_name == 'W123_A1'
+    assert list(series.results) == [0, 3]
+    assert series.statistics
+    cigs = xrf.results[0].layer[0]
+    assert [ratio.name for ratio in cigs.ratios] == ['GGI', 'CGI']
+    assert cigs.GGI == cigs.ratios[0].value
+    table = xrf.results_table()
+    first_rows, ratios = layer_ratios(table)
+    assert cigs.GGI == ratios['GGI'][0]
+
+    # the table is restored from the archived sections
+    restored = ELNXRayFluorescence.m_from_dict(xrf.m_to_dict())
+    assert restored.results_table().to_series_dict() == table.to_series_dict()
+
+    # a new reader version parses the whole file again
+    monkeypatch.setattr(XRFreader, 'READER_VERSION', 'test')
+    xrf.read_data_file(io.BytesIO(data), iter_xrf_records, archive, None)
+    assert xrf.results[0] is not first_result
+    assert xrf.reader_version == 'test'
+
+    # a changed sample parses the whole file again, also if nothing was found
+    xrf.data_file_sample = 'W124_B3'
+    xrf.read_data_file(io.BytesIO(data), iter_xrf_records, archive, None)
+    assert [result.sample_name for result in xrf.results] == ['W124_B3']
+    xrf.data_file_sample = 'missing'
+    xrf.read_data_file(io.BytesIO(data), iter_xrf_records, archive, None)
+    assert not xrf.results
+
+    def fail(file, logger):
+        raise AssertionError('an unchanged file is parsed again')
+
+    xrf.read_data_file(io.BytesIO(data), fail, archive, None)
+
+
+def test_series_statistics():
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    with open(test_file) as file:
+        first, second, *_ = iter_xrf_measurements(file)
+    # repeat the first measurement with a shifted copper fraction in the third repeat
+    table = XRFTable.concatenate([first, second, first, first, first])
+    copper = (table.element == 'Cu') & (table.measurement == 3)  # noqa: PLR2004
+    table.atomic_fraction[copper] = 40.0
+
+    series, keys = table.series()
+    assert keys == [('CIGS on Mo', 'W123_A1'), ('CIGS on Mo', 'W123_A2')]
+    assert list(series) == [0, 1, 0, 0, 0]
+
+    statistics = series_statistics(table)
+    rows = (statistics['series'] == 0) & (statistics['element'] == 'Cu')
+    row = np.flatnonzero(rows & (statistics['quantity'] == 'atomic_fraction'))[0]
+    assert statistics['number_of_values'][row] == 4  # noqa: PLR2004
+    assert statistics['minimum'][row] == 22.51  # noqa: PLR2004
+    assert statistics['maximum'][row] == 40.0  # noqa: PLR2004
+    assert np.isclose(statistics['mean'][row], (3 * 22.51 + 40.0) / 4)
+    assert statistics['outliers'][row] == [2]
+    row = np.flatnonzero(
+        (statistics['series'] == 0) & (statistics['quantity'] == 'thickness')
+    )[0]
+    assert statistics['std'][row] == 0
+    assert statistics['outliers'][row] == []
+
+
+def test_grid_map():
+    x, y = position_coordinates(np.array(['1-1', '1-3', '3-1', '3-3', '2-2', 'x']))
+    assert np.isnan(x[-1])
+    values = 2 * x[:-1] + y[:-1]
+    grid_x, grid_y, grid = grid_map(x[:-1], y[:-1], values, resolution=5)
+    assert list(grid_x) == [1.0, 2.0, 3.0]
+    assert list(grid_y) == [1.0, 2.0, 3.0]
+    assert np.allclose(grid, 2 * grid_x[np.newaxis, :] + grid_y[:, np.newaxis])
+    grid_x, grid_y, grid = grid_map(x[:-1], y[:-1], values, resolution=2)
+    assert grid.shape == (2, 2)
+
+
+def test_write_maps(monkeypatch):
+    # resolving the samples requires a search index
+    monkeypatch.setattr(
+        CompositeSystemReference, 'normalize', lambda self, archive, logger: None
+    )
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    archive = EntryArchive()
+    archive.data = xrf = ELNXRayFluorescence(
+        data_file='XRF_example.txt', create_maps=True
+    )
+    with open(test_file, 'rb') as file:
+        xrf.read_data_file(file, iter_xrf_records, archive, None)
+
+    # only W123_A1 was measured at more than one position
+    assert [result.position for result in xrf.results] == [
+        '1-1',
+        '1-2',
+        '2-1',
+        '3-1',
+    ]
+    assert [xrf_map.name for xrf_map in xrf.maps] == ['thickness', 'GGI', 'CGI']
+    for xrf_map in xrf.maps:
+        assert xrf_map.sample_name == 'W123_A1'
+        assert xrf_map.number_of_points == 2  # noqa: PLR2004
+        assert list(xrf_map.x) == [1.0, 3.0]
+        assert xrf_map.values.shape == (1, 2)
+    assert len(xrf.figures) == len(xrf.maps)
+
+
+def test_layer_ratios():
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    with open(test_file) as file:
+        table = XRFTable.concatenate(list(iter_xrf_measurements(file)))
+    ratios = {
+        'GGI': (['Ga'], ['Ga', 'In']),
+        'CdS': (['Cd'], ['S']),
+        'missing': (['Ga'], ['Zn']),
+    }
+    first_rows, values = layer_ratios(table, ratios)
+    layers = list(zip(table.measurement[first_rows], table.layer[first_rows]))
+    assert len(set(layers)) == len(layers)
+
+    cigs = (table.layer[first_rows] == 'CIGS') & (table.measurement[first_rows] == 0)
+    gallium, indium = (
+        table.measurement_rows(0)
+        .select(table.layer[table.measurement == 0] == 'CIGS')
+        .values('atomic_fraction', ('Ga', 'In'))
+    )
+    assert values['GGI'][cigs] == gallium / (gallium + indium)
+
+    # layers without the elements of the denominator have no ratio
+    cds = table.layer[first_rows] == 'CdS'
+    assert np.isfinite(values['CdS'][cds]).all()
+    assert np.isnan(values['CdS'][~cds]).all()
+    assert np.isnan(values['missing']).all()
+
+
+def test_ratios_configuration():
+    configuration = config.get_plugin_entry_point(
+        'nomad_uibk_plugin.schema_packages:xrfschema'
+    )
+    # the configured ratios default to the ratios of the reader
+    assert {
+        name: tuple(map(tuple, elements))
+        for name, elements in configuration.ratios.items()
+    } == XRFreader.RATIOS
+
+    # registering the plugin does not import the reader and its dependencies
+    code = (
+        'import sys, nomad.datamodel; '
+        "print('nomad_uibk_plugin.schema_packages' in sys.modules, "
+        "'nomad_uibk_plugin.schema_packages.XRFreader' in sys.modules)"
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, check=True, text=True
+    )
+    assert output.stdout.split() == ['True', 'False']
+
+
+def test_integrate_lines():
+    energy = np.arange(0, 10, 0.125, dtype=np.float32)
+    counts = np.stack([np.ones_like(energy), 2 * energy])
+    intensities = integrate_lines(
+        energy, counts, [((1.0, 2.0), (0.5, 0.75), None), ((3.0, 3.0),)]
+    )
+    assert intensities.shape == (2, 2, 3)
+    assert list(intensities[0, 0, :2]) == [9.0, 3.0]
+    region = (energy >= 1) & (energy <= 2)  # noqa: PLR2004
+    assert intensities[1, 0, 0] == counts[1, region].sum()
+    assert intensities[0, 1, 0] == 1.0
+    assert np.isnan(intensities[:, 0, 2]).all()
+    assert np.isnan(intensities[:, 1, 1:]).all()
+
+
+def test_read_spectra_file(monkeypatch):
+    # resolving the samples requires a search index
+    monkeypatch.setattr(
+        CompositeSystemReference, 'normalize', lambda self, archive, logger: None
+    )
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    archive = EntryArchive()
+    archive.data = xrf = ELNXRayFluorescence(data_file='XRF_example.txt')
+    with open(test_file, 'rb') as file:
+        xrf.read_data_file(file, iter_xrf_records, archive, None)
+
+    energy = np.round(np.arange(0, 30, 0.01), 2)
+    counts = np.ones((len(energy), len(xrf.results)))
+    copper = np.abs(energy - XRFreader.LINE_ENERGIES['Cu-Ka']) < 0.1  # noqa: PLR2004
+    counts[copper] = np.arange(1, len(xrf.results) + 1) * 100
+    spectra = io.StringIO()
+    spectra.write('\t'.join(['Energy', *map(str, range(len(xrf.results)))]) + '\n')
+    np.savetxt(spectra, np.column_stack([energy, counts]), delimiter='\t')
+    spectra.seek(0)
+
+    spectra = spectra.read().encode()
+    xrf.read_spectra_file(io.BytesIO(spectra), None)
+    xrf.write_line_intensities()
+    # an unchanged spectra file is not read again
+    spectrum = xrf.results[1].spectrum
+    xrf.read_spectra_file(io.BytesIO(spectra), None)
+    xrf.write_line_intensities()
+    assert xrf.results[1].spectrum is spectrum
+    xrf.read_spectra_file(io.BytesIO(spectra + b'\n'), None)
+    assert xrf.results[1].spectrum is not spectrum
+    assert not xrf.results[1].spectrum.lines
+    xrf.write_line_intensities()
+    spectrum = xrf.results[1].spectrum
+    assert spectrum.name == '1'
+    assert spectrum.counts.dtype == np.float32
+    # only the lines measured in a result have intensities
+    lines = {line.line: line for line in spectrum.lines}
+    assert set(lines) == {'Cu-Ka', 'In-Ka', 'Ga-Ka', 'Se-Ka', 'Mo-La'}
+    energy = energy.astype(np.float32)
+    for (lower, upper), intensity in zip(
+        XRFreader.LINE_REGIONS['Cu-Ka'],
+        (lines['Cu-Ka'].intensity_peak, lines['Cu-Ka'].intensity_background),
+    ):
+        assert intensity == counts[(energy >= lower) & (energy <= upper), 1].sum()
+
+
+def test_write_search_results(monkeypatch):
+    # resolving the samples requires a search index
+    monkeypatch.setattr(
+        CompositeSystemReference, 'normalize', lambda self, archive, logger: None
+    )
+    test_file = os.path.join(os.path.dirname(__file__), 'data', 'XRF_example.txt')
+    with open(test_file, 'rb') as file:
+        data = file.read()
+    head = data[: data.index(b'Broken')]
+    archive = EntryArchive(results=Results())
+    archive.data = xrf = ELNXRayFluorescence(data_file='XRF_example.txt')
+    xrf.read_data_file(io.BytesIO(head), iter_xrf_records, archive, None)
+    xrf.write_search_results(archive)
+    first_summary = xrf.layer_summaries[0]
+
+    # the summaries are kept for an unchanged file and replaced for new data
+    xrf.read_data_file(io.BytesIO(head), iter_xrf_records, archive, None)
+    xrf.write_search_results(archive)
+    assert xrf.layer_summaries[0] is first_summary
+    xrf.read_data_file(io.BytesIO(data), iter_xrf_records, archive, None)
+    xrf.write_search_results(archive)
+    assert xrf.layer_summaries[0] is not first_summary
+
+    summaries = {summary.name: summary for summary in xrf.layer_summaries}
+    assert list(summaries) == ['CIGS', 'Mo-layer', 'Substrate']
+    cigs = summaries['CIGS']
+    properties = XRFreader.cigs_properties(xrf.results_table())
+    assert cigs.number_of_measurements == len(xrf.results)
+    assert np.isclose(cigs.GGI, np.mean(properties['GGI']))
+    assert np.isclose(
+        cigs.thickness.to('nm').magnitude, np.mean(properties['thickness'])
+    )
+    assert summaries['Mo-layer'].GGI is None
+
+    topology = {system.label: system for system in archive.results.material.topology}
+    assert topology['CIGS'].elements == ['Cu', 'Ga', 'In', 'Se']
+    copper = topology['CIGS'].elemental_composition[0]
+    assert copper.element == 'Cu'
+    assert np.isclose(copper.atomic_fraction, 22.605)
+
+
+def test_generate_xrf_export():
+    layers = (
+        ('CdS', ('Cd', 'S'), 'at%'),
+        ('CIGS', ('Cu', 'In', 'Ga', 'Se'), 'at%'),
+        ('Mo-layer', ('Mo',), 'mass%'),
+    )
+    text = generate_xrf_export(50, layers=layers, duplicates=0.5, seed=3)
+    assert text == generate_xrf_export(50, layers=layers, duplicates=0.5, seed=3)
+    assert text != generate_xrf_export(50, layers=layers, duplicates=0.5, seed=4)
+
+    tables = list(iter_xrf_measurements(io.StringIO(text)))
+    assert len(tables) == 50  # noqa: PLR2004
+    table = XRFTable.concatenate(tables)
+    assert set(table.application) == {'CdS on CIGS on Mo-layer'}
+    assert len(set(table.sample_name)) < 50  # noqa: PLR2004
+    assert list(dict.fromkeys(table.layer)) == ['CdS', 'CIGS', 'Mo-layer', 'Substrate']
+    first = tables[0]
+    cigs = first.layer == 'CIGS'
+    assert np.isclose(first.atomic_fraction[cigs].sum(), 100, atol=0.05)
+    assert set(first.line[cigs]) == {'Cu-Ka', 'In-Ka', 'Ga-Ka', 'Se-Ka'}
+    assert not np.isnan(first.intensity_peak[cigs]).any()